@@ -0,0 +1,238 @@
+"""
+Benchmarks of the API against a local stand-in for the ISG.
+
+Run from the repository root, results are written as JSON:
+
+    python -m benchmarks.run --latency 0.005 --output results.json
+
+Measured per model (LWZ and WPM3i):
+- update: wall time of update() and the number of requests
+- get_conv_val: calls per second
+- accessors: reads per second of the values attributes (api.values)
+- getter sweep: wall time of calling all getters of the model, with and
+  without update_on_read
+- memory: bytes allocated per API instance after an update
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from pystiebeleltron import decode
+from pystiebeleltron import pystiebeleltron as pyse
+
+MODELS = {'lwz': False, 'wpm3i': True}
+
+
+class ReadRegistersResponse(object):
+    def __init__(self, registers):
+        self.registers = registers
+
+
+class WriteResponse(object):
+    def __init__(self, address, value):
+        self.address = address
+        self.value = value
+
+
+class StandInClient(object):
+    """Answers ModBus requests from memory after an injected latency."""
+
+    def __init__(self, schema, latency=0, seed=0):
+        rand = random.Random(seed)
+        self.registers = {register.addr: rand.randrange(0, 400)
+                          for register in schema}
+        self.latency = latency
+        self.requests = 0
+
+    def _read(self, address, count):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return ReadRegistersResponse(
+            [self.registers.get(a, 0) for a in range(address, address + count)])
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._read(address, count)
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._read(address, count)
+
+    def write_register(self, address, value, unit=0):
+        self.requests += 1
+        self.registers[address] = value
+        return WriteResponse(address, value)
+
+
+def _timings(function, iterations):
+    """Return statistics of the wall time of calling function in seconds."""
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'iterations': iterations,
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.mean(times),
+            'max': max(times)}
+
+
+def _api(is_wpm3i, latency, **kwargs):
+    schema = pyse.WPM3i_SCHEMA if is_wpm3i else pyse.LWZ_SCHEMA
+    client = StandInClient(schema, latency)
+    return pyse.StiebelEltronAPI(client, 1, is_wpm3i=is_wpm3i, **kwargs), \
+        client
+
+
+def model_getters(is_wpm3i):
+    """Return the names of the getters working for a model."""
+    api, _ = _api(is_wpm3i, 0)
+    api.update()
+    getters = []
+    for name in sorted(dir(api)):
+        if not name.startswith('get_') or name == 'get_conv_val':
+            continue
+        try:
+            getattr(api, name)()
+        except (KeyError, TypeError):
+            # Getter of registers the model does not have
+            continue
+        getters.append(name)
+    return getters
+
+
+def bench_update(is_wpm3i, latency, iterations):
+    api, client = _api(is_wpm3i, latency)
+    result = _timings(api.update, iterations)
+    result['requests'] = client.requests // iterations
+    return result
+
+
+def bench_get_conv_val(is_wpm3i, duration):
+    api, _ = _api(is_wpm3i, 0)
+    api.update()
+    names = [register.name for register in api._schema]
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for name in names:
+            api.get_conv_val(name)
+        calls += len(names)
+    return {'calls': calls,
+            'calls_per_second': calls / (time.perf_counter() - start)}
+
+
+def bench_accessors(is_wpm3i, duration):
+    api, _ = _api(is_wpm3i, 0)
+    api.update()
+    values = api.values
+    readers = [getattr(type(values), register.name).__get__
+               for register in api._schema]
+    reads = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for read in readers:
+            read(values)
+        reads += len(readers)
+    return {'reads': reads,
+            'reads_per_second': reads / (time.perf_counter() - start)}
+
+
+def bench_getter_sweep(is_wpm3i, latency, iterations, update_on_read):
+    api, client = _api(is_wpm3i, latency, update_on_read=update_on_read)
+    api.update()
+    getters = [getattr(api, name) for name in model_getters(is_wpm3i)]
+    client.requests = 0
+
+    def sweep():
+        for getter in getters:
+            getter()
+
+    result = _timings(sweep, iterations)
+    result['getters'] = len(getters)
+    result['requests'] = client.requests // iterations
+    return result
+
+
+def bench_memory(is_wpm3i, instances):
+    client = StandInClient(
+        pyse.WPM3i_SCHEMA if is_wpm3i else pyse.LWZ_SCHEMA)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        apis = []
+        for _ in range(instances):
+            api = pyse.StiebelEltronAPI(client, 1, is_wpm3i=is_wpm3i)
+            api.update()
+            apis.append(api)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(
+        before, 'filename'))
+    return {'instances': instances,
+            'bytes_per_instance': allocated / instances}
+
+
+def run(latency=0.0, iterations=20, duration=0.5, instances=200):
+    """Run all benchmarks, returning the results as dict."""
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'numpy': decode.numpy is not None,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'parameters': {
+            'latency': latency,
+            'iterations': iterations,
+            'duration': duration,
+            'instances': instances,
+        },
+        'models': {},
+    }
+    for model, is_wpm3i in sorted(MODELS.items()):
+        results['models'][model] = {
+            'update': bench_update(is_wpm3i, latency, iterations),
+            'get_conv_val': bench_get_conv_val(is_wpm3i, duration),
+            'accessors': bench_accessors(is_wpm3i, duration),
+            'getter_sweep': bench_getter_sweep(
+                is_wpm3i, latency, iterations, update_on_read=False),
+            'getter_sweep_update_on_read': bench_getter_sweep(
+                is_wpm3i, latency, iterations, update_on_read=True),
+            'memory': bench_memory(is_wpm3i, instances),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds injected per request")
+    parser.add_argument('--iterations', type=int, default=20,
+                        help="repetitions of timed operations")
+    parser.add_argument('--duration', type=float, default=0.5,
+                        help="seconds of throughput measurements")
+    parser.add_argument('--instances', type=int, default=200,
+                        help="API instances of the memory measurement")
+    parser.add_argument('--output', help="file to write, default stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.latency, args.iterations, args.duration,
+                  args.instances)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Attribute access to the converted register values of a unit.
+
+For each register schema a RegisterValues class is generated with a
+descriptor per register, bound to the block and offset of the register and
+its conversion. Reading a value is an index into the block buffer and a
+division, without the name lookup of get_conv_val:
+
+    api.update()
+    api.values.OUTSIDE_TEMPERATURE
+    getattr(api.values, 'POWER-OFF')
+
+The values are the ones of the last update, reading them never requests
+the unit.
+"""
+from pystiebeleltron.decode import SCALES, SIGNED_TYPES
+
+
+class RegisterAccessor(object):
+    """Read-only descriptor of the converted value of a register."""
+
+    __slots__ = ('register', '_block', '_offset', '_decode')
+
+    def __init__(self, register):
+        self.register = register
+        self._block = register.block
+        self._offset = register.offset
+        self._decode = register.decode
+
+    def __get__(self, values, owner=None):
+        if values is None:
+            return self
+        return self._decode(values._buffers[self._block][self._offset])
+
+    def __set__(self, values, value):
+        raise AttributeError(
+            "{} is read-only, use a setter or a WriteBatch".format(
+                self.register.name))
+
+
+class UnsignedAccessor(RegisterAccessor):
+    """Accessor of an unsigned register, its value is the raw value."""
+
+    __slots__ = ()
+
+    def __get__(self, values, owner=None):
+        if values is None:
+            return self
+        return values._buffers[self._block][self._offset]
+
+
+class SignedAccessor(RegisterAccessor):
+    """Accessor of a signed register with a decimal scale."""
+
+    __slots__ = ('_divisor',)
+
+    def __init__(self, register):
+        super().__init__(register)
+        self._divisor = round(1 / SCALES[register.type])
+
+    def __get__(self, values, owner=None):
+        if values is None:
+            return self
+        raw = values._buffers[self._block][self._offset]
+        if raw & 0x8000:
+            raw -= 0x10000
+        return raw / self._divisor
+
+
+class UnavailableAccessor(RegisterAccessor):
+    """Accessor of a register the unit does not populate, it reads None."""
+
+    __slots__ = ()
+
+    def __get__(self, values, owner=None):
+        if values is None:
+            return self
+        return None
+
+
+def accessor(register):
+    """Return the fastest accessor of a register."""
+    if register.type in SIGNED_TYPES:
+        return SignedAccessor(register)
+    if SCALES.get(register.type) == 1:
+        return UnsignedAccessor(register)
+    return RegisterAccessor(register)
+
+
+class RegisterValues(object):
+    """Converted register values of a unit as attributes.
+
+    Registers the model does not have read as None, like get_conv_val.
+    """
+
+    __slots__ = ('_buffers',)
+
+    def __init__(self, buffers):
+        """Initialize the values.
+
+        Args:
+            buffers: Block buffers of a RegisterStore.
+        """
+        self._buffers = buffers
+
+    def __getattr__(self, name):
+        # Only called for names without accessor
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return None
+
+
+_CLASSES = {}
+
+
+def values_class(schema, unavailable=frozenset()):
+    """Return the RegisterValues class of a schema.
+
+    Args:
+        schema: RegisterSchema of the values.
+        unavailable: Addresses of registers which read None, e.g. pruned
+            ones. Classes with unavailable registers are not cached.
+    """
+    cls = _CLASSES.get(schema)
+    if cls is None:
+        namespace = {register.name: accessor(register)
+                     for register in schema}
+        namespace['__slots__'] = ()
+        cls = _CLASSES[schema] = type('RegisterValues', (RegisterValues,),
+                                      namespace)
+    if unavailable:
+        namespace = {register.name: UnavailableAccessor(register)
+                     for register in schema if register.addr in unavailable}
+        namespace['__slots__'] = ()
+        cls = type('RegisterValues', (cls,), namespace)
+    return cls
@@ -0,0 +1,162 @@
+"""
+Asyncio variant of the Stiebel Eltron ModBus API.
+
+Use it with the asyncio client of pymodbus, whose request methods return
+awaitables, e.g.:
+
+    from pymodbus.client.asynchronous import schedulers
+    from pymodbus.client.asynchronous.tcp import AsyncModbusTCPClient
+
+    loop, client = AsyncModbusTCPClient(schedulers.ASYNC_IO, host=host,
+                                        port=502)
+    api = AsyncStiebelEltronAPI(client.protocol, 1)
+    await api.update()
+    temp = await api.get_current_temp()
+"""
+import asyncio
+import functools
+import time
+
+from pystiebeleltron.detect import async_detect_model
+from pystiebeleltron.flight import AsyncSingleFlight
+from pystiebeleltron.instrument import AsyncInstrumentedConnection
+from pystiebeleltron.pystiebeleltron import StiebelEltronAPI
+from pystiebeleltron.subscribe import ChangeStream
+from pystiebeleltron.writes import AsyncWriteBatch
+
+
+class AsyncStiebelEltronAPI(StiebelEltronAPI):
+    """Stiebel Eltron API for asyncio ModBus clients.
+
+    All read requests are issued concurrently. Getters and setters mirror the
+    ones of StiebelEltronAPI, but have to be awaited.
+    """
+
+    _instrumented_connection = AsyncInstrumentedConnection
+    _single_flight = AsyncSingleFlight
+
+    @classmethod
+    async def detect(cls, conn, slave, cache=None, key=None, **kwargs):
+        """Return an API for the model the unit is detected as."""
+        model = await async_detect_model(conn, slave, cache, key)
+        return cls(conn, slave, is_wpm3i=model == 'wpm3i', **kwargs)
+
+    async def _execute(self, plan, blocks=()):
+        """Run read requests concurrently and mark the given blocks fresh."""
+        ret = True
+        # Seconds spent reading each block, by block index
+        durations = {}
+        try:
+            responses = await asyncio.gather(*[
+                self._timed_read(request, durations) for request in plan])
+            results = [response.registers for response in responses]
+        except (AttributeError, IOError) as err:
+            # The unit does not reply reliably, or the connection failed
+            ret = False
+            self.last_error = err
+            print("Modbus read failed")
+        else:
+            self.last_error = None
+            self._store(plan, results)
+            self._stored(blocks, durations)
+        return ret
+
+    async def _timed_read(self, request, durations):
+        """Run a read request, adding its duration to its block."""
+        start = time.monotonic()
+        response = await getattr(self._conn, request.block.function)(
+            unit=self._slave,
+            address=request.address,
+            count=request.count)
+        index = request.block.index
+        durations[index] = durations.get(index, 0) + time.monotonic() - start
+        return response
+
+    async def update(self, names=None):
+        """Request current values from heat pump.
+
+        Args:
+            names: Names or addresses of the registers to request, defaults
+                to all registers.
+        """
+        if names is None:
+            blocks = self._schema.blocks
+        else:
+            blocks = self._covered_blocks(names)
+        return await self._flights.run(
+            self._needed_blocks(names), {block.index for block in blocks},
+            lambda: self._execute(self._plan(names), blocks), self._notify)
+
+    async def poll(self, names=None):
+        """Request current values and return them as Snapshot.
+
+        Args:
+            names: Names or addresses of the registers to request, defaults
+                to all registers.
+
+        Returns:
+            Snapshot of all values, None if reading failed.
+        """
+        if not await self.update(names):
+            return None
+        return self.snapshot()
+
+    async def _refresh(self, names=None, max_staleness=None):
+        """Request stale blocks of registers, if updating on read."""
+        if self._update_on_read:
+            stale = self._stale_blocks(names, max_staleness)
+            if stale:
+                indexes = {block.index for block in stale}
+                await self._flights.run(
+                    indexes, indexes,
+                    lambda: self._execute(self._block_plan(stale), stale),
+                    self._notify)
+
+    def changes(self, deadbands=None):
+        """Return an async iterator of changed register values.
+
+        Yields dicts of the registers changed since the last iteration
+        (name -> converted value). Changes not consumed before the next
+        update are merged, keeping the latest values. Close the returned
+        ChangeStream to stop the iteration.
+        """
+        stream = ChangeStream(self, deadbands)
+        self._subscriptions.append(stream)
+        return stream
+
+    def write_batch(self):
+        """Return an AsyncWriteBatch collecting holding register writes.
+
+            async with api.write_batch() as batch:
+                batch.set('HEATING_CIRCUIT_1__COMFORT_TEMPERATURE', 21.5)
+        """
+        return AsyncWriteBatch(self)
+
+
+def _async_getter(getter):
+    """Wrap a getter of StiebelEltronAPI into a coroutine."""
+    @functools.wraps(getter)
+    async def async_getter(self, *args, max_staleness=None, **kwargs):
+        await self._refresh(getter.registers, max_staleness)
+        return getter.__wrapped__(self, *args, **kwargs)
+    return async_getter
+
+
+def _async_setter(setter):
+    """Wrap a setter of StiebelEltronAPI into a coroutine."""
+    @functools.wraps(setter)
+    async def async_setter(self, *args, **kwargs):
+        result = await setter.__wrapped__(self, *args, **kwargs)
+        self.invalidate(setter.registers)
+        return result
+    return async_setter
+
+
+for _name in dir(StiebelEltronAPI):
+    if _name.startswith('get_') and _name != 'get_conv_val':
+        setattr(AsyncStiebelEltronAPI, _name,
+                _async_getter(getattr(StiebelEltronAPI, _name)))
+    elif _name.startswith('set_'):
+        setattr(AsyncStiebelEltronAPI, _name,
+                _async_setter(getattr(StiebelEltronAPI, _name)))
+del _name
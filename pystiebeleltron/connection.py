@@ -0,0 +1,315 @@
+"""
+Managed connections to an ISG.
+
+A managed connection wraps a pymodbus client and can be passed to the API as
+`conn`. It connects lazily on the first request, enables TCP keepalive,
+closes the connection after being idle and reconnects with exponential
+backoff. After repeated failures a circuit breaker stops requests to the ISG
+for a while, so a dead gateway fails fast instead of costing a full client
+timeout per request.
+
+Example:
+
+    from pymodbus.client.sync import ModbusTcpClient
+
+    conn = ManagedConnection(
+        lambda: ModbusTcpClient(host='192.168.1.20', port=502, timeout=2))
+    unit = StiebelEltronAPI(conn, 1)
+"""
+import asyncio
+import random
+import socket
+import threading
+import time
+
+# Consecutive failures opening the circuit
+DEFAULT_FAILURE_THRESHOLD = 5
+# Seconds the circuit stays open at first, doubled on each failed trial
+DEFAULT_RESET_TIMEOUT = 30
+DEFAULT_MAX_RESET_TIMEOUT = 600
+# Reconnect backoff in seconds
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 60
+# Seconds without requests after which the connection is closed
+DEFAULT_IDLE_TIMEOUT = 60
+
+# TCP keepalive: idle seconds before probing, probe interval, probe count
+KEEPALIVE_OPTIONS = (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10),
+                     ('TCP_KEEPCNT', 3))
+
+
+class ConnectionUnavailableError(ConnectionError):
+    """The ISG is not requested, because of backoff or an open circuit."""
+
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF_BASE,
+                  maximum=DEFAULT_BACKOFF_MAX):
+    """Return the delay before reconnect attempt number `attempt` (0-based).
+
+    The delay doubles per attempt up to maximum, half of it is random
+    (equal jitter) to spread reconnects of many clients.
+    """
+    delay = min(maximum, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def enable_keepalive(sock):
+    """Enable TCP keepalive on a socket, as far as the platform supports."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in KEEPALIVE_OPTIONS:
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+
+class CircuitBreaker(object):
+    """Stops requests after repeated failures.
+
+    The circuit opens after failure_threshold consecutive failures. Once
+    reset_timeout passed, a single trial request is allowed (half open). Its
+    success closes the circuit, its failure opens it again for twice as long.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 max_reset_timeout=DEFAULT_MAX_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._trial or \
+                time.monotonic() - self._opened_at >= self._timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Return whether a request may be made."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._timeout = self.reset_timeout
+        self._opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial:
+            self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+            self._opened_at = time.monotonic()
+            self._trial = False
+        elif self._opened_at is None and \
+                self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class _ManagedConnectionBase(object):
+    """Connection policy shared by the sync and asyncio connections."""
+
+    def __init__(self, factory, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 keepalive=True, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, breaker=None):
+        """Initialize the connection.
+
+        Args:
+            factory: Callable returning a new client (see subclasses).
+            idle_timeout: Seconds without requests after which the
+                connection is closed, None to keep it open.
+            keepalive: Enable TCP keepalive on the client's socket.
+            backoff_base: Delay before the first reconnect in seconds.
+            backoff_max: Maximum delay between reconnects in seconds.
+            breaker: CircuitBreaker, defaults to a new one.
+        """
+        self._factory = factory
+        self._idle_timeout = idle_timeout
+        self._keepalive = keepalive
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.client = None
+        self.connects = 0
+        self._attempts = 0
+        self._retry_at = 0
+        self._last_used = None
+
+    def _check_available(self):
+        if self.client is None:
+            # Before taking the trial of a half open circuit, a request
+            # rejected while waiting would never give it back
+            self._check_reconnect()
+        if not self.breaker.allow():
+            raise ConnectionUnavailableError("Circuit open")
+
+    def _check_reconnect(self):
+        # Not a failure of the ISG, it was not even tried
+        if time.monotonic() < self._retry_at:
+            raise ConnectionUnavailableError("Waiting to reconnect")
+
+    def _connected(self, client):
+        self.client = client
+        self.connects += 1
+        self._attempts = 0
+        self._retry_at = 0
+        self._last_used = time.monotonic()
+        sock = getattr(client, 'socket', None)
+        transport = getattr(client, 'transport', None)
+        if sock is None and transport is not None:
+            # asyncio protocols expose the socket through their transport
+            sock = transport.get_extra_info('socket')
+        if self._keepalive and sock is not None:
+            enable_keepalive(sock)
+
+    def _connect_failed(self):
+        self._retry_at = time.monotonic() + backoff_delay(
+            self._attempts, self._backoff_base, self._backoff_max)
+        self._attempts += 1
+        self.breaker.record_failure()
+
+    def _is_idle(self):
+        return self.client is not None and self._idle_timeout is not None \
+            and time.monotonic() - self._last_used >= self._idle_timeout
+
+    def _completed(self, response):
+        self._last_used = time.monotonic()
+        if isinstance(response, Exception):
+            # pymodbus returns ModbusIOException on missing responses
+            self._failed()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _failed(self):
+        self.close()
+        self.breaker.record_failure()
+
+    def close(self):
+        """Close the connection, the next request reconnects."""
+        client, self.client = self.client, None
+        if client is not None:
+            client.close()
+
+    def close_if_idle(self):
+        """Close the connection if it was idle for idle_timeout."""
+        if self._is_idle():
+            self.close()
+
+
+class ManagedConnection(_ManagedConnectionBase):
+    """Managed connection around a pymodbus sync client.
+
+    The factory returns a new, unconnected client, e.g. ModbusTcpClient.
+    Requests are serialized, so threads may share a connection.
+    """
+
+    def __init__(self, factory, **kwargs):
+        super().__init__(factory, **kwargs)
+        self._lock = threading.RLock()
+
+    def connect(self):
+        """Connect to the ISG, unless connected. Returns success."""
+        with self._lock:
+            if self.client is not None:
+                return True
+            self._check_reconnect()
+            client = self._factory()
+            if client.connect():
+                self._connected(client)
+                return True
+            self._connect_failed()
+            return False
+
+    def _request(self, name, *args, **kwargs):
+        with self._lock:
+            self._check_available()
+            self.close_if_idle()
+            if not self.connect():
+                raise ConnectionUnavailableError("Failed to connect")
+            try:
+                response = getattr(self.client, name)(*args, **kwargs)
+            except Exception:
+                self._failed()
+                raise
+            return self._completed(response)
+
+    def read_input_registers(self, *args, **kwargs):
+        return self._request('read_input_registers', *args, **kwargs)
+
+    def read_holding_registers(self, *args, **kwargs):
+        return self._request('read_holding_registers', *args, **kwargs)
+
+    def write_register(self, *args, **kwargs):
+        return self._request('write_register', *args, **kwargs)
+
+    def write_registers(self, *args, **kwargs):
+        return self._request('write_registers', *args, **kwargs)
+
+
+class AsyncManagedConnection(_ManagedConnectionBase):
+    """Managed connection around an asyncio ModBus client.
+
+    The factory is a coroutine function returning a connected client, e.g.
+    fleet.open_connection bound to a host and port.
+    """
+
+    def __init__(self, factory, **kwargs):
+        super().__init__(factory, **kwargs)
+        self._lock = None
+
+    async def connect(self):
+        """Connect to the ISG, unless connected.
+
+        Returns True, errors of the factory are raised.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.client is not None:
+                return True
+            self._check_reconnect()
+            try:
+                client = await self._factory()
+            except BaseException:  # Including cancellation by timeouts
+                self._connect_failed()
+                raise
+            self._connected(client)
+            return True
+
+    async def _request(self, name, *args, **kwargs):
+        self._check_available()
+        self.close_if_idle()
+        await self.connect()
+        try:
+            response = await getattr(self.client, name)(*args, **kwargs)
+        except BaseException:  # Including cancellation by timeouts
+            self._failed()
+            raise
+        return self._completed(response)
+
+    def read_input_registers(self, *args, **kwargs):
+        return self._request('read_input_registers', *args, **kwargs)
+
+    def read_holding_registers(self, *args, **kwargs):
+        return self._request('read_holding_registers', *args, **kwargs)
+
+    def write_register(self, *args, **kwargs):
+        return self._request('write_register', *args, **kwargs)
+
+    def write_registers(self, *args, **kwargs):
+        return self._request('write_registers', *args, **kwargs)
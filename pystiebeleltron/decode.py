@@ -0,0 +1,128 @@
+"""
+Bulk conversion of all register values of a unit.
+
+Uses NumPy if it is installed, to convert all registers in a single pass,
+and falls back to plain Python otherwise. NumPy is imported when the first
+BulkDecoder is created, `decode.numpy` is None if it is not installed.
+"""
+from collections import namedtuple
+
+from pystiebeleltron.registers import (
+    ERROR_NOTAVAILABLE, ERROR_SHORTCUT, UNAVAILABLE_OBJECT)
+
+# Sensor errors are only reported by the signed data types (2 and 7).
+SENTINEL_VALUES = (ERROR_NOTAVAILABLE, ERROR_SHORTCUT)
+
+SCALES = {2: 0.1, 6: 1, 7: 0.01, 8: 1}
+SIGNED_TYPES = (2, 7)
+
+# Converted values of all registers of a schema, in schema order.
+# `values` and `unavailable` are NumPy arrays if NumPy is used, lists
+# otherwise. `unavailable` flags the registers holding UNAVAILABLE_OBJECT,
+# ERROR_NOTAVAILABLE or ERROR_SHORTCUT.
+BulkValues = namedtuple('BulkValues', ['names', 'values', 'unavailable'])
+
+
+def available(register, raw):
+    """Return whether a raw register value is a value."""
+    if raw == UNAVAILABLE_OBJECT:
+        return False
+    return register.type not in SIGNED_TYPES or \
+        register.decode(raw) not in SENTINEL_VALUES
+
+
+def _import_numpy():
+    """Return the numpy module, or None if it is not installed."""
+    global numpy
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - depends on the environment
+        numpy = None
+    return numpy
+
+
+def __getattr__(name):
+    if name == 'numpy':
+        return _import_numpy()
+    raise AttributeError(
+        "module {} has no attribute {}".format(__name__, name))
+
+
+class BulkDecoder(object):
+    """Converts the raw buffers of a RegisterStore in one go."""
+
+    def __init__(self, schema, use_numpy=None):
+        """Precompute the conversion of a schema.
+
+        Args:
+            schema: RegisterSchema of the buffers to be converted.
+            use_numpy: Force (True) or avoid (False) NumPy. Defaults to
+                using NumPy if it is installed.
+        """
+        numpy = _import_numpy()
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.use_numpy = use_numpy
+        self.names = tuple(register.name for register in schema)
+        # Position of each register in the concatenated block buffers
+        bases = []
+        base = 0
+        for block in schema.blocks:
+            bases.append(base)
+            base += block.count
+        positions = [bases[r.block] + r.offset for r in schema]
+        types = [r.type for r in schema]
+        if use_numpy:
+            self._positions = numpy.array(positions, dtype=numpy.intp)
+            self._scales = numpy.array([SCALES[t] for t in types],
+                                       dtype=numpy.float64)
+            self._signed = numpy.array([t in SIGNED_TYPES for t in types])
+        else:
+            self._registers = tuple(
+                (r.block, r.offset, r.decode, r.type in SIGNED_TYPES)
+                for r in schema)
+
+    def decode(self, buffers):
+        """Convert the raw block buffers of a RegisterStore.
+
+        Returns:
+            BulkValues with the converted values of all registers.
+        """
+        if self.use_numpy:
+            return self._decode_numpy(buffers)
+        return self._decode_python(buffers)
+
+    def _decode_numpy(self, buffers):
+        raw = numpy.concatenate(
+            [numpy.frombuffer(buffer, dtype=numpy.uint16)
+             for buffer in buffers])[self._positions]
+        values = numpy.where(self._signed, raw.view(numpy.int16), raw)
+        values = numpy.round(values * self._scales, 2)
+        unavailable = raw == UNAVAILABLE_OBJECT
+        for sentinel in SENTINEL_VALUES:
+            unavailable |= self._signed & (values == sentinel)
+        return BulkValues(self.names, values, unavailable)
+
+    def _decode_python(self, buffers):
+        values = []
+        unavailable = []
+        for block, offset, decode, signed in self._registers:
+            raw = buffers[block][offset]
+            value = decode(raw)
+            values.append(value)
+            unavailable.append(raw == UNAVAILABLE_OBJECT or
+                               (signed and value in SENTINEL_VALUES))
+        return BulkValues(self.names, values, unavailable)
+
+
+_DECODERS = {}
+
+
+def bulk_decoder(schema):
+    """Return the shared BulkDecoder of a schema."""
+    decoder = _DECODERS.get(schema)
+    if decoder is None:
+        decoder = _DECODERS[schema] = BulkDecoder(schema)
+    return decoder
@@ -0,0 +1,331 @@
+"""
+Metrics derived from the register values of a unit, computed incrementally.
+
+Metrics are declared over the register names of a schema and over metrics
+declared before them:
+
+    metrics = [
+        total('HEAT_KWH',
+              'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH',
+              'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH'),
+        ...
+        ratio('COP', 'HEAT_KWH', 'CONSUMPTION_KWH'),
+        delta('HEAT_DELTA_KWH', 'HEAT_KWH', split=True),
+        rate('HEAT_POWER_KW', 'HEAT_KWH', split=True),
+    ]
+    derived = DerivedMetrics(schema, metrics)
+    derived.evaluate(api.poll())['COP']
+
+DerivedMetrics caches the results per generation of buffers (each update
+of the API publishes new ones). For a new generation, only the metrics one
+of whose inputs changed are computed again. A metric is None if one of its
+inputs is None or an unavailable register.
+"""
+from types import MappingProxyType
+
+from pystiebeleltron.decode import available
+from pystiebeleltron.rollup import total_increase
+
+HEAT = 'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__'
+CONSUMPTION = 'ALL_HEAT_PUMPS__POWER_CONSUMPTION__'
+
+
+class Metric(object):
+    """A value computed by a function of registers and other metrics."""
+
+    __slots__ = ('name', 'inputs', 'function')
+
+    def __init__(self, name, inputs, function):
+        """Initialize the metric.
+
+        Args:
+            name: Name of the metric.
+            inputs: Names of the registers and metrics the function is
+                called with.
+            function: Callable computing the metric from the input values.
+        """
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.function = function
+
+    def compute(self, values, state, timestamp):
+        """Return the metric of the input values.
+
+        Args:
+            values: Values of the inputs, none of them None.
+            state: Dict kept for the metric between updates.
+            timestamp: Wall clock time the inputs were read at, or None.
+        """
+        return self.function(*values)
+
+    def expires(self, value):
+        """Return whether a value must be computed again without a change."""
+        return False
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.name)
+
+
+def _increase(value, state, split):
+    """Return the increase of a counter since the previous value.
+
+    A counter decreasing was reset (like the daily counters at midnight),
+    its increase is its value. Totals of a MWh and a kWh register (split)
+    are not reset by these registers being carried at different times,
+    see rollup.total_increase. None for the first value.
+    """
+    if split:
+        previous = state.get('total')
+        increase, state['total'] = total_increase(previous,
+                                                  *divmod(value, 1000))
+        return None if previous is None else increase
+    previous = state.get('value')
+    state['value'] = value
+    if previous is None:
+        return None
+    if value < previous:
+        return value
+    return value - previous
+
+
+class Delta(Metric):
+    """Increase of a counter since the previous update.
+
+    A counter decreasing was reset (like the daily counters at midnight),
+    its increase is its value, unless it is a total split into a MWh and a
+    kWh register. The delta is 0 for updates not changing the counter.
+    """
+
+    __slots__ = ('split',)
+
+    def __init__(self, name, counter, split=False):
+        super().__init__(name, (counter,), None)
+        self.split = split
+
+    def compute(self, values, state, timestamp):
+        value, = values
+        return _increase(value, state, self.split)
+
+    def expires(self, value):
+        # Falls back to 0 with the next update
+        return bool(value)
+
+
+class Rate(Metric):
+    """Increase of a counter per hour, e.g. kW of a kWh counter.
+
+    Counters only change in steps of their resolution, so the rate is
+    taken between the two latest changes. Once the counter did not change
+    for longer than between these, it increased by less than a step since
+    the latest change, and the rate is this upper bound. It is None until
+    the counter changed twice.
+    """
+
+    __slots__ = ('split',)
+
+    def __init__(self, name, counter, split=False):
+        super().__init__(name, (counter,), None)
+        self.split = split
+
+    def compute(self, values, state, timestamp):
+        value, = values
+        increase = _increase(value, state, self.split)
+        changed_at = state.get('changed_at')
+        if increase == 0:
+            rate = state.get('rate')
+            if rate is not None and timestamp is not None and \
+                    timestamp - changed_at > state['interval']:
+                rate = 3600 / (timestamp - changed_at)
+            return rate
+        # The first value seen was not necessarily reached just then
+        state['changed_at'] = None if increase is None else timestamp
+        rate = None
+        if increase is not None and changed_at is not None and \
+                timestamp is not None and timestamp > changed_at:
+            state['interval'] = timestamp - changed_at
+            rate = increase * 3600 / state['interval']
+        state['rate'] = rate
+        return rate
+
+    def expires(self, value):
+        # Falls with the time since the latest change
+        return value is not None
+
+
+def formula(name, inputs, function):
+    """Return a metric computed by function(*input values)."""
+    return Metric(name, inputs, function)
+
+
+def total(name, mwh, kwh):
+    """Return a metric combining the MWh and kWh registers of a counter."""
+    return Metric(name, (mwh, kwh), lambda mwh, kwh: mwh * 1000 + kwh)
+
+
+def _ratio(numerator, denominator):
+    if not denominator:
+        return None
+    return numerator / denominator
+
+
+def ratio(name, numerator, denominator):
+    """Return a metric dividing two inputs, None for a zero denominator."""
+    return Metric(name, (numerator, denominator), _ratio)
+
+
+def delta(name, counter, split=False):
+    """Return the increase of a counter since the previous update.
+
+    Pass split=True for a total() of a MWh and a kWh register.
+    """
+    return Delta(name, counter, split)
+
+
+def rate(name, counter, split=False):
+    """Return the increase of a counter per hour, see delta."""
+    return Rate(name, counter, split)
+
+
+def _counter_totals(prefix, kind, counters):
+    return [total('{}_{}_KWH'.format(kind, counter),
+                  '{}{}_TOTAL__MWH'.format(prefix, counter),
+                  '{}{}_TOTAL__KWH'.format(prefix, counter))
+            for counter in counters]
+
+
+# Metrics of the energy counters of all heat pumps of a WPM3i
+WPM3I_METRICS = tuple(
+    _counter_totals(HEAT, 'HEAT',
+                    ('VD_HEATING', 'VD_DHW', 'NHZ_HEATING', 'NHZ_DHW')) +
+    _counter_totals(CONSUMPTION, 'CONSUMPTION', ('VD_HEATING', 'VD_DHW')) +
+    [
+        # Seasonal performance since commissioning, and of today
+        ratio('COP_HEATING', 'HEAT_VD_HEATING_KWH',
+              'CONSUMPTION_VD_HEATING_KWH'),
+        ratio('COP_DHW', 'HEAT_VD_DHW_KWH', 'CONSUMPTION_VD_DHW_KWH'),
+        ratio('COP_HEATING_DAY', HEAT + 'VD_HEATING_DAY__KWH',
+              CONSUMPTION + 'VD_HEATING_DAY__KWH'),
+        ratio('COP_DHW_DAY', HEAT + 'VD_DHW_DAY__KWH',
+              CONSUMPTION + 'VD_DHW_DAY__KWH'),
+        delta('HEAT_VD_HEATING_DELTA_KWH', 'HEAT_VD_HEATING_KWH', True),
+        delta('HEAT_VD_DHW_DELTA_KWH', 'HEAT_VD_DHW_KWH', True),
+        delta('CONSUMPTION_VD_HEATING_DELTA_KWH',
+              'CONSUMPTION_VD_HEATING_KWH', True),
+        delta('CONSUMPTION_VD_DHW_DELTA_KWH', 'CONSUMPTION_VD_DHW_KWH',
+              True),
+        rate('HEAT_VD_HEATING_POWER_KW', 'HEAT_VD_HEATING_KWH', True),
+        rate('HEAT_VD_DHW_POWER_KW', 'HEAT_VD_DHW_KWH', True),
+        rate('CONSUMPTION_VD_HEATING_POWER_KW', 'CONSUMPTION_VD_HEATING_KWH',
+             True),
+        rate('CONSUMPTION_VD_DHW_POWER_KW', 'CONSUMPTION_VD_DHW_KWH', True),
+    ])
+
+# Default metrics by model, the LWZ has no energy counters
+DEFAULT_METRICS = {'lwz': (), 'wpm3i': WPM3I_METRICS}
+
+
+class DerivedMetrics(object):
+    """Incremental evaluation of metrics for the updates of a unit."""
+
+    def __init__(self, schema, metrics=None):
+        """Initialize the evaluation.
+
+        Args:
+            schema: RegisterSchema of the unit.
+            metrics: Metrics to compute, in an order where each one follows
+                the metrics it uses. Defaults to DEFAULT_METRICS of the
+                model of the schema.
+
+        Raises:
+            ValueError: If an input is neither a register nor a metric
+                declared before, or a name is declared twice.
+        """
+        if metrics is None:
+            metrics = DEFAULT_METRICS.get(schema.model, ())
+        self.schema = schema
+        self.metrics = tuple(metrics)
+        # Registers used by the metrics, and the blocks each metric uses
+        self._registers = {}
+        blocks = {}
+        for metric in self.metrics:
+            if metric.name in blocks or metric.name in schema:
+                raise ValueError("{} is declared twice".format(metric.name))
+            metric_blocks = set()
+            for name in metric.inputs:
+                if name in blocks:
+                    metric_blocks |= blocks[name]
+                elif name in schema:
+                    register = schema[name]
+                    self._registers[name] = register
+                    metric_blocks.add(register.block)
+                else:
+                    raise ValueError("Unknown input {} of {}".format(
+                        name, metric.name))
+            blocks[metric.name] = metric_blocks
+        self._blocks = [tuple(blocks[metric.name]) for metric in self.metrics]
+        self._buffers = None
+        self._raw = {}
+        self._inputs = {}
+        self._results = MappingProxyType({})
+        self._states = [{} for _ in self.metrics]
+        # Generations evaluated, and metrics computed for them
+        self.updates = 0
+        self.computed = 0
+
+    def update(self, buffers, acquired=None):
+        """Return the metrics of a generation of buffers.
+
+        Args:
+            buffers: Block buffers of a RegisterStore or Snapshot.
+            acquired: Wall clock time each block was read at, used by
+                rates.
+
+        Returns:
+            Read-only mapping of metric name to value. It never changes, the
+            next generation gets a new one.
+        """
+        if buffers is self._buffers:
+            return self._results
+        self._buffers = buffers
+        self.updates += 1
+        changed = set()
+        inputs = self._inputs
+        for name, register in self._registers.items():
+            raw = buffers[register.block][register.offset]
+            if self._raw.get(name) != raw:
+                self._raw[name] = raw
+                inputs[name] = register.decode(raw) \
+                    if available(register, raw) else None
+                changed.add(name)
+        results = self._results
+        updated = None
+        for index, metric in enumerate(self.metrics):
+            name = metric.name
+            if name in results and not metric.expires(results[name]) and \
+                    changed.isdisjoint(metric.inputs):
+                continue
+            values = [inputs[input_name] for input_name in metric.inputs]
+            if None in values:
+                value = None
+            else:
+                timestamp = None
+                if acquired is not None:
+                    times = [acquired[block] for block in self._blocks[index]
+                             if acquired[block] is not None]
+                    timestamp = max(times) if times else None
+                value = metric.compute(values, self._states[index],
+                                       timestamp)
+            self.computed += 1
+            if name not in results or results[name] != value:
+                if updated is None:
+                    updated = dict(results)
+                updated[name] = value
+                inputs[name] = value
+                changed.add(name)
+        if updated is not None:
+            self._results = MappingProxyType(updated)
+        return self._results
+
+    def evaluate(self, snapshot):
+        """Return the metrics of a Snapshot, see update."""
+        return self.update(snapshot.buffers, snapshot.acquired)
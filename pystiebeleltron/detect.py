@@ -0,0 +1,168 @@
+"""
+Detection of the controller family (LWZ or WPM3i) of a unit.
+
+The register maps of both families do not overlap, a unit answers reads of
+the addresses of its own family only. Detection reads the system status
+block of each family with a single request, until one is answered. The
+result can be kept in a ModelCache file, so later runs skip the probes:
+
+    cache = ModelCache()
+    api = StiebelEltronAPI.detect(client, 1, cache=cache,
+                                  key='192.168.1.20:502/1')
+"""
+import os
+
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT
+
+# Requests answered by a single family: (model, read function, start
+# address, number of registers). These are the system status blocks.
+PROBES = (
+    ('wpm3i', 'read_input_registers', 2501, 5),
+    ('lwz', 'read_input_registers', 2000, 3),
+)
+
+
+class DetectionError(Exception):
+    """The unit answered none of the probes."""
+
+
+def default_cache_path():
+    """Return the path of the model cache in the user's cache directory."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pystiebeleltron', 'models.json')
+
+
+class ModelCache(object):
+    """Models of units by key (e.g. host:port/unit), kept in a JSON file.
+
+    The file is read on first use and rewritten atomically when a model is
+    added, merging entries written by other processes in the meantime.
+    """
+
+    def __init__(self, path=None):
+        """Initialize the cache.
+
+        Args:
+            path: Path of the file, defaults to default_cache_path().
+        """
+        self.path = default_cache_path() if path is None else path
+        self._models = None
+
+    def _load(self):
+        import json
+
+        try:
+            with open(self.path) as cache_file:
+                models = json.load(cache_file)
+        except (OSError, ValueError):
+            # Missing or damaged, detect again
+            return {}
+        if not isinstance(models, dict):
+            return {}
+        return models
+
+    def get(self, key):
+        """Return the cached model of a unit, or None."""
+        if self._models is None:
+            self._models = self._load()
+        return self._models.get(key)
+
+    def set(self, key, model):
+        """Cache the model of a unit."""
+        self._write(key, model)
+
+    def forget(self, key):
+        """Remove a unit, e.g. after its controller was replaced."""
+        self._write(key, None)
+
+    def _write(self, key, model):
+        import json
+
+        models = self._load()
+        if model is None:
+            models.pop(key, None)
+        else:
+            models[key] = model
+        self._models = models
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(temp_path, 'w') as cache_file:
+                json.dump(models, cache_file, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The models are still cached in memory
+            print("Model cache not writable")
+
+
+def cache_key(conn, slave):
+    """Return the cache key of a unit, None if the client has no host."""
+    host = getattr(conn, 'host', None)
+    if host is None:
+        return None
+    return '{}:{}/{}'.format(host, getattr(conn, 'port', 502), slave)
+
+
+def _answered(response, count):
+    """Return whether a probe was answered with values."""
+    registers = getattr(response, 'registers', None)
+    return registers is not None and len(registers) == count and \
+        any(value != UNAVAILABLE_OBJECT for value in registers)
+
+
+def _cached(cache, key):
+    if cache is None or key is None:
+        return None
+    return cache.get(key)
+
+
+def _detected(cache, key, model, slave):
+    if model is None:
+        raise DetectionError(
+            "Unit {} answered neither LWZ nor WPM3i reads".format(slave))
+    if cache is not None and key is not None:
+        cache.set(key, model)
+    return model
+
+
+def detect_model(conn, slave, cache=None, key=None):
+    """Return the model ('lwz' or 'wpm3i') of a unit.
+
+    Args:
+        conn: pymodbus client (or connection) of the ISG.
+        slave: Unit ID.
+        cache: Optional ModelCache consulted before and updated after
+            probing.
+        key: Key of the unit in the cache, defaults to host:port/unit of
+            the client, if it has a host.
+
+    Raises:
+        DetectionError: If the unit answered no probe.
+    """
+    key = cache_key(conn, slave) if key is None else key
+    model = _cached(cache, key)
+    if model is not None:
+        return model
+    for probe_model, function, address, count in PROBES:
+        response = getattr(conn, function)(
+            unit=slave, address=address, count=count)
+        if _answered(response, count):
+            model = probe_model
+            break
+    return _detected(cache, key, model, slave)
+
+
+async def async_detect_model(conn, slave, cache=None, key=None):
+    """Return the model of a unit, for asyncio clients, see detect_model."""
+    key = cache_key(conn, slave) if key is None else key
+    model = _cached(cache, key)
+    if model is not None:
+        return model
+    for probe_model, function, address, count in PROBES:
+        response = await getattr(conn, function)(
+            unit=slave, address=address, count=count)
+        if _answered(response, count):
+            model = probe_model
+            break
+    return _detected(cache, key, model, slave)
@@ -0,0 +1,302 @@
+"""
+Prometheus exporter of a unit.
+
+    python -m pystiebeleltron.exporter --host 192.168.1.20 --wpm3i
+
+polls the unit every 30 seconds and serves the metrics on
+http://localhost:9563/metrics:
+- stiebel_eltron_register: converted value of each available register
+- stiebel_eltron_energy_kwh_total: energy counters (MWh * 1000 + kWh)
+- polls, request latency per block, failures, bytes transferred,
+  (re)connections and the age of the values per block
+
+The exposition text is kept as bytes. After a poll only the blocks whose
+raw values changed are rendered again, and a scrape only adds the age of
+the values to the cached text.
+"""
+import argparse
+import http.server
+import socketserver
+import threading
+import time
+
+from pystiebeleltron.decode import available
+from pystiebeleltron.instrument import Histogram
+
+DEFAULT_PORT = 9563
+DEFAULT_INTERVAL = 30
+PREFIX = 'stiebel_eltron'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Upper bounds of the poll duration histogram buckets in seconds
+POLL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+
+def _sample(name, labels, value):
+    """Return an exposition line, labels is a list of 'key="value"'."""
+    if labels:
+        return '{}{{{}}} {}\n'.format(name, ','.join(labels), _format(value))
+    return '{} {}\n'.format(name, _format(value))
+
+
+def _header(name, kind, text):
+    return '# HELP {} {}\n# TYPE {} {}\n'.format(name, text, name, kind)
+
+
+def _histogram(name, labels, histogram):
+    lines = [_sample(name + '_bucket', labels + ['le="{}"'.format(
+                 _format(bound))], count)
+             for bound, count in histogram.cumulative()]
+    lines.append(_sample(name + '_sum', labels, histogram.sum))
+    lines.append(_sample(name + '_count', labels, histogram.count))
+    return ''.join(lines)
+
+
+class Exporter(object):
+    """Renders the values and statistics of an API as Prometheus metrics."""
+
+    def __init__(self, api, labels=None, prefix=PREFIX):
+        """Initialize the exporter.
+
+        Args:
+            api: StiebelEltronAPI to poll, ideally with instrument=True.
+            labels: Dict of labels added to all metrics, e.g. the unit.
+            prefix: Prefix of the metric names.
+        """
+        self._api = api
+        self._prefix = prefix
+        self._labels = ['{}="{}"'.format(key, _escape(value))
+                        for key, value in sorted((labels or {}).items())]
+        blocks = api._schema.blocks
+        # Energy counters per block: (counter, kWh register, MWh register)
+        self._counters = []
+        for block in blocks:
+            names = {register.name: register for register in block.registers}
+            self._counters.append([
+                (name[:-len('__KWH')], register,
+                 names[name[:-len('KWH')] + 'MWH'])
+                for name, register in sorted(names.items())
+                if name.endswith('TOTAL__KWH') and
+                name[:-len('KWH')] + 'MWH' in names])
+        # Raw values and exposition bytes of each block, as rendered last
+        self._rendered = [None] * len(blocks)
+        self._register_lines = [b''] * len(blocks)
+        self._counter_lines = [b''] * len(blocks)
+        self._body = b''
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.poll_failures = 0
+        self.poll_duration = Histogram(POLL_BUCKETS)
+        self._polled = False
+        self.refresh()
+
+    def poll(self):
+        """Update the API and the metrics. Returns success."""
+        start = time.monotonic()
+        try:
+            success = self._api.update()
+        except Exception as err:  # A failing unit must not stop exporting
+            print("Poll failed: {}".format(err))
+            success = False
+        self.poll_duration.observe(time.monotonic() - start)
+        self.polls += 1
+        if success:
+            self._polled = True
+        else:
+            self.poll_failures += 1
+        self.refresh()
+        return success
+
+    def _render_block(self, block, buffer):
+        name = self._prefix + '_register'
+        self._register_lines[block.index] = ''.join(
+            _sample(name, ['name="{}"'.format(register.name)] + self._labels,
+                    register.decode(buffer[register.offset]))
+            for register in block.registers
+            if available(register, buffer[register.offset])).encode()
+        name = self._prefix + '_energy_kwh_total'
+        self._counter_lines[block.index] = ''.join(
+            _sample(name, ['counter="{}"'.format(counter)] + self._labels,
+                    buffer[mwh.offset] * 1000 + buffer[kwh.offset])
+            for counter, kwh, mwh in self._counters[block.index]).encode()
+
+    def _render_stats(self):
+        prefix = self._prefix
+        labels = self._labels
+        text = [
+            _header(prefix + '_polls_total', 'counter', 'Polls of the unit.'),
+            _sample(prefix + '_polls_total', labels, self.polls),
+            _header(prefix + '_poll_failures_total', 'counter',
+                    'Failed polls of the unit.'),
+            _sample(prefix + '_poll_failures_total', labels,
+                    self.poll_failures),
+            _header(prefix + '_poll_duration_seconds', 'histogram',
+                    'Duration of polls.'),
+            _histogram(prefix + '_poll_duration_seconds', labels,
+                       self.poll_duration),
+        ]
+        stats = self._api.stats
+        if stats is not None:
+            blocks = [(['block="{}"'.format(index + 1)] + labels, block)
+                      for index, block in enumerate(stats.blocks)]
+            text.append(_header(prefix + '_request_duration_seconds',
+                                'histogram', 'Latency of requests.'))
+            text.extend(_histogram(prefix + '_request_duration_seconds',
+                                   block_labels, block.latency)
+                        for block_labels, block in blocks)
+            text.append(_header(prefix + '_requests_total', 'counter',
+                                'Requests.'))
+            text.extend(_sample(prefix + '_requests_total', block_labels,
+                                block.requests)
+                        for block_labels, block in blocks)
+            text.append(_header(prefix + '_request_failures_total',
+                                'counter', 'Failed requests.'))
+            text.extend(_sample(prefix + '_request_failures_total',
+                                block_labels, block.failures)
+                        for block_labels, block in blocks)
+            text += [
+                _header(prefix + '_sent_bytes_total', 'counter',
+                        'Bytes of ModBus TCP requests.'),
+                _sample(prefix + '_sent_bytes_total', labels,
+                        stats.bytes_sent),
+                _header(prefix + '_received_bytes_total', 'counter',
+                        'Bytes of ModBus TCP responses.'),
+                _sample(prefix + '_received_bytes_total', labels,
+                        stats.bytes_received),
+            ]
+        connects = getattr(self._api._conn, 'connects', None)
+        if connects is not None:
+            text += [
+                _header(prefix + '_connections_total', 'counter',
+                        'Connections made to the ISG.'),
+                _sample(prefix + '_connections_total', labels, connects),
+                _header(prefix + '_reconnects_total', 'counter',
+                        'Connections made to the ISG after the first one.'),
+                _sample(prefix + '_reconnects_total', labels,
+                        max(0, connects - 1)),
+            ]
+        return ''.join(text).encode()
+
+    def refresh(self):
+        """Render the metrics of the current values and statistics."""
+        if self._polled:
+            for block, buffer in zip(self._api._schema.blocks,
+                                     self._api._values.buffers):
+                rendered = self._rendered[block.index]
+                # Published buffers are never modified, see RegisterStore
+                if buffer is not rendered and buffer != rendered:
+                    self._render_block(block, buffer)
+                self._rendered[block.index] = buffer
+        parts = [_header(self._prefix + '_register', 'gauge',
+                         'Converted value of a register.').encode()]
+        parts += self._register_lines
+        if any(self._counters):
+            parts.append(_header(self._prefix + '_energy_kwh_total',
+                                 'counter', 'Energy counter in kWh.')
+                         .encode())
+            parts += self._counter_lines
+        parts.append(self._render_stats())
+        body = b''.join(parts)
+        with self._lock:
+            self._body = body
+
+    def render(self):
+        """Return the exposition text."""
+        with self._lock:
+            body = self._body
+        now = time.monotonic()
+        name = self._prefix + '_snapshot_age_seconds'
+        ages = [_sample(name, ['block="{}"'.format(index + 1)] + self._labels,
+                        round(now - acquired, 3))
+                for index, acquired in enumerate(self._api._acquired)
+                if acquired is not None]
+        if not ages:
+            return body
+        return body + (_header(name, 'gauge', 'Age of the values.') +
+                       ''.join(ages)).encode()
+
+    def run(self, interval=DEFAULT_INTERVAL, stop=None):
+        """Poll every interval seconds until the stop event is set."""
+        stop = stop if stop is not None else threading.Event()
+        while not stop.is_set():
+            start = time.monotonic()
+            self.poll()
+            stop.wait(max(0, interval - (time.monotonic() - start)))
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.exporter.render()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """HTTP server of the metrics of an Exporter."""
+
+    daemon_threads = True
+
+    def __init__(self, exporter, address='', port=DEFAULT_PORT):
+        self.exporter = exporter
+        super().__init__((address, port), _Handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the values of a unit to Prometheus.")
+    parser.add_argument('--host', required=True, help="address of the ISG")
+    parser.add_argument('--port', type=int, default=502)
+    parser.add_argument('--unit', type=int, default=1)
+    parser.add_argument('--wpm3i', action='store_true',
+                        help="the unit is a WPM3i heat pump")
+    parser.add_argument('--timeout', type=float, default=2,
+                        help="seconds to wait for a response")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help="seconds between polls")
+    parser.add_argument('--listen-address', default='')
+    parser.add_argument('--listen-port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    from pymodbus.client.sync import ModbusTcpClient
+
+    from pystiebeleltron.connection import ManagedConnection
+    from pystiebeleltron.pystiebeleltron import StiebelEltronAPI
+
+    conn = ManagedConnection(lambda: ModbusTcpClient(
+        host=args.host, port=args.port, timeout=args.timeout))
+    api = StiebelEltronAPI(conn, args.unit, is_wpm3i=args.wpm3i,
+                           instrument=True)
+    exporter = Exporter(api, labels={'host': args.host, 'unit': args.unit})
+    threading.Thread(target=exporter.run, args=(args.interval,),
+                     name='Poller', daemon=True).start()
+    server = MetricsServer(exporter, args.listen_address, args.listen_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
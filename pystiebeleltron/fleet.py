@@ -0,0 +1,178 @@
+"""
+Concurrent polling of many units on a single asyncio event loop.
+
+Example:
+
+    poller = FleetPoller([('192.168.1.20', 502, 1, False),
+                          ('192.168.1.21', 502, 1, True)])
+    async for result in poller.poll():
+        print(result.target.host, result.success,
+              result.api.get_conv_val('OUTSIDE_TEMPERATURE'))
+"""
+import asyncio
+import functools
+import time
+from collections import namedtuple
+
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.connection import AsyncManagedConnection
+from pystiebeleltron.detect import async_detect_model
+
+# Maximum number of units polled at the same time
+DEFAULT_MAX_CONCURRENCY = 100
+# Seconds after which polling a unit is given up
+DEFAULT_TIMEOUT = 10
+
+# A unit behind an ISG. is_wpm3i None detects the model on the first poll.
+Target = namedtuple('Target', ['host', 'port', 'slave', 'is_wpm3i'])
+
+# Outcome of polling a unit. `api` holds the values read (None if the model
+# could not be detected), `error` the exception of a failed poll, if any.
+PollResult = namedtuple(
+    'PollResult', ['target', 'api', 'success', 'error', 'duration'])
+
+
+async def open_connection(host, port):
+    """Connect pymodbus' asyncio client protocol to an ISG."""
+    from pymodbus.client.asynchronous.async_io import ModbusClientProtocol
+
+    loop = asyncio.get_event_loop()
+    _, protocol = await loop.create_connection(
+        lambda: ModbusClientProtocol(host=host, port=port), host, port)
+    return protocol
+
+
+class _Gateway(AsyncManagedConnection):
+    """Managed connection to an ISG, shared by all its units.
+
+    The lock allows a single unit to be polled at a time.
+    """
+
+    def __init__(self, connect, host, port, **kwargs):
+        super().__init__(functools.partial(connect, host, port), **kwargs)
+        self.lock = asyncio.Lock()
+
+
+class FleetPoller(object):
+    """Polls many units concurrently.
+
+    At most max_concurrency units are polled at the same time, and a single
+    unit per ISG. Unreachable ISGs fail fast once their circuit breaker is
+    open, see connection.AsyncManagedConnection.
+    """
+
+    def __init__(self, targets, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT, connect=open_connection,
+                 connection_options=None, model_cache=None, profiles=None,
+                 **api_kwargs):
+        """Initialize the poller.
+
+        Args:
+            targets: Iterable of (host, port, slave, is_wpm3i), is_wpm3i
+                None to detect the model.
+            max_concurrency: Maximum number of units polled at once.
+            timeout: Seconds after which polling a unit is given up.
+            connect: Coroutine function (host, port) returning a connected
+                asyncio ModBus client, defaults to pymodbus.
+            connection_options: Arguments of the AsyncManagedConnection
+                per ISG, e.g. idle_timeout or breaker settings.
+            model_cache: Optional detect.ModelCache of detected models,
+                keyed by host:port/slave.
+            profiles: Optional dict of host:port/slave to scan.DeviceProfile,
+                registers a unit does not populate are not requested.
+            api_kwargs: Further arguments of the AsyncStiebelEltronAPIs.
+        """
+        self.targets = [Target(*target) for target in targets]
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._connect = connect
+        self._connection_options = connection_options or {}
+        self._model_cache = model_cache
+        self._profiles = profiles or {}
+        self._api_kwargs = api_kwargs
+        self._gateways = {}
+        self._apis = {}
+
+    def _gateway(self, target):
+        """Return the connection to the ISG of a unit."""
+        gateway = self._gateways.get((target.host, target.port))
+        if gateway is None:
+            gateway = _Gateway(self._connect, target.host, target.port,
+                               **self._connection_options)
+            self._gateways[(target.host, target.port)] = gateway
+        return gateway
+
+    @staticmethod
+    def _key(target):
+        return '{}:{}/{}'.format(target.host, target.port, target.slave)
+
+    def _new_api(self, target, is_wpm3i):
+        api = AsyncStiebelEltronAPI(
+            self._gateway(target), target.slave, is_wpm3i=is_wpm3i,
+            profile=self._profiles.get(self._key(target)),
+            **self._api_kwargs)
+        self._apis[target] = api
+        return api
+
+    async def _detect(self, target):
+        """Return the API of a unit of unknown model, detecting it."""
+        model = await async_detect_model(
+            self._gateway(target), target.slave, self._model_cache,
+            self._key(target))
+        return self._new_api(target, model == 'wpm3i')
+
+    async def _update(self, api, target):
+        if api is None:
+            api = await self._detect(target)
+        return api, await api.update()
+
+    async def _poll(self, target, semaphore):
+        gateway = self._gateway(target)
+        api = self._apis.get(target)
+        if api is None:
+            is_wpm3i = target.is_wpm3i
+            profile = self._profiles.get(self._key(target))
+            if is_wpm3i is None and profile is not None:
+                is_wpm3i = profile.model == 'wpm3i'
+            if is_wpm3i is not None:
+                api = self._new_api(target, is_wpm3i)
+        async with gateway.lock, semaphore:
+            start = time.monotonic()
+            error = None
+            try:
+                api, success = await asyncio.wait_for(
+                    self._update(api, target), self._timeout)
+            except Exception as err:  # A failing unit must not stop the fleet
+                success = False
+                error = err
+            if error is None and not success:
+                # Failed reads return False, see StiebelEltronAPI.last_error
+                error = api.last_error
+            return PollResult(target, api, success, error,
+                              time.monotonic() - start)
+
+    async def poll(self):
+        """Poll all units once, yielding a PollResult per unit when done."""
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        tasks = [asyncio.ensure_future(self._poll(target, semaphore))
+                 for target in self.targets]
+        try:
+            for result in asyncio.as_completed(tasks):
+                yield await result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, callback, interval):
+        """Poll all units every interval seconds, calling callback(result)."""
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            async for result in self.poll():
+                callback(result)
+            await asyncio.sleep(max(0, interval - (loop.time() - start)))
+
+    def close(self):
+        """Close all connections."""
+        for gateway in self._gateways.values():
+            gateway.close()
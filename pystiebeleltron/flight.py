@@ -0,0 +1,134 @@
+"""
+Single-flight coalescing of the reads of an API.
+
+At most one read of a unit is in flight at a time. Callers arriving while a
+read is running wait for it. If it reads all blocks they need, they share
+its result instead of requesting the unit again; otherwise they start their
+own read once it finished. Many threads or coroutines calling getters with
+update_on_read thus cost one request per block, not one per caller.
+
+The caller running a read can pass `then`, which is called once the flight
+finished and the waiting callers were released. Callbacks of subscriptions
+run there, so they may read the API (and start a read) themselves.
+"""
+import threading
+
+
+class _Flight(object):
+    """A running read and the blocks it reads completely."""
+
+    __slots__ = ('blocks', 'done', 'result', 'error')
+
+    def __init__(self, blocks, done):
+        self.blocks = blocks
+        self.done = done
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Single-flight reads of threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flight = None
+        # Reads run and callers which shared the result of another one
+        self.flights = 0
+        self.joined = 0
+
+    def run(self, needed, blocks, read, then=None):
+        """Run a read, or share the result of one in flight.
+
+        Args:
+            needed: Indexes of the blocks the caller needs.
+            blocks: Indexes of the blocks the read reads completely.
+            read: Callable doing the read.
+            then: Callable called with the result of a read of this caller,
+                once the flight finished. Not called when joining a flight
+                or if the read raised.
+
+        Returns:
+            The result of read, or of the read in flight which was joined.
+        """
+        while True:
+            with self._lock:
+                flight = self._flight
+                if flight is None:
+                    flight = self._flight = _Flight(
+                        frozenset(blocks), threading.Event())
+                    self.flights += 1
+                    break
+            flight.done.wait()
+            if needed <= flight.blocks:
+                self.joined += 1
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+        try:
+            flight.result = read()
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.done.set()
+        if then is not None:
+            then(flight.result)
+        return flight.result
+
+
+class AsyncSingleFlight(object):
+    """Single-flight reads of coroutines on one event loop."""
+
+    def __init__(self):
+        self._flight = None
+        self.flights = 0
+        self.joined = 0
+
+    async def run(self, needed, blocks, read, then=None):
+        """Run a read, or share the result of one in flight.
+
+        Args:
+            needed: Indexes of the blocks the caller needs.
+            blocks: Indexes of the blocks the read reads completely.
+            read: Coroutine function doing the read.
+            then: Callable called with the result of a read of this caller,
+                once the flight finished. Not called when joining a flight
+                or if the read raised.
+
+        Returns:
+            The result of read, or of the read in flight which was joined.
+        """
+        # Imported here, asyncio takes longer to import than the sync API
+        import asyncio
+
+        while self._flight is not None:
+            flight = self._flight
+            # Unlike awaiting it, waiting does not cancel the read when the
+            # caller is cancelled
+            await asyncio.wait([flight.done])
+            if flight.done.cancelled() or not needed <= flight.blocks:
+                continue
+            self.joined += 1
+            return flight.done.result()
+        flight = self._flight = _Flight(
+            frozenset(blocks), asyncio.get_event_loop().create_future())
+        self.flights += 1
+        try:
+            result = await read()
+        except asyncio.CancelledError:
+            flight.done.cancel()
+            raise
+        except BaseException as err:
+            flight.done.set_exception(err)
+            # Raised here, do not log it as never retrieved
+            flight.done.exception()
+            raise
+        else:
+            flight.done.set_result(result)
+        finally:
+            self._flight = None
+        if then is not None:
+            then(result)
+        return result
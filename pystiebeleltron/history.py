@@ -0,0 +1,105 @@
+"""
+Bounded history of raw register snapshots.
+
+A History keeps the last `capacity` snapshots of all blocks in preallocated
+arrays: the raw words of a snapshot form one row of a contiguous uint16
+array, its monotonic timestamp is stored alongside. Appending overwrites the
+oldest row, no objects are created per sample.
+
+    api = StiebelEltronAPI(conn, 1, history=720)
+    ...
+    times, values = api.history.series('OUTSIDE_TEMPERATURE', count=60)
+"""
+import bisect
+import time
+from array import array
+
+
+class History(object):
+    """Ring buffer of timestamped raw snapshots of a schema's blocks."""
+
+    def __init__(self, schema, capacity):
+        """Initialize the history.
+
+        Args:
+            schema: RegisterSchema of the snapshots.
+            capacity: Maximum number of snapshots kept.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self._schema = schema
+        self.capacity = capacity
+        # Row offset of each block
+        self._offsets = []
+        width = 0
+        for block in schema.blocks:
+            self._offsets.append(width)
+            width += block.count
+        self._width = width
+        self._words = array('H', bytes(2 * width * capacity))
+        self._times = array('d', bytes(8 * capacity))
+        self._next = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, buffers, timestamp=None):
+        """Record a snapshot of the block buffers (see RegisterStore)."""
+        row = self._next * self._width
+        for offset, buffer in zip(self._offsets, buffers):
+            start = row + offset
+            self._words[start:start + len(buffer)] = buffer
+        self._times[self._next] = time.monotonic() if timestamp is None \
+            else timestamp
+        self._next = (self._next + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def clear(self):
+        """Drop all snapshots."""
+        self._next = 0
+        self._len = 0
+
+    def _column(self, data, width, column, count):
+        """Return the last count entries of a column, oldest first."""
+        start = (self._next - count) % self.capacity
+        if start + count <= self.capacity:
+            return data[start * width + column:
+                        (start + count) * width:width]
+        return data[start * width + column::width] + \
+            data[column:self._next * width:width]
+
+    def _count(self, count=None, since=None):
+        """Return the number of latest snapshots selected."""
+        selected = self._len if count is None else min(count, self._len)
+        if since is not None:
+            times = self._column(self._times, 1, 0, selected)
+            selected -= bisect.bisect_left(times, since)
+        return selected
+
+    def times(self, count=None, since=None):
+        """Return the timestamps of the selected snapshots, oldest first.
+
+        Args:
+            count: Select at most the latest count snapshots.
+            since: Select the snapshots taken at or after this monotonic
+                time.
+        """
+        return self._column(self._times, 1, 0, self._count(count, since))
+
+    def raw(self, key, count=None, since=None):
+        """Return the raw values of a register (name or address) as array."""
+        register = self._schema[key]
+        column = self._offsets[register.block] + register.offset
+        return self._column(self._words, self._width, column,
+                            self._count(count, since))
+
+    def values(self, key, count=None, since=None):
+        """Return the converted values of a register, oldest first."""
+        decode = self._schema[key].decode
+        return [decode(raw) for raw in self.raw(key, count, since)]
+
+    def series(self, key, count=None, since=None):
+        """Return the timestamps and converted values of a register."""
+        selected = self._count(count, since)
+        return self.times(selected), self.values(key, selected)
@@ -0,0 +1,215 @@
+"""
+Instrumentation of the ModBus requests of an API.
+
+An InstrumentedConnection wraps the connection of an API and counts the
+requests, failures and bytes transferred, and the request latency per
+block. StiebelEltronAPI(..., instrument=True) wraps its connection and
+provides the statistics as `api.stats`.
+"""
+import bisect
+import time
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# ModBus TCP frame sizes in bytes: MBAP header, read request, read response
+# without registers, exception response and single write
+MBAP_SIZE = 7
+READ_REQUEST_SIZE = MBAP_SIZE + 5
+READ_RESPONSE_SIZE = MBAP_SIZE + 2
+EXCEPTION_RESPONSE_SIZE = MBAP_SIZE + 2
+WRITE_SIZE = MBAP_SIZE + 5
+
+
+class Histogram(object):
+    """Histogram of observed values with fixed buckets."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Observations per bucket, the last one is unbounded
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Return (upper bound, observations up to it), ending with inf."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class BlockStats(object):
+    """Requests of a block."""
+
+    __slots__ = ('latency', 'requests', 'failures')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.latency = Histogram(buckets)
+        self.requests = 0
+        self.failures = 0
+
+
+class ConnectionStats(object):
+    """Statistics of the requests of an API, per block of its schema."""
+
+    def __init__(self, schema, buckets=LATENCY_BUCKETS):
+        self._schema = schema
+        self.blocks = [BlockStats(buckets) for _ in schema.blocks]
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def _block(self, address):
+        for block in self._schema.blocks:
+            if block.start <= address < block.start + block.count:
+                return self.blocks[block.index]
+        return None
+
+    @property
+    def requests(self):
+        return sum(block.requests for block in self.blocks)
+
+    @property
+    def failures(self):
+        return sum(block.failures for block in self.blocks)
+
+    def record(self, address, duration, sent, received, failed):
+        """Record a request to a register address."""
+        self.bytes_sent += sent
+        self.bytes_received += received
+        block = self._block(address)
+        if block is not None:
+            block.latency.observe(duration)
+            block.requests += 1
+            if failed:
+                block.failures += 1
+
+
+def _failed(response):
+    if isinstance(response, Exception):
+        return True
+    is_error = getattr(response, 'isError', None)
+    return is_error is not None and is_error()
+
+
+def _received(response, count):
+    """Return the size of a read response frame, 0 if none was received."""
+    if isinstance(response, Exception):
+        return 0
+    if getattr(response, 'registers', None) is None:
+        return EXCEPTION_RESPONSE_SIZE
+    return READ_RESPONSE_SIZE + 2 * count
+
+
+class InstrumentedConnection(object):
+    """Connection recording statistics of the requests to another one."""
+
+    def __init__(self, conn, schema, stats=None):
+        """Initialize the connection.
+
+        Args:
+            conn: Connection to instrument, e.g. a ManagedConnection.
+            schema: RegisterSchema assigning addresses to blocks.
+            stats: ConnectionStats to record to, defaults to new ones.
+        """
+        self._conn = conn
+        self.stats = stats if stats is not None else \
+            ConnectionStats(schema)
+
+    @property
+    def connects(self):
+        """Connections made by the wrapped connection, if it counts them."""
+        return getattr(self._conn, 'connects', None)
+
+    def _raised(self, address, start, sent):
+        self.stats.record(address, time.monotonic() - start, sent, 0, True)
+
+    def _read_done(self, address, count, start, response):
+        self.stats.record(address, time.monotonic() - start,
+                          READ_REQUEST_SIZE, _received(response, count),
+                          _failed(response) or
+                          getattr(response, 'registers', None) is None)
+        return response
+
+    def _write_done(self, address, start, sent, response):
+        failed = _failed(response)
+        if isinstance(response, Exception):
+            received = 0
+        else:
+            received = EXCEPTION_RESPONSE_SIZE if failed else WRITE_SIZE
+        self.stats.record(address, time.monotonic() - start, sent, received,
+                          failed)
+        return response
+
+    def _read(self, name, address, count, unit):
+        start = time.monotonic()
+        try:
+            response = getattr(self._conn, name)(
+                unit=unit, address=address, count=count)
+        except Exception:
+            self._raised(address, start, READ_REQUEST_SIZE)
+            raise
+        return self._read_done(address, count, start, response)
+
+    def _write(self, name, address, sent, unit, **kwargs):
+        start = time.monotonic()
+        try:
+            response = getattr(self._conn, name)(
+                unit=unit, address=address, **kwargs)
+        except Exception:
+            self._raised(address, start, sent)
+            raise
+        return self._write_done(address, start, sent, response)
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._read('read_input_registers', address, count, unit)
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._read('read_holding_registers', address, count, unit)
+
+    def write_register(self, address, value, unit=0):
+        return self._write('write_register', address, WRITE_SIZE, unit,
+                           value=value)
+
+    def write_registers(self, address, values, unit=0):
+        return self._write('write_registers', address,
+                           WRITE_SIZE + 1 + 2 * len(values), unit,
+                           values=values)
+
+    def close(self):
+        close = getattr(self._conn, 'close', None)
+        if close is not None:
+            close()
+
+
+class AsyncInstrumentedConnection(InstrumentedConnection):
+    """InstrumentedConnection of an asyncio connection."""
+
+    async def _read(self, name, address, count, unit):
+        start = time.monotonic()
+        try:
+            response = await getattr(self._conn, name)(
+                unit=unit, address=address, count=count)
+        except Exception:
+            self._raised(address, start, READ_REQUEST_SIZE)
+            raise
+        return self._read_done(address, count, start, response)
+
+    async def _write(self, name, address, sent, unit, **kwargs):
+        start = time.monotonic()
+        try:
+            response = await getattr(self._conn, name)(
+                unit=unit, address=address, **kwargs)
+        except Exception:
+            self._raised(address, start, sent)
+            raise
+        return self._write_done(address, start, sent, response)
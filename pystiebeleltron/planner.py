@@ -0,0 +1,60 @@
+"""
+Planning of the read requests needed for a set of registers.
+
+Registers of a block are read with as few requests as possible: ranges
+closer than a gap threshold are merged, as reading a few unused registers is
+cheaper than another round trip, and requests are split at the Modbus limit
+of 125 registers per read. Requests never span more than one block, nor
+addresses the unit is known not to answer.
+"""
+from collections import namedtuple
+
+# Maximum number of registers of a single read request (Modbus limit)
+MAX_READ_COUNT = 125
+# Unused registers which may be read to merge two ranges into one request
+DEFAULT_MAX_GAP = 10
+
+# A single read request of `count` registers starting at `address`.
+ReadRequest = namedtuple('ReadRequest', ['block', 'address', 'count'])
+
+
+def plan_reads(schema, registers=None, max_gap=DEFAULT_MAX_GAP,
+               max_count=MAX_READ_COUNT, unreadable=()):
+    """Compute the read requests covering the given registers.
+
+    Args:
+        schema: RegisterSchema the registers belong to.
+        registers: Iterable of register names or addresses to read,
+            defaults to all registers of the schema.
+        max_gap: Maximum number of unneeded registers read to merge two
+            ranges into a single request.
+        max_count: Maximum number of registers per request.
+        unreadable: Addresses the unit does not answer, e.g. from a
+            scan.DeviceProfile. Ranges are not merged across them.
+
+    Returns:
+        List of ReadRequest, ordered by block and address.
+    """
+    if registers is None:
+        addresses = {register.addr for register in schema}
+    else:
+        addresses = {schema[key].addr for key in registers}
+
+    requests = []
+    for block in schema.blocks:
+        start = end = None
+        for register in block.registers:
+            addr = register.addr
+            if addr not in addresses:
+                continue
+            if start is not None and addr - end - 1 <= max_gap and \
+                    addr - start < max_count and not any(
+                        gap in unreadable for gap in range(end + 1, addr)):
+                end = addr
+                continue
+            if start is not None:
+                requests.append(ReadRequest(block, start, end - start + 1))
+            start = end = addr
+        if start is not None:
+            requests.append(ReadRequest(block, start, end - start + 1))
+    return requests
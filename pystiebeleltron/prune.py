@@ -0,0 +1,117 @@
+"""
+Pruning of registers a unit persistently reports as unavailable.
+
+Registers of components an installation lacks (HC2, solar, cooling, ...)
+read UNAVAILABLE_OBJECT or ERROR_NOTAVAILABLE on every poll. After a number
+of consecutive such reads, a Pruner drops a register from the reads of the
+API and only reads it again when a recheck is due. The interval between
+rechecks doubles each time the register is still unavailable, up to a
+maximum. A register reading a value again is read on every poll again.
+"""
+import time
+
+from pystiebeleltron.decode import SIGNED_TYPES
+from pystiebeleltron.registers import ERROR_NOTAVAILABLE, UNAVAILABLE_OBJECT
+
+# Seconds until the first recheck of a pruned register
+DEFAULT_RECHECK_INTERVAL = 600
+# Maximum seconds between rechecks
+DEFAULT_MAX_RECHECK_INTERVAL = 24 * 3600
+
+
+def unavailable(register, raw):
+    """Return whether a raw value tells that the unit lacks a register.
+
+    Only signed registers are considered, for unsigned ones like status
+    bits 0x8000 is a valid value.
+    """
+    return register.type in SIGNED_TYPES and (
+        raw == UNAVAILABLE_OBJECT or
+        register.decode(raw) == ERROR_NOTAVAILABLE)
+
+
+class Pruner(object):
+    """Tracks unavailable registers and when to recheck pruned ones."""
+
+    def __init__(self, schema, after,
+                 recheck_interval=DEFAULT_RECHECK_INTERVAL,
+                 max_recheck_interval=DEFAULT_MAX_RECHECK_INTERVAL,
+                 clock=time.monotonic):
+        """Initialize the pruner.
+
+        Args:
+            schema: RegisterSchema of the unit.
+            after: Number of consecutive unavailable reads after which a
+                register is pruned.
+            recheck_interval: Seconds until the first recheck.
+            max_recheck_interval: Maximum seconds between rechecks.
+            clock: Callable returning monotonic seconds.
+        """
+        self.schema = schema
+        self.after = after
+        self.recheck_interval = recheck_interval
+        self.max_recheck_interval = max_recheck_interval
+        self.clock = clock
+        # Consecutive unavailable reads by address
+        self._misses = {}
+        # Pruned registers by address: [next recheck, interval]
+        self._pruned = {}
+
+    @property
+    def pruned(self):
+        """Addresses of the pruned registers."""
+        return frozenset(self._pruned)
+
+    def excluded(self, now=None):
+        """Return the addresses of pruned registers not due for a recheck."""
+        if not self._pruned:
+            return frozenset()
+        if now is None:
+            now = self.clock()
+        return frozenset(addr for addr, (due, _) in self._pruned.items()
+                         if due > now)
+
+    def observe(self, plan, buffers, now=None):
+        """Count the unavailable registers read by a plan.
+
+        Args:
+            plan: ReadRequests which were read.
+            buffers: Block buffers holding the values read.
+            now: Monotonic time of the read, defaults to now.
+
+        Returns:
+            True if registers were pruned or are read again.
+        """
+        if now is None:
+            now = self.clock()
+        changed = False
+        misses = self._misses
+        pruned = self._pruned
+        for request in plan:
+            block = request.block
+            buffer = buffers[block.index]
+            end = request.address + request.count
+            for register in block.registers:
+                addr = register.addr
+                if not request.address <= addr < end:
+                    continue
+                if not unavailable(register, buffer[register.offset]):
+                    misses.pop(addr, None)
+                    if pruned.pop(addr, None) is not None:
+                        changed = True
+                    continue
+                recheck = pruned.get(addr)
+                if recheck is not None:
+                    if recheck[0] <= now:
+                        # Still unavailable, back off
+                        recheck[1] = min(2 * recheck[1],
+                                         self.max_recheck_interval)
+                        recheck[0] = now + recheck[1]
+                    continue
+                misses[addr] = misses.get(addr, 0) + 1
+                if misses[addr] >= self.after:
+                    del misses[addr]
+                    pruned[addr] = [now + self.recheck_interval,
+                                    self.recheck_interval]
+                    changed = True
+        return changed
@@ -16,90 +16,30 @@ type | range      | for reading | for writing |        | size 1 | size 5
      |  327.67    |             |             |        |        |
 8    | 0 to 255   | 1           | 1           | No     | 1      | 5
 """
-
-# Error - sensor lead is missing or disconnected.
-ERROR_NOTAVAILABLE = -60
-# Error - short circuit of the sensor lead.
-ERROR_SHORTCUT = -50
-# Error - object unavailable.
-ERROR_OBJ_UNAVAILBLE = 0x8000
-
-UNAVAILABLE_OBJECT = 32768
-
-# Block 1 System values (Read input register) - page 29
-B1_START_ADDR = 0
-
-B1_REGMAP_INPUT = {
-    # HC = Heating Circuit
-    'ACTUAL_ROOM_TEMPERATURE_HC1':      {'addr':  0, 'type': 2, 'value': 0},
-    'SET_ROOM_TEMPERATURE_HC1':         {'addr':  1, 'type': 2, 'value': 0},
-    'RELATIVE_HUMIDITY_HC1':            {'addr':  2, 'type': 2, 'value': 0},
-    'ACTUAL_ROOM_TEMPERATURE_HC2':      {'addr':  3, 'type': 2, 'value': 0},
-    'SET_ROOM_TEMPERATURE_HC2':         {'addr':  4, 'type': 2, 'value': 0},
-    'RELATIVE_HUMIDITY_HC2':            {'addr':  5, 'type': 2, 'value': 0},
-    'OUTSIDE_TEMPERATURE':              {'addr':  6, 'type': 2, 'value': 0},
-    'ACTUAL_VALUE_HC1':                 {'addr':  7, 'type': 2, 'value': 0},
-    'SET_VALUE_HC1':                    {'addr':  8, 'type': 2, 'value': 0},
-    'ACTUAL_VALUE_HC2':                 {'addr':  9, 'type': 2, 'value': 0},
-    'SET_VALUE_HC2':                    {'addr': 10, 'type': 2, 'value': 0},
-    'FLOW_TEMPERATURE':                 {'addr': 11, 'type': 2, 'value': 0},
-    'RETURN_TEMPERATURE':               {'addr': 12, 'type': 2, 'value': 0},
-    'PRESSURE_HEATING_CIRCUIT':         {'addr': 13, 'type': 2, 'value': 0},
-    'FLOW_RATE':                        {'addr': 14, 'type': 2, 'value': 0},
-    'ACTUAL_DHW_TEMPERATURE':           {'addr': 15, 'type': 2, 'value': 0},
-    'SET_DHW_TEMPERATURE':              {'addr': 16, 'type': 2, 'value': 0},
-    'VENTILATION_AIR_ACTUAL_FAN_SPEED': {'addr': 17, 'type': 6, 'value': 0},
-    'VENTILATION_AIR_SET_FLOW_RATE':    {'addr': 18, 'type': 6, 'value': 0},
-    'EXTRACT_AIR_ACTUAL_FAN_SPEED':     {'addr': 19, 'type': 6, 'value': 0},
-    'EXTRACT_AIR_SET_FLOW_RATE':        {'addr': 20, 'type': 6, 'value': 0},
-    'EXTRACT_AIR_HUMIDITY':             {'addr': 21, 'type': 6, 'value': 0},
-    'EXTRACT_AIR_TEMPERATURE':          {'addr': 22, 'type': 2, 'value': 0},
-    'EXTRACT_AIR_DEW_POINT':            {'addr': 23, 'type': 2, 'value': 0},
-    'DEW_POINT_TEMPERATUR_HC1':         {'addr': 24, 'type': 2, 'value': 0},
-    'DEW_POINT_TEMPERATUR_HC2':         {'addr': 25, 'type': 2, 'value': 0},
-    'COLLECTOR_TEMPERATURE':            {'addr': 26, 'type': 2, 'value': 0},
-    'HOT_GAS_TEMPERATURE':              {'addr': 27, 'type': 2, 'value': 0},
-    'HIGH_PRESSURE':                    {'addr': 28, 'type': 7, 'value': 0},
-    'LOW_PRESSURE':                     {'addr': 29, 'type': 7, 'value': 0},
-    'COMPRESSOR_STARTS':                {'addr': 30, 'type': 6, 'value': 0},
-    'COMPRESSOR_SPEED':                 {'addr': 31, 'type': 2, 'value': 0},
-    'MIXED_WATER_AMOUNT':               {'addr': 32, 'type': 6, 'value': 0}
-}
-
-
-# Block 2 System parameters (Read/write holding register) - page 30
-B2_START_ADDR = 1000
-
-B2_REGMAP_HOLDING = {
-    'OPERATING_MODE':           {'addr': 1000, 'type': 8, 'value': 0},
-    'ROOM_TEMP_HEAT_DAY_HC1':   {'addr': 1001, 'type': 2, 'value': 0},
-    'ROOM_TEMP_HEAT_NIGHT_HC1': {'addr': 1002, 'type': 2, 'value': 0},
-    'MANUAL_SET_TEMP_HC1':      {'addr': 1003, 'type': 2, 'value': 0},
-    'ROOM_TEMP_HEAT_DAY_HC2':   {'addr': 1004, 'type': 2, 'value': 0},
-    'ROOM_TEMP_HEAT_NIGHT_HC2': {'addr': 1005, 'type': 2, 'value': 0},
-    'MANUAL_SET_TEAMP_HC2':     {'addr': 1006, 'type': 2, 'value': 0},
-    'GRADIENT_HC1':             {'addr': 1007, 'type': 7, 'value': 0},
-    'LOW_END_HC1':              {'addr': 1008, 'type': 2, 'value': 0},
-    'GRADIENT_HC2':             {'addr': 1009, 'type': 7, 'value': 0},
-    'LOW_END_HC2':              {'addr': 1010, 'type': 2, 'value': 0},
-    'DHW_TEMP_SET_DAY':         {'addr': 1011, 'type': 2, 'value': 0},
-    'DHW_TEMP_SET_NIGHT':       {'addr': 1012, 'type': 2, 'value': 0},
-    'DHW_TEMP_SET_MANUAL':      {'addr': 1013, 'type': 2, 'value': 0},
-    'MWM_SET_DAY':              {'addr': 1014, 'type': 6, 'value': 0},
-    'MWM_SET_NIGHT':            {'addr': 1015, 'type': 6, 'value': 0},
-    'MWM_SET_MANUAL':           {'addr': 1016, 'type': 6, 'value': 0},
-    'DAY_STAGE':                {'addr': 1017, 'type': 6, 'value': 0},
-    'NIGHT_STAGE':              {'addr': 1018, 'type': 6, 'value': 0},
-    'PARTY_STAGE':              {'addr': 1019, 'type': 6, 'value': 0},
-    'MANUAL_STAGE':             {'addr': 1020, 'type': 6, 'value': 0},
-    'ROOM_TEMP_COOL_DAY_HC1':   {'addr': 1021, 'type': 2, 'value': 0},
-    'ROOM_TEMP_COOL_NIGHT_HC1': {'addr': 1022, 'type': 2, 'value': 0},
-    'ROOM_TEMP_COOL_DAY_HC2':   {'addr': 1023, 'type': 2, 'value': 0},
-    'ROOM_TEMP_COOL_NIGHT_HC2': {'addr': 1024, 'type': 2, 'value': 0},
-    'RESET':                    {'addr': 1025, 'type': 6, 'value': 0},
-    'RESTART_ISG':              {'addr': 1026, 'type': 6, 'value': 0}
-}
-
+import collections
+import functools
+import threading
+import time
+
+from pystiebeleltron.accessors import values_class
+from pystiebeleltron.decode import bulk_decoder
+from pystiebeleltron.derived import DerivedMetrics
+from pystiebeleltron.detect import detect_model
+from pystiebeleltron.flight import SingleFlight
+from pystiebeleltron.history import History
+from pystiebeleltron.instrument import InstrumentedConnection
+from pystiebeleltron.planner import DEFAULT_MAX_GAP, plan_reads
+from pystiebeleltron.prune import DEFAULT_RECHECK_INTERVAL, Pruner
+from pystiebeleltron.registers import (  # noqa: F401
+    ERROR_NOTAVAILABLE, ERROR_SHORTCUT, ERROR_OBJ_UNAVAILBLE,
+    UNAVAILABLE_OBJECT, RegisterSchema, RegisterStore, load_regmaps,
+    model_schema)
+from pystiebeleltron.rollup import EnergyRollups
+from pystiebeleltron.snapshot import Snapshot
+from pystiebeleltron.subscribe import Subscription
+from pystiebeleltron.writes import WriteBatch
+
+# Values of the LWZ registers. The register maps are in data/lwz.regmap.
 B2_OPERATING_MODE_READ = {
     # AUTOMATIK
     11: 'AUTOMATIC',
@@ -132,15 +72,6 @@ B2_RESTART_ISG = {
     'MENU': 2
 }
 
-# Block 3 System status (Read input register) - page 31
-B3_START_ADDR = 2000
-
-B3_REGMAP_INPUT = {
-    'OPERATING_STATUS': {'addr': 2000, 'type': 6, 'value': 0},
-    'FAULT_STATUS':     {'addr': 2001, 'type': 6, 'value': 0},
-    'BUS_STATUS':       {'addr': 2002, 'type': 6, 'value': 0}
-}
-
 B3_OPERATING_STATUS = {
     'SWITCHING_PROGRAM_ENABLED': (1 << 0),
     'COMPRESSOR': (1 << 1),
@@ -172,124 +103,8 @@ B3_BUS_STATUS = {
     'PHYSICAL-ERROR': -4
 }
 
-# WPM 3(i) Block 1 System values (Read input register) - page 22-23
-#TODO: Istead of using A B C as the suffix to differentiate between registers use the comments in the datasheet
-#TODO: The addresses were out by one, 1 has been deducted from each. Why???
-WPM3i_B1_START_ADDR = 501-1
-
-WPM3i_B1_REGMAP_INPUT = {
-    'ACTUAL_TEMPERATURE_FE7':                       {'addr': 501-1, 'type': 2, 'value': 0},
-    'SET_TEMPERATURE_FE7':                          {'addr': 502-1, 'type': 2, 'value': 0},
-    'ACTUAL_TEMPERATURE_FEK':                       {'addr': 503-1, 'type': 2, 'value': 0},
-    'SET_TEMPERATURE_FEK':                          {'addr': 504-1, 'type': 2, 'value': 0},
-    'RELATIVE_HUMIDITY':                            {'addr': 505-1, 'type': 2, 'value': 0},
-    'DEW_POINT_TEMPERATURE':                        {'addr': 506-1, 'type': 2, 'value': 0},
-    'OUTSIDE_TEMPERATURE':                          {'addr': 507-1, 'type': 2, 'value': 0},
-    'ACTUAL_TEMPERATURE_HK_1':                      {'addr': 508-1, 'type': 2, 'value': 0},
-    'SET_TEMPERATURE_HK_1_A':                       {'addr': 509-1, 'type': 2, 'value': 0},
-    'SET_TEMPERATURE_HK_1_B':                       {'addr': 510-1, 'type': 2, 'value': 0},
-    'ACTUAL_TEMPERATURE_HK_2':                      {'addr': 511-1, 'type': 2, 'value': 0},
-    'SET_TEMPERATURE_HK_2':                         {'addr': 512-1, 'type': 2, 'value': 0},
-    'ACTUAL_FLOW_TEMPERATURE_WP':                   {'addr': 513-1, 'type': 2, 'value': 0},
-    'ACTUAL_FLOW_TEMPERATURE_NHZ':                  {'addr': 514-1, 'type': 2, 'value': 0},
-    'ACTUAL_FLOW_TEMPERATURE':                      {'addr': 515-1, 'type': 2, 'value': 0},
-    'ACTUAL_RETURN_TEMPERATURE':                    {'addr': 516-1, 'type': 2, 'value': 0},
-    'SET_FIXED_TEMPERATURE':                        {'addr': 517-1, 'type': 2, 'value': 0},
-    'ACTUAL_BUFFER_TEMPERATURE':                    {'addr': 518-1, 'type': 2, 'value': 0},
-    'SET_BUFFER_TEMPERATURE':                       {'addr': 519-1, 'type': 2, 'value': 0},
-    'HEATING_PRESSURE':                             {'addr': 520-1, 'type': 7, 'value': 0},
-    'FLOW_RATE':                                    {'addr': 521-1, 'type': 2, 'value': 0},
-    'DHW__ACTUAL_TEMPERATURE':                      {'addr': 522-1, 'type': 2, 'value': 0},
-    'DHW__SET_TEMPERATURE':                         {'addr': 523-1, 'type': 2, 'value': 0},
-    'COOLING__ACTUAL_TEMPERATURE_FAN':              {'addr': 524-1, 'type': 2, 'value': 0},
-    'COOLING__SET_TEMPERATURE_FAN':                 {'addr': 525-1, 'type': 2, 'value': 0},
-    'COOLING__ACTUAL_TEMPERATURE_AREA':             {'addr': 526-1, 'type': 2, 'value': 0},
-    'COOLING__SET_TEMPERATURE_AREA':                {'addr': 527-1, 'type': 2, 'value': 0},
-    'SOLAR_THERMAL__COLLECTOR_TEMPERATURE':         {'addr': 528-1, 'type': 2, 'value': 0},
-    'SOLAR_THERMAL__CYLINDER_TEMPERATURE':          {'addr': 529-1, 'type': 2, 'value': 0},
-    'SOLAR_THERMAL__RUNTIME':                       {'addr': 530-1, 'type': 6, 'value': 0},
-    'EXTERNAL_HEAT_SOURCE__ACTUAL_TEMPERATURE':     {'addr': 531-1, 'type': 2, 'value': 0},
-    'EXTERNAL_HEAT_SOURCE__SET_TEMPERATURE':        {'addr': 532-1, 'type': 2, 'value': 0},
-    'LOWER_HEATING_LIMIT__APPLICATION_LIMIT_HZG':   {'addr': 533-1, 'type': 2, 'value': 0},
-    'LOWER_DHW_LIMIT__APPLICATION_LIMIT_WW':        {'addr': 534-1, 'type': 2, 'value': 0},
-    'RUNTIME':                                      {'addr': 535-1, 'type': 6, 'value': 0},
-    'SOURCE_TEMPERATURE':                           {'addr': 536-1, 'type': 2, 'value': 0},
-    'MIN_SOURCE_TEMPERATURE':                       {'addr': 537-1, 'type': 2, 'value': 0},
-    'SOURCE_PRESSURE':                              {'addr': 538-1, 'type': 7, 'value': 0},
-    'HOT_GAS_TEMPERATURE':                          {'addr': 539-1, 'type': 2, 'value': 0},
-    'HIGH_PRESSURE':                                {'addr': 540-1, 'type': 2, 'value': 0},
-    'LOW_PRESSURE':                                 {'addr': 541-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_1__RETURN_TEMPERATURE':              {'addr': 542-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_1__FLOW_TEMPERATURE':                {'addr': 543-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_1__HOT_GAS_TEMPERATURE':             {'addr': 544-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_1__LOW_PRESSURE':                    {'addr': 545-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_1__MEAN_PRESSURE':                   {'addr': 546-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_1__HIGH_PRESSURE':                   {'addr': 547-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_1__WP_WATER_FLOW_RATE':              {'addr': 548-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_2__RETURN_TEMPERATURE':              {'addr': 549-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_2__FLOW_TEMPERATURE':                {'addr': 550-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_2__HOT_GAS_TEMPERATURE':             {'addr': 551-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_2__LOW_PRESSURE':                    {'addr': 552-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_2__MEAN_PRESSURE':                   {'addr': 553-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_2__HIGH_PRESSURE':                   {'addr': 554-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_2__WP_WATER_FLOW_RATE':              {'addr': 555-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_3__RETURN_TEMPERATURE':              {'addr': 556-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_3__FLOW_TEMPERATURE':                {'addr': 557-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_3__HOT_GAS_TEMPERATURE':             {'addr': 558-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_3__LOW_PRESSURE':                    {'addr': 559-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_3__MEAN_PRESSURE':                   {'addr': 560-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_3__HIGH_PRESSURE':                   {'addr': 561-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_3__WP_WATER_FLOW_RATE':              {'addr': 562-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_4__RETURN_TEMPERATURE':              {'addr': 563-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_4__FLOW_TEMPERATURE':                {'addr': 564-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_4__HOT_GAS_TEMPERATURE':             {'addr': 565-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_4__LOW_PRESSURE':                    {'addr': 566-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_4__MEAN_PRESSURE':                   {'addr': 567-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_4__HIGH_PRESSURE':                   {'addr': 568-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_4__WP_WATER_FLOW_RATE':              {'addr': 569-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_5__RETURN_TEMPERATURE':              {'addr': 570-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_5__FLOW_TEMPERATURE':                {'addr': 571-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_5__HOT_GAS_TEMPERATURE':             {'addr': 572-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_5__LOW_PRESSURE':                    {'addr': 573-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_5__MEAN_PRESSURE':                   {'addr': 574-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_5__HIGH_PRESSURE':                   {'addr': 575-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_5__WP_WATER_FLOW_RATE':              {'addr': 576-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_6__RETURN_TEMPERATURE':              {'addr': 577-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_6__FLOW_TEMPERATURE':                {'addr': 578-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_6__HOT_GAS_TEMPERATURE':             {'addr': 579-1, 'type': 2, 'value': 0},
-    'HEAT_PUMP_6__LOW_PRESSURE':                    {'addr': 580-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_6__MEAN_PRESSURE':                   {'addr': 581-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_6__HIGH_PRESSURE':                   {'addr': 582-1, 'type': 7, 'value': 0},
-    'HEAT_PUMP_6__WP_WATER_FLOW_RATE':              {'addr': 583-1, 'type': 2, 'value': 0}
-}
-
-# WPM 3(i) Block 2 System parameters (Read/write holding register) - page 24
-WPM3i_B2_START_ADDR = 1501-1
-
-WPM3i_B2_REGMAP_HOLDING = {
-    'OPERATING_MODE':                           {'addr': 1501-1, 'type': 8, 'value': 0},
-    'HEATING_CIRCUIT_1__COMFORT_TEMPERATURE':   {'addr': 1502-1, 'type': 2, 'value': 0},
-    'HEATING_CIRCUIT_1__ECO_TEMPERATURE':       {'addr': 1503-1, 'type': 2, 'value': 0},
-    'HEATING_CIRCUIT_1__HEATING_CURVE_RISE':    {'addr': 1504-1, 'type': 7, 'value': 0},
-    'HEATING_CIRCUIT_2__COMFORT_TEMPERATURE':   {'addr': 1505-1, 'type': 2, 'value': 0},
-    'HEATING_CIRCUIT_2__ECO_TEMPERATURE':       {'addr': 1506-1, 'type': 2, 'value': 0},
-    'HEATING_CIRCUIT_2__HEATING_CURVE_RISE':    {'addr': 1507-1, 'type': 7, 'value': 0},
-    'FIXED_VALUE_OPERATION':                    {'addr': 1508-1, 'type': 2, 'value': 0},
-    'DUAL_MODE_TEMP_HZG':                       {'addr': 1509-1, 'type': 2, 'value': 0},
-    'DHW__COMFORT_TEMPERATURE':                 {'addr': 1510-1, 'type': 2, 'value': 0},
-    'DHW__ECO_TEMPERATURE':                     {'addr': 1511-1, 'type': 2, 'value': 0},
-    'DHW_STAGES':                               {'addr': 1512-1, 'type': 8, 'value': 0},
-    'DUAL_MODE_TEMP_WW':                        {'addr': 1513-1, 'type': 2, 'value': 0},
-    'AREA_COOLING__SET_FLOW_TEMPERATURE':       {'addr': 1514-1, 'type': 2, 'value': 0},
-    'AREA_COOLING__FLOW_TEMP_HYSTERESIS':       {'addr': 1515-1, 'type': 2, 'value': 0},
-    'AREA_COOLING__SET_ROOM_TEMPERATURE':       {'addr': 1516-1, 'type': 2, 'value': 0},
-    'FAN_COOLING__SET_FLOW_TEMPERATURE':        {'addr': 1517-1, 'type': 2, 'value': 0},
-    'FAN_COOLING__FLOW_TEMP_HYSTERESIS':        {'addr': 1518-1, 'type': 2, 'value': 0},
-    'FAN_COOLING__SET_ROOM_TEMPERATURE':        {'addr': 1519-1, 'type': 2, 'value': 0},
-    'RESET':                                    {'addr': 1520-1, 'type': 6, 'value': 0},
-    'RESTART_ISG':                              {'addr': 1521-1, 'type': 6, 'value': 0}
-}
-
+# Values of the WPM 3(i) registers. The register maps are in
+# data/wpm3i.regmap.
 WPM3i_B2_OPERATING_MODE_READ = {
     # BEREITSCHAFTSBETRIEB
     1: 'STANDBY_MODE',
@@ -321,17 +136,6 @@ WPM3i_B2_RESTART_ISG = {
     'SERVICE_KEY': 2
 }
 
-# Block 3 System status (Read input register) - page 31
-WPM3i_B3_START_ADDR = 2501
-
-WPM3i_B3_REGMAP_INPUT = {
-    'OPERATING_STATUS_A':   {'addr': 2501, 'type': 6, 'value': 0},
-    'POWER-OFF':            {'addr': 2502, 'type': 8, 'value': 0},
-    'OPERATING_STATUS_B':   {'addr': 2503, 'type': 6, 'value': 0},
-    'FAULT_STATUS':         {'addr': 2504, 'type': 6, 'value': 0},
-    'BUS_STATUS':           {'addr': 2505, 'type': 6, 'value': 0}
-}
-
 WPM3i_B3_OPERATING_STATUS_A = {
     'HC_1_PUMP': (1 << 0),
     'HC_2_PUMP': (1 << 1),
@@ -380,230 +184,428 @@ WPM3i_B3_BUS_STATUS = {
     'PHYSICAL-ERROR': -4
 }
 
-# Block 4 System status (Read input register) - page 26
-WPM3i_B4_START_ADDR = 3501-1
-
-WPM3i_B4_REGMAP_INPUT = {
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':      {'addr': 3501-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':    {'addr': 3502-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':    {'addr': 3503-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH':          {'addr': 3504-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':        {'addr': 3505-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':        {'addr': 3506-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__KWH':   {'addr': 3507-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__MWH':   {'addr': 3508-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__KWH':       {'addr': 3509-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__MWH':       {'addr': 3510-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':   {'addr': 3511-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH': {'addr': 3512-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH': {'addr': 3513-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_DHW_DAY__KWH':       {'addr': 3514-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':     {'addr': 3515-1, 'type': 6, 'value': 0},
-    'ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':     {'addr': 3516-1, 'type': 6, 'value': 0},
-    'VD_HEATING_RUNTIME':                                       {'addr': 3517-1, 'type': 6, 'value': 0},
-    'VD_DHW_RUNTIME':                                           {'addr': 3518-1, 'type': 6, 'value': 0},
-    'VD_COOLING_RUNTIME':                                       {'addr': 3519-1, 'type': 6, 'value': 0},
-    'NHZ_1_RUNTIME':                                            {'addr': 3520-1, 'type': 6, 'value': 0},
-    'NHZ_2_RUNTIME':                                            {'addr': 3521-1, 'type': 6, 'value': 0},
-    'NHZ_1_AND_2_RUNTIME':                                      {'addr': 3522-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':                 {'addr': 3523-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':               {'addr': 3524-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':               {'addr': 3525-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH':                     {'addr': 3526-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':                   {'addr': 3527-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':                   {'addr': 3528-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__KWH':              {'addr': 3529-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__MWH':              {'addr': 3530-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__KWH':                  {'addr': 3531-1, 'type': 6, 'value': 0},
-    'HP1__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__MWH':                  {'addr': 3532-1, 'type': 6, 'value': 0},
-    'HP1__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':              {'addr': 3533-1, 'type': 6, 'value': 0},
-    'HP1__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH':            {'addr': 3534-1, 'type': 6, 'value': 0},
-    'HP1__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH':            {'addr': 3535-1, 'type': 6, 'value': 0},
-    'HP1__POWER_CONSUMPTION__VD_DHW_DAY__KWH':                  {'addr': 3536-1, 'type': 6, 'value': 0},
-    'HP1__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':                {'addr': 3537-1, 'type': 6, 'value': 0},
-    'HP1__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':                {'addr': 3538-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_HEATING':                                 {'addr': 3539-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_2_HEATING':                               {'addr': 3540-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_1_AND_2_HEATING':                         {'addr': 3541-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_DHW':                                     {'addr': 3542-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_2_DHW':                                   {'addr': 3543-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_1_AND_2_DHW':                             {'addr': 3544-1, 'type': 6, 'value': 0},
-    'HP1__RUNTIME__VD_COOLING':                                 {'addr': 3545-1, 'type': 6, 'value': 0},
-    'REHEATING_STAGE__RUNTIME__NHZ_1':                          {'addr': 3546-1, 'type': 6, 'value': 0},
-    'REHEATING_STAGE__RUNTIME__NHZ_2':                          {'addr': 3547-1, 'type': 6, 'value': 0},
-    'REHEATING_STAGE__RUNTIME__NHZ_1_AND_2':                    {'addr': 3548-1, 'type': 6, 'value': 0},
-    'HP2__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':                 {'addr': 3549-1, 'type': 6, 'value': 0},
-    'HP2__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':               {'addr': 3550-1, 'type': 6, 'value': 0},
-    'HP2__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':               {'addr': 3551-1, 'type': 6, 'value': 0},
-    'HP2__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH':                     {'addr': 3552-1, 'type': 6, 'value': 0},
-    'HP2__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':                   {'addr': 3553-1, 'type': 6, 'value': 0},
-    'HP2__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':                   {'addr': 3554-1, 'type': 6, 'value': 0},
-    'HP2__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':              {'addr': 3555-1, 'type': 6, 'value': 0},
-    'HP2__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH':            {'addr': 3556-1, 'type': 6, 'value': 0},
-    'HP2__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH':            {'addr': 3557-1, 'type': 6, 'value': 0},
-    'HP2__POWER_CONSUMPTION__VD_DHW_DAY__KWH':                  {'addr': 3558-1, 'type': 6, 'value': 0},
-    'HP2__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':                {'addr': 3559-1, 'type': 6, 'value': 0},
-    'HP2__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':                {'addr': 3560-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_HEATING':                                 {'addr': 3561-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_2_HEATING':                               {'addr': 3562-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_1_AND_2_HEATING':                         {'addr': 3563-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_DHW':                                     {'addr': 3564-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_2_DHW':                                   {'addr': 3565-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_1_AND_2_DHW':                             {'addr': 3566-1, 'type': 6, 'value': 0},
-    'HP2__RUNTIME__VD_COOLING':                                 {'addr': 3567-1, 'type': 6, 'value': 0},
-    'HP3__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':                 {'addr': 3568-1, 'type': 6, 'value': 0},
-    'HP3__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':               {'addr': 3569-1, 'type': 6, 'value': 0},
-    'HP3__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':               {'addr': 3570-1, 'type': 6, 'value': 0},
-    'HP3__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH':                     {'addr': 3571-1, 'type': 6, 'value': 0},
-    'HP3__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':                   {'addr': 3572-1, 'type': 6, 'value': 0},
-    'HP3__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':                   {'addr': 3573-1, 'type': 6, 'value': 0},
-    'HP3__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':              {'addr': 3574-1, 'type': 6, 'value': 0},
-    'HP3__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH':            {'addr': 3575-1, 'type': 6, 'value': 0},
-    'HP3__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH':            {'addr': 3576-1, 'type': 6, 'value': 0},
-    'HP3__POWER_CONSUMPTION__VD_DHW_DAY__KWH':                  {'addr': 3577-1, 'type': 6, 'value': 0},
-    'HP3__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':                {'addr': 3578-1, 'type': 6, 'value': 0},
-    'HP3__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':                {'addr': 3579-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_HEATING':                                 {'addr': 3580-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_2_HEATING':                               {'addr': 3581-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_1_AND_2_HEATING':                         {'addr': 3582-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_DHW':                                     {'addr': 3583-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_2_DHW':                                   {'addr': 3584-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_1_AND_2_DHW':                             {'addr': 3585-1, 'type': 6, 'value': 0},
-    'HP3__RUNTIME__VD_COOLING':                                 {'addr': 3586-1, 'type': 6, 'value': 0},
-    'HP4__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':                 {'addr': 3587-1, 'type': 6, 'value': 0},
-    'HP4__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':               {'addr': 3588-1, 'type': 6, 'value': 0},
-    'HP4__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':               {'addr': 3589-1, 'type': 6, 'value': 0},
-    'HP4__AMOUNT_OF_HEAT__VD_DHW_DA__KWH':                      {'addr': 3590-1, 'type': 6, 'value': 0},
-    'HP4__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':                   {'addr': 3591-1, 'type': 6, 'value': 0},
-    'HP4__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':                   {'addr': 3592-1, 'type': 6, 'value': 0},
-    'HP4__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':              {'addr': 3593-1, 'type': 6, 'value': 0},
-    'HP4__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH':            {'addr': 3594-1, 'type': 6, 'value': 0},
-    'HP4__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH':            {'addr': 3595-1, 'type': 6, 'value': 0},
-    'HP4__POWER_CONSUMPTION__VD_DHW_DAY__KWH':                  {'addr': 3596-1, 'type': 6, 'value': 0},
-    'HP4__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':                {'addr': 3597-1, 'type': 6, 'value': 0},
-    'HP4__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':                {'addr': 3598-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_HEATING':                                 {'addr': 3599-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_2_HEATING':                               {'addr': 3600-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_1_AND_2_HEATING':                         {'addr': 3601-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_DHW':                                     {'addr': 3602-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_2_DHW':                                   {'addr': 3603-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_1_AND_2_DHW':                             {'addr': 3604-1, 'type': 6, 'value': 0},
-    'HP4__RUNTIME__VD_COOLING':                                 {'addr': 3605-1, 'type': 6, 'value': 0},
-    'HP5__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':                 {'addr': 3606-1, 'type': 6, 'value': 0},
-    'HP5__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':               {'addr': 3607-1, 'type': 6, 'value': 0},
-    'HP5__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':               {'addr': 3608-1, 'type': 6, 'value': 0},
-    'HP5__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH':                     {'addr': 3609-1, 'type': 6, 'value': 0},
-    'HP5__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':                   {'addr': 3610-1, 'type': 6, 'value': 0},
-    'HP5__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':                   {'addr': 3611-1, 'type': 6, 'value': 0}
-#    'HP5__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':              {'addr': 3612-1, 'type': 6, 'value': 0},
-#    'HP5__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH':            {'addr': 3613-1, 'type': 6, 'value': 0},
-#    'HP5__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH':            {'addr': 3614-1, 'type': 6, 'value': 0},
-#    'HP5__POWER_CONSUMPTION__VD_DHW_DAY__KWH':                  {'addr': 3615-1, 'type': 6, 'value': 0},
-#    'HP5__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':                {'addr': 3616-1, 'type': 6, 'value': 0},
-#    'HP5__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':                {'addr': 3617-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_HEATING':                                 {'addr': 3618-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_2_HEATING':                               {'addr': 3619-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_1_AND_2_HEATING':                         {'addr': 3620-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_DHW':                                     {'addr': 3621-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_2_DHW':                                   {'addr': 3622-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_1_AND_2_DHW':                             {'addr': 3623-1, 'type': 6, 'value': 0},
-#    'HP5__RUNTIME__VD_COOLING':                                 {'addr': 3624-1, 'type': 6, 'value': 0},
-#    'HP6__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH':                 {'addr': 3625-1, 'type': 6, 'value': 0},
-#    'HP6__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH':               {'addr': 3626-1, 'type': 6, 'value': 0},
-#    'HP6__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH':               {'addr': 3627-1, 'type': 6, 'value': 0},
-#    'HP6__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH':                     {'addr': 3628-1, 'type': 6, 'value': 0},
-#    'HP6__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH':                   {'addr': 3629-1, 'type': 6, 'value': 0},
-#    'HP6__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH':                   {'addr': 3630-1, 'type': 6, 'value': 0},
-#    'HP6__POWER_CONSUMPTION__VD_HEATING_DAY__KWH':              {'addr': 3631-1, 'type': 6, 'value': 0},
-#    'HP6__POWER_CONSUMPTION__VD_HEATING_TOTAL__KWH':            {'addr': 3632-1, 'type': 6, 'value': 0},
-#    'HP6__POWER_CONSUMPTION__VD_HEATING_TOTAL__MWH':            {'addr': 3633-1, 'type': 6, 'value': 0},
-#    'HP6__POWER_CONSUMPTION__VD_DHW_DAY__KWH':                  {'addr': 3634-1, 'type': 6, 'value': 0},
-#    'HP6__POWER_CONSUMPTION__VD_DHW_TOTAL__KWH':                {'addr': 3635-1, 'type': 6, 'value': 0},
-#    'HP6__POWER_CONSUMPTION__VD_DHW_TOTAL__MWH':                {'addr': 3636-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_HEATING':                                 {'addr': 3637-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_2_HEATING':                               {'addr': 3638-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_1_AND_2_HEATING':                         {'addr': 3639-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_DHW':                                     {'addr': 3640-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_2_DHW':                                   {'addr': 3641-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_1_AND_2_DHW':                             {'addr': 3642-1, 'type': 6, 'value': 0},
-#    'HP6__RUNTIME__VD_COOLING':                                 {'addr': 3643-1, 'type': 6, 'value': 0}
-}
+# Register maps (B1_REGMAP_INPUT, WPM3i_B1_START_ADDR, ...) and schemas
+# (LWZ_SCHEMA, WPM3i_SCHEMA) are loaded from the packaged data files on first
+# access, see __getattr__.
+_SCHEMA_NAMES = {'LWZ_SCHEMA': 'lwz', 'WPM3i_SCHEMA': 'wpm3i'}
+
+# Values of a read with the wall clock time and duration of each block read,
+# published by a single assignment
+_Published = collections.namedtuple(
+    '_Published', ['buffers', 'acquired', 'durations', 'unavailable'])
+
+
+def __getattr__(name):
+    """Load a register map or schema of a model on first access."""
+    if name in _SCHEMA_NAMES:
+        value = model_schema(_SCHEMA_NAMES[name])
+    else:
+        model = 'wpm3i' if name.startswith('WPM3i_') else 'lwz'
+        values = {}
+        if '_REGMAP_' in name or name.endswith('_START_ADDR'):
+            for regmap_name, start, _, regmap in load_regmaps(model):
+                values[regmap_name] = regmap
+                values[regmap_name.split('_REGMAP_')[0] + '_START_ADDR'] = \
+                    start
+        if name not in values:
+            raise AttributeError(
+                "module {} has no attribute {}".format(__name__, name))
+        value = values[name]
+    globals()[name] = value
+    return value
+
+
+def _reads(*names):
+    """Decorate a getter reading the given registers (default all).
+
+    If the API updates on read, the blocks of these registers are requested
+    first, unless they are fresh. The getter accepts a max_staleness
+    argument in seconds, overriding the TTL of the blocks for this call.
+    """
+    def decorator(getter):
+        @functools.wraps(getter)
+        def wrapper(self, *args, max_staleness=None, **kwargs):
+            if self._update_on_read:
+                self._refresh(names or None, max_staleness)
+            return getter(self, *args, **kwargs)
+        wrapper.registers = names or None
+        return wrapper
+    return decorator
+
+
+def _writes(*names):
+    """Decorate a setter writing the given registers.
+
+    The cached values of their blocks are invalidated by the write.
+    """
+    def decorator(setter):
+        @functools.wraps(setter)
+        def wrapper(self, *args, **kwargs):
+            result = setter(self, *args, **kwargs)
+            self.invalidate(names)
+            return result
+        wrapper.registers = names
+        return wrapper
+    return decorator
+
 
 class StiebelEltronAPI():
     """Stiebel Eltron API."""
 
-    def __init__(self, conn, slave, update_on_read=False, is_wpm3i=False):
-        """Initialize Stiebel Eltron communication."""
+    _instrumented_connection = InstrumentedConnection
+    _single_flight = SingleFlight
+
+    def __init__(self, conn, slave, update_on_read=False, is_wpm3i=False,
+                 max_gap=DEFAULT_MAX_GAP, ttl=0, history=0,
+                 instrument=False, profile=None, prune_after=0,
+                 recheck_interval=DEFAULT_RECHECK_INTERVAL, metrics=None,
+                 rollups=False):
+        """Initialize Stiebel Eltron communication.
+
+        Args:
+            max_gap: Maximum number of unneeded registers read to merge two
+                register ranges into a single request.
+            ttl: Seconds the values of a block are fresh after reading it,
+                either for all blocks or as dict of block number (1-4) to
+                seconds. Getters only request stale blocks on read.
+            history: Number of snapshots kept in `history` after each
+                successful read, 0 for no history.
+            instrument: Record statistics of the requests in `stats`, see
+                instrument.ConnectionStats.
+            profile: scan.DeviceProfile of the unit. Registers it does not
+                populate are never requested and read as None.
+            prune_after: Number of consecutive reads of UNAVAILABLE_OBJECT
+                or ERROR_NOTAVAILABLE after which a register is no longer
+                requested and reads as None, 0 to never prune. See
+                prune.Pruner.
+            recheck_interval: Seconds until a pruned register is read
+                again, doubling while it stays unavailable.
+            metrics: Metrics of get_derived_values, defaults to the ones of
+                the model, see derived.DEFAULT_METRICS.
+            rollups: Keep per-minute, hourly and daily increases of the
+                energy counters (WPM3i) in `rollups`, see
+                rollup.EnergyRollups.
+        """
+        self._schema = model_schema('wpm3i' if is_wpm3i else 'lwz')
+        if profile is not None and profile.model != self._schema.model:
+            raise ValueError("Profile of a {} unit".format(profile.model))
+        if instrument:
+            conn = self._instrumented_connection(conn, self._schema)
+            self.stats = conn.stats
+        else:
+            self.stats = None
         self._conn = conn
-        if is_wpm3i is False:
-            self._block_1_input_regs = B1_REGMAP_INPUT
-            self._block_2_holding_regs = B2_REGMAP_HOLDING
-            self._block_3_input_regs = B3_REGMAP_INPUT
-            self._block_4_input_regs = None
-            self._block_1_start_address = B1_START_ADDR
-            self._block_2_start_address = B2_START_ADDR
-            self._block_3_start_address = B3_START_ADDR
-            self._block_4_start_address = None
+        self._values = RegisterStore(self._schema)
+        # Addresses of registers the unit does not populate, never requested,
+        # and of the addresses it does not answer, never read as gaps
+        if profile is None:
+            self._skipped = self._unreadable = frozenset()
         else:
-            self._block_1_input_regs = WPM3i_B1_REGMAP_INPUT
-            self._block_2_holding_regs = WPM3i_B2_REGMAP_HOLDING
-            self._block_3_input_regs = WPM3i_B3_REGMAP_INPUT
-            self._block_4_input_regs = WPM3i_B4_REGMAP_INPUT
-            self._block_1_start_address = WPM3i_B1_START_ADDR
-            self._block_2_start_address = WPM3i_B2_START_ADDR
-            self._block_3_start_address = WPM3i_B3_START_ADDR
-            self._block_4_start_address = WPM3i_B4_START_ADDR
+            self._skipped = profile.dead(self._schema)
+            self._unreadable = profile.unreadable(self._schema)
+        self._values.store_all([
+            (self._schema.blocks[register.block], register.offset,
+             [UNAVAILABLE_OBJECT])
+            for register in self._schema if register.addr in self._skipped])
+        self._pruner = Pruner(self._schema, prune_after, recheck_interval) \
+            if prune_after else None
+        # Addresses of the registers reading None, and of those not requested
+        self._unavailable = self._excluded = self._skipped
+        # Converted values as attributes, see accessors.RegisterValues. A new
+        # one is published with the buffers of each update.
+        self._values_class = values_class(self._schema, self._unavailable)
+        self.values = self._values_class(self._values.buffers)
         self._slave = slave
         self._update_on_read = update_on_read
+        self._max_gap = max_gap
+        self._full_plan = self._plan_reads()
+        if isinstance(ttl, dict):
+            self._ttl = [ttl.get(block.index + 1, 0)
+                         for block in self._schema.blocks]
+        else:
+            self._ttl = [ttl] * len(self._schema.blocks)
+        # Monotonic time each block was last read completely, or None
+        self._acquired = [None] * len(self._schema.blocks)
+        # Buffers with the wall clock time and duration of these reads, for
+        # snapshots. Replaced as a whole after each read.
+        self._published = _Published(
+            self._values.buffers, (None,) * len(self._schema.blocks),
+            (None,) * len(self._schema.blocks), self._unavailable)
+        self._subscriptions = []
+        self.history = History(self._schema, history) if history else None
+        self.rollups = EnergyRollups(self._schema) if rollups else None
+        # Intervals completed by reads, for rollups.on_close
+        self._closed_intervals = collections.deque()
+        # Serializes the callbacks of reads of several threads
+        self._notify_lock = threading.RLock()
+        # Callables notified with the names of invalidated registers
+        self._invalidation_listeners = []
+        # Concurrent reads share the one in flight, see flight.SingleFlight
+        self._flights = self._single_flight()
+        # Error of the last read if it failed, e.g. ConnectionError
+        self.last_error = None
+        self._metrics = metrics
+        self._derived = None
+
+    @classmethod
+    def detect(cls, conn, slave, cache=None, key=None, **kwargs):
+        """Return an API for the model the unit is detected as.
+
+        Args:
+            cache: Optional detect.ModelCache, to skip probing units whose
+                model is known.
+            key: Key of the unit in the cache, see detect.detect_model.
+            kwargs: Further arguments of the API, except is_wpm3i.
+        """
+        model = detect_model(conn, slave, cache, key)
+        return cls(conn, slave, is_wpm3i=model == 'wpm3i', **kwargs)
 
-    def update(self):
-        """Request current values from heat pump."""
+    def _plan_reads(self, names=None):
+        """Plan reads of the given registers (default all) but skipped ones."""
+        if names is None:
+            addresses = [register.addr for register in self._schema]
+        else:
+            addresses = [self._schema[name].addr for name in names]
+        return plan_reads(
+            self._schema,
+            [addr for addr in addresses if addr not in self._excluded],
+            max_gap=self._max_gap, unreadable=self._unreadable)
+
+    def _plan(self, names=None):
+        """Return the read requests for the given registers (default all)."""
+        if self._pruner is not None:
+            # Pruned registers are requested again when a recheck is due
+            excluded = self._skipped | self._pruner.excluded()
+            if excluded != self._excluded:
+                self._excluded = excluded
+                self._full_plan = self._plan_reads()
+        if names is None:
+            return self._full_plan
+        return self._plan_reads(names)
+
+    def _block_plan(self, blocks):
+        """Return the read requests for complete blocks."""
+        indexes = {block.index for block in blocks}
+        return [request for request in self._plan()
+                if request.block.index in indexes]
+
+    def _store(self, plan, results):
+        """Store and publish the registers read by the requests of a plan."""
+        self._values.store_all([
+            (request.block, request.address - request.block.start, registers)
+            for request, registers in zip(plan, results)])
+        if self._pruner is not None and \
+                self._pruner.observe(plan, self._values.buffers):
+            self._unavailable = self._skipped | self._pruner.pruned
+            self._values_class = values_class(self._schema,
+                                              self._unavailable)
+        self.values = self._values_class(self._values.buffers)
+
+    def _acquire(self, blocks, durations):
+        """Mark blocks as read completely, durations by block index."""
+        now = time.monotonic()
+        wall_time = time.time()
+        published = self._published
+        acquired_at = list(published.acquired)
+        block_durations = list(published.durations)
+        for block in blocks:
+            self._acquired[block.index] = now
+            acquired_at[block.index] = wall_time
+            block_durations[block.index] = durations.get(block.index)
+        # A single assignment, snapshots never pair values and times of
+        # different reads
+        self._published = _Published(self._values.buffers, tuple(acquired_at),
+                                     tuple(block_durations), self._unavailable)
+
+    def _stored(self, blocks, durations):
+        """Mark complete blocks fresh and record the new values."""
+        self._acquire(blocks, durations)
+        if self.history is not None:
+            self.history.append(self._values.buffers)
+        rollups = self.rollups
+        if rollups is not None and \
+                rollups.block.index in {block.index for block in blocks}:
+            self._closed_intervals.extend(rollups.update(
+                self._values.buffers,
+                self._published.acquired[rollups.block.index], notify=False))
+
+    def _execute(self, plan, blocks=()):
+        """Run read requests and mark the given (complete) blocks fresh."""
         ret = True
+        # Seconds spent reading each block, by block index
+        durations = {}
         try:
-            block_1_result_input = self._conn.read_input_registers(
-                unit=self._slave,
-                address=self._block_1_start_address,
-                count=len(self._block_1_input_regs)).registers
-            block_2_result_holding = self._conn.read_holding_registers(
-                unit=self._slave,
-                address=self._block_2_start_address,
-                count=len(self._block_2_holding_regs)).registers
-            block_3_result_input = self._conn.read_input_registers(
-                unit=self._slave,
-                address=self._block_3_start_address,
-                count=len(self._block_3_input_regs)).registers
-            if self._block_4_start_address is not None:
-                    block_4_result_input = self._conn.read_input_registers(
-                        unit=self._slave,
-                        address=self._block_4_start_address,
-                        count=len(self._block_4_input_regs)).registers
-        except AttributeError:
-            # The unit does not reply reliably
+            results = []
+            for request in plan:
+                start = time.monotonic()
+                results.append(getattr(self._conn, request.block.function)(
+                    unit=self._slave,
+                    address=request.address,
+                    count=request.count).registers)
+                index = request.block.index
+                durations[index] = durations.get(index, 0) + \
+                    time.monotonic() - start
+        except (AttributeError, IOError) as err:
+            # The unit does not reply reliably, or the connection failed
             ret = False
+            self.last_error = err
             print("Modbus read failed")
         else:
-            for k in self._block_1_input_regs:
-                self._block_1_input_regs[k]['value'] = \
-                    block_1_result_input[
-                        self._block_1_input_regs[k]['addr'] - self._block_1_start_address]
-
-            for k in self._block_2_holding_regs:
-                self._block_2_holding_regs[k]['value'] = \
-                    block_2_result_holding[
-                        self._block_2_holding_regs[k]['addr'] - self._block_2_start_address]
-
-            for k in self._block_3_input_regs:
-                self._block_3_input_regs[k]['value'] = \
-                    block_3_result_input[
-                        self._block_3_input_regs[k]['addr'] - self._block_3_start_address]
-
-            if self._block_4_start_address is not None:
-                for k in self._block_4_input_regs:
-                    self._block_4_input_regs[k]['value'] = \
-                        block_4_result_input[
-                            self._block_4_input_regs[k]['addr'] - self._block_4_start_address]
+            self.last_error = None
+            self._store(plan, results)
+            self._stored(blocks, durations)
         return ret
 
+    def update(self, names=None):
+        """Request current values from heat pump.
+
+        Args:
+            names: Names or addresses of the registers to request, defaults
+                to all registers.
+        """
+        if names is None:
+            blocks = self._schema.blocks
+        else:
+            blocks = self._covered_blocks(names)
+        return self._flights.run(
+            self._needed_blocks(names), {block.index for block in blocks},
+            lambda: self._execute(self._plan(names), blocks), self._notify)
+
+    def poll(self, names=None):
+        """Request current values and return them as Snapshot.
+
+        Args:
+            names: Names or addresses of the registers to request, defaults
+                to all registers.
+
+        Returns:
+            Snapshot of all values, None if reading failed.
+        """
+        if not self.update(names):
+            return None
+        return self.snapshot()
+
+    def snapshot(self):
+        """Return a Snapshot of the values read last, without requesting."""
+        published = self._published
+        return Snapshot(self._schema, published.buffers, published.acquired,
+                        published.durations,
+                        unavailable=published.unavailable)
+
+    def _needed_blocks(self, names=None):
+        """Return the indexes of the blocks of registers (default all)."""
+        if names is None:
+            return frozenset(block.index for block in self._schema.blocks)
+        return frozenset(self._schema[name].block
+                         for name in names if name in self._schema)
+
+    def _covered_blocks(self, names):
+        """Return the blocks of which all registers are named."""
+        addrs = {self._schema[name].addr
+                 for name in names if name in self._schema}
+        return [block for block in self._schema.blocks
+                if all(register.addr in addrs or
+                       register.addr in self._excluded
+                       for register in block.registers)]
+
+    def _stale_blocks(self, names=None, max_staleness=None):
+        """Return the blocks of the given registers (default all) to read."""
+        if names is None:
+            blocks = self._schema.blocks
+        else:
+            indexes = {self._schema[name].block
+                       for name in names if name in self._schema}
+            blocks = [self._schema.blocks[index] for index in sorted(indexes)]
+        now = time.monotonic()
+        stale = []
+        for block in blocks:
+            acquired = self._acquired[block.index]
+            ttl = self._ttl[block.index] if max_staleness is None \
+                else max_staleness
+            if acquired is None or now - acquired >= ttl:
+                stale.append(block)
+        return stale
+
+    def _refresh(self, names=None, max_staleness=None):
+        """Request stale blocks of registers, if updating on read."""
+        if self._update_on_read:
+            stale = self._stale_blocks(names, max_staleness)
+            if stale:
+                indexes = {block.index for block in stale}
+                self._flights.run(
+                    indexes, indexes,
+                    lambda: self._execute(self._block_plan(stale), stale),
+                    self._notify)
+
+    def invalidate(self, names=None):
+        """Mark the blocks of the given registers (default all) as stale."""
+        if names is None:
+            indexes = range(len(self._acquired))
+        else:
+            indexes = {self._schema[name].block
+                       for name in names if name in self._schema}
+        for index in indexes:
+            self._acquired[index] = None
+        for listener in list(self._invalidation_listeners):
+            listener(names)
+
+    def subscribe(self, callback, deadbands=None):
+        """Subscribe to changed register values.
+
+        Args:
+            callback: Called after each update with a dict of the registers
+                changed since the last call (name -> converted value).
+            deadbands: Dict of register name to the minimum change of its
+                converted value to be reported.
+
+        Returns:
+            Subscription, close it to unsubscribe.
+        """
+        subscription = Subscription(self, callback, deadbands)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription."""
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def _notify(self, stored):
+        """Run the callbacks of a read, after its flight finished.
+
+        Callbacks may read the API, which could not start a read while the
+        flight of the read notifying them was running.
+
+        Args:
+            stored: Whether the read stored values.
+        """
+        if not stored:
+            return
+        with self._notify_lock:
+            closed = self._closed_intervals
+            while closed:
+                interval = closed.popleft()
+                if self.rollups.on_close is not None:
+                    self.rollups.on_close(*interval)
+            self._publish()
+
+    def _publish(self):
+        """Deliver changed values to the subscriptions."""
+        for subscription in list(self._subscriptions):
+            subscription.publish(self._values.buffers, self._unavailable)
+
+    def write_batch(self):
+        """Return a WriteBatch collecting holding register writes.
+
+        Contiguous registers are written with a single request when the
+        batch is committed, e.g. when leaving it as context manager:
+
+            with api.write_batch() as batch:
+                batch.set('ROOM_TEMP_HEAT_DAY_HC1', 21.5)
+                batch.set('ROOM_TEMP_HEAT_NIGHT_HC1', 18.0)
+        """
+        return WriteBatch(self)
+
     def twos_comp(self, val, bits):
         """compute the 2's complement of int value val"""
         if (val & (1 << (bits - 1))) != 0: # if sign bit is set e.g., 8bit: 128-255
@@ -614,28 +616,38 @@ class StiebelEltronAPI():
         """Read and convert value.
 
         Args:
-            name: Name of value to be read.
+            name: Name or Modbus address of value to be read.
 
         Returns:
             Actual value or None.
         """
-        value_entry = self._block_1_input_regs.get(name)
-        if value_entry is None:
-            value_entry = self._block_2_holding_regs.get(name)
-        if value_entry is None:
-            value_entry = self._block_3_input_regs.get(name)
-        if self._block_4_start_address is not None:
-            if value_entry is None:
-                value_entry = self._block_4_input_regs.get(name)
-        if value_entry is None:
+        register = self._schema.get(name)
+        if register is None or register.addr in self._unavailable:
             return None
+        return self._values.value(name)
 
-        if value_entry['type'] == 2:
-            return round(self.twos_comp(value_entry['value'], 16) * 0.1, 2)
-        if value_entry['type'] == 7:
-            return round(self.twos_comp(value_entry['value'], 16) * 0.01, 2)
+    @_reads()
+    def get_all_converted(self):
+        """Read and convert all values at once.
 
-        return value_entry['value']
+        Returns:
+            BulkValues(names, values, unavailable), see decode.BulkValues.
+        """
+        return bulk_decoder(self._schema).decode(self._values.buffers)
+
+    @_reads()
+    def get_derived_values(self):
+        """Compute the derived metrics of the values read last.
+
+        Returns:
+            Read-only dict of metric name to value, see derived.
+        """
+        derived = self._derived
+        if derived is None:
+            derived = self._derived = DerivedMetrics(self._schema,
+                                                     self._metrics)
+        published = self._published
+        return derived.update(published.buffers, published.acquired)
 
 #    def get_raw_input_register(self, name):
 #        """Get raw register value by name."""
@@ -658,267 +670,253 @@ class StiebelEltronAPI():
 
     # Handle room temperature & humidity
 
+    @_reads('ACTUAL_ROOM_TEMPERATURE_HC1')
     def get_current_temp(self):
         """Get the current room temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ACTUAL_ROOM_TEMPERATURE_HC1')
+        return self.values.ACTUAL_ROOM_TEMPERATURE_HC1
 
+    @_reads('ROOM_TEMP_HEAT_DAY_HC1')
     def get_target_temp(self):
         """Get the target room temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ROOM_TEMP_HEAT_DAY_HC1')
+        return self.values.ROOM_TEMP_HEAT_DAY_HC1
 
+    @_writes('ROOM_TEMP_HEAT_DAY_HC1')
     def set_target_temp(self, temp):
         """Set the target room temperature (day)(HC1)."""
-        self._conn.write_register(
+        register = self._schema['ROOM_TEMP_HEAT_DAY_HC1']
+        return self._conn.write_register(
             unit=self._slave,
-            address=(
-                self._block_2_holding_regs['ROOM_TEMP_HEAT_DAY_HC1']['addr']),
-            value=round(temp * 10.0))
+            address=register.addr,
+            value=register.encode(temp))
 
+    @_reads('RELATIVE_HUMIDITY_HC1')
     def get_current_humidity(self):
         """Get the current room humidity."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('RELATIVE_HUMIDITY_HC1')
+        return self.values.RELATIVE_HUMIDITY_HC1
 
     # Get Info->System->Heating Info
 
+    @_reads('OUTSIDE_TEMPERATURE')
     def get_outside_temp(self):
         """Get the outside temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('OUTSIDE_TEMPERATURE')
+        return self.values.OUTSIDE_TEMPERATURE
 
+    @_reads('ACTUAL_TEMPERATURE_HK_1')
     def get_actual_hk1_temp(self):
         """Get the heating circuit HK1 temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ACTUAL_TEMPERATURE_HK_1')
+        return self.values.ACTUAL_TEMPERATURE_HK_1
 
+    @_reads('SET_TEMPERATURE_HK_1_B')
     def get_set_hk1_temp(self):
-        """Get the heating circuit HK1 set temperature with heating curve rise."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('SET_TEMPERATURE_HK_1_B')
+        """Get the heating circuit HK1 set temperature.
+
+        Includes the rise of the heating curve.
+        """
+        return self.values.SET_TEMPERATURE_HK_1_B
 
+    @_reads('ACTUAL_FLOW_TEMPERATURE_WP')
     def get_actual_wp_flow_temp(self):
         """Get the heating circuit wp flow temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ACTUAL_FLOW_TEMPERATURE_WP')
+        return self.values.ACTUAL_FLOW_TEMPERATURE_WP
 
+    @_reads('ACTUAL_FLOW_TEMPERATURE_NHZ')
     def get_actual_nhz_flow_temp(self):
         """Get the heating circuit electric booster flow temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ACTUAL_FLOW_TEMPERATURE_NHZ')
+        return self.values.ACTUAL_FLOW_TEMPERATURE_NHZ
 
+    @_reads('ACTUAL_RETURN_TEMPERATURE')
     def get_actual_return_temp(self):
         """Get the heating circuit return temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ACTUAL_RETURN_TEMPERATURE')
+        return self.values.ACTUAL_RETURN_TEMPERATURE
 
+    @_reads('HEATING_PRESSURE')
     def get_heating_pressure(self):
         """Get the heating circuit pressure."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('HEATING_PRESSURE')
+        return self.values.HEATING_PRESSURE
 
+    @_reads('FLOW_RATE')
     def get_heating_or_dhw_flow_rate(self):
         """Get the heating or hot water circuit flow rate."""
-        if self._update_on_read:
-            self.update()
-        return round(self.get_conv_val('FLOW_RATE') / 10, 2)
+        return round(self.values.FLOW_RATE / 10, 2)
 #TODO: The flow rate seems a factor of 10 too large
 
+    @_reads('LOWER_HEATING_LIMIT__APPLICATION_LIMIT_HZG')
     def get_hzg_lower_heating_limit_temp(self):
         """Get the LOWER_HEATING_LIMIT__APPLICATION_LIMIT_HZG."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('LOWER_HEATING_LIMIT__APPLICATION_LIMIT_HZG')
+        return self.values.LOWER_HEATING_LIMIT__APPLICATION_LIMIT_HZG
 
     # Get Info->System->DHW hot water Info
+    @_reads('DHW__ACTUAL_TEMPERATURE')
     def get_actual_dhw_temp(self):
         """Get the hot water circuit DHW temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('DHW__ACTUAL_TEMPERATURE')
+        return self.values.DHW__ACTUAL_TEMPERATURE
 
+    @_reads('DHW__SET_TEMPERATURE')
     def get_set_dhw_temp(self):
         """Get the hot water circuit DHW set temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('DHW__SET_TEMPERATURE')
+        return self.values.DHW__SET_TEMPERATURE
 
+    @_reads('LOWER_DHW_LIMIT__APPLICATION_LIMIT_WW')
     def get_ww_lower_dhw_limit_temp(self):
         """Get the LOWER_DHW_LIMIT__APPLICATION_LIMIT_WW."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('LOWER_DHW_LIMIT__APPLICATION_LIMIT_WW')
+        return self.values.LOWER_DHW_LIMIT__APPLICATION_LIMIT_WW
 
     # Get Info->System->Source Info
+    @_reads('SOURCE_TEMPERATURE')
     def get_source_temp(self):
         """Get the source return temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('SOURCE_TEMPERATURE')
+        return self.values.SOURCE_TEMPERATURE
 
+    @_reads('MIN_SOURCE_TEMPERATURE')
     def get_min_source_temp(self):
         """Get the minimum source temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('MIN_SOURCE_TEMPERATURE')
+        return self.values.MIN_SOURCE_TEMPERATURE
 
+    @_reads('SOURCE_PRESSURE')
     def get_source_pressure(self):
         """Get the source circuit pressure."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('SOURCE_PRESSURE')
+        return self.values.SOURCE_PRESSURE
 
     # Heat Pump
+    @_reads('HOT_GAS_TEMPERATURE')
     def get_hp_hot_gas_temp(self):
         """Get the heat pump hot get temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('HOT_GAS_TEMPERATURE')
+        return self.values.HOT_GAS_TEMPERATURE
 
+    @_reads('HIGH_PRESSURE')
     def get_hp_high_pressure(self):
         """Get the heat pump high pressure."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('HIGH_PRESSURE')
+        return self.values.HIGH_PRESSURE
 
+    @_reads('LOW_PRESSURE')
     def get_hp_low_pressure(self):
         """Get the heat pump low pressure."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('LOW_PRESSURE')
+        return self.values.LOW_PRESSURE
 
     # Get Info->Source->Amount of Heat Info
+    @_reads('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH')
     def get_vd_heating_day_kwh(self):
         """Get the day kWh for vd heating."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH')
+        return self.values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH
 
+    @_reads(
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH',
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH')
     def get_vd_heating_total_kwh(self):
         """Get the total kWh for vd heating."""
-        if self._update_on_read:
-            self.update()
-        return (self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH')*1000) + self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH')
+        values = self.values
+        mwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__MWH
+        kwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__KWH
+        return mwh * 1000 + kwh
 
+    @_reads('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH')
     def get_vd_dhw_day_kwh(self):
         """Get the day kWh for vd dhw."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH')
+        return self.values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_DAY__KWH
 
+    @_reads(
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH',
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH')
     def get_vd_dhw_total_kwh(self):
         """Get the total kWh for vd dhw."""
-        if self._update_on_read:
-            self.update()
-        return (self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH')*1000) + self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH')
-
+        values = self.values
+        mwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH
+        kwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_DHW_TOTAL__KWH
+        return mwh * 1000 + kwh
+
+    @_reads(
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__MWH',
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__KWH')
     def get_nhz_heating_total_kwh(self):
         """Get the total kWh for nhz heating."""
-        if self._update_on_read:
-            self.update()
-        return (self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__MWH')*1000) + self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__KWH')
-
+        values = self.values
+        mwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__MWH
+        kwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_HEATING_TOTAL__KWH
+        return mwh * 1000 + kwh
+
+    @_reads(
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__MWH',
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__KWH')
     def get_nhz_dhw_total_kwh(self):
         """Get the total kWh for nhz dwh."""
-        if self._update_on_read:
-            self.update()
-        return (self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__MWH')*1000) + self.get_conv_val('ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__KWH')
+        values = self.values
+        mwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__MWH
+        kwh = values.ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__NHZ_DHW_TOTAL__KWH
+        return mwh * 1000 + kwh
 
+    @_reads('ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_HEATING_DAY__KWH')
     def get_electricity_vd_headitng_day_kwh(self):
         """Get the total electricity kWh for vd heating."""
-        if self._update_on_read:
-            self.update()
-        return (self.get_conv_val('ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_HEATING_DAY__KWH'))
+        values = self.values
+        return values.ALL_HEAT_PUMPS__POWER_CONSUMPTION__VD_HEATING_DAY__KWH
 
     # System Patameters
 
+    @_reads('OPERATING_MODE')
     def get_operating_mode(self):
         """Return the current mode of operation."""
-        if self._update_on_read:
-            self.update()
-        op_mode = self.get_conv_val('OPERATING_MODE')
+        op_mode = self.values.OPERATING_MODE
         return WPM3i_B2_OPERATING_MODE_READ.get(op_mode, 'UNKNOWN')
 
+    @_reads('HEATING_CIRCUIT_1__COMFORT_TEMPERATURE')
     def get_heating_circuit1_comfort_temp(self):
         """Get the heating circuit 1 comfort temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('HEATING_CIRCUIT_1__COMFORT_TEMPERATURE')
+        return self.values.HEATING_CIRCUIT_1__COMFORT_TEMPERATURE
 
+    @_reads('HEATING_CIRCUIT_1__ECO_TEMPERATURE')
     def get_heating_circuit1_eco_temp(self):
         """Get the heating circuit 1 eco temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('HEATING_CIRCUIT_1__ECO_TEMPERATURE')
+        return self.values.HEATING_CIRCUIT_1__ECO_TEMPERATURE
 
+    @_reads('HEATING_CIRCUIT_1__HEATING_CURVE_RISE')
     def get_heating_circuit1_curve_rise(self):
         """Get the heating circuit 1 curve rise."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('HEATING_CIRCUIT_1__HEATING_CURVE_RISE')
+        return self.values.HEATING_CIRCUIT_1__HEATING_CURVE_RISE
 
+    @_reads('DHW__COMFORT_TEMPERATURE')
     def get_dhw_comfort_temp(self):
         """Get the dhw comfort temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('DHW__COMFORT_TEMPERATURE')
+        return self.values.DHW__COMFORT_TEMPERATURE
 
+    @_reads('DHW__ECO_TEMPERATURE')
     def get_dhw_eco_temp(self):
         """Get the dhw eco temperature."""
-        if self._update_on_read:
-            self.update()
-        return self.get_conv_val('DHW__ECO_TEMPERATURE')
+        return self.values.DHW__ECO_TEMPERATURE
 
     # Handle operation mode
 
+    @_reads('OPERATING_MODE')
     def get_operation(self):
         """Return the current mode of operation."""
-        if self._update_on_read:
-            self.update()
-
-        op_mode = self.get_conv_val('OPERATING_MODE')
+        op_mode = self.values.OPERATING_MODE
         return B2_OPERATING_MODE_READ.get(op_mode, 'UNKNOWN')
 
+    @_writes('OPERATING_MODE')
     def set_operation(self, mode):
         """Set the operation mode."""
-        self._conn.write_register(
+        return self._conn.write_register(
             unit=self._slave,
-            address=(self._block_2_holding_regs['OPERATING_MODE']['addr']),
+            address=self._schema['OPERATING_MODE'].addr,
             value=B2_OPERATING_MODE_WRITE.get(mode))
 
     # Handle device status
 
+    @_reads('OPERATING_STATUS')
     def get_heating_status(self):
         """Return heater status."""
-        if self._update_on_read:
-            self.update()
-        return bool(self.get_conv_val('OPERATING_STATUS') &
+        return bool(self.values.OPERATING_STATUS &
                     B3_OPERATING_STATUS['HEATING'])
 
+    @_reads('OPERATING_STATUS')
     def get_cooling_status(self):
         """Cooling status."""
-        if self._update_on_read:
-            self.update()
-        return bool(self.get_conv_val('OPERATING_STATUS') &
+        return bool(self.values.OPERATING_STATUS &
                     B3_OPERATING_STATUS['COOLING'])
 
+    @_reads('OPERATING_STATUS')
     def get_filter_alarm_status(self):
         """Return filter alarm."""
-        if self._update_on_read:
-            self.update()
-
         filter_mask = (B3_OPERATING_STATUS['FILTER'] |
                        B3_OPERATING_STATUS['FILTER_EXTRACT_AIR'] |
                        B3_OPERATING_STATUS['FILTER_VENTILATION_AIR'])
-        return bool(self.get_conv_val('OPERATING_STATUS') & filter_mask)
+        return bool(self.values.OPERATING_STATUS & filter_mask)
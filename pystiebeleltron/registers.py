@@ -0,0 +1,233 @@
+"""
+Register schema and per-instance register values.
+
+A RegisterSchema is built once per controller family from the register maps
+and shared by all API instances. It never holds values. The values read from
+a unit are kept in a RegisterStore, one compact array of raw 16 bit words per
+block and instance.
+
+The register maps are packaged as data files (data/<model>.regmap), only the
+map of a model in use is parsed and compiled, once per process.
+"""
+import os
+from array import array
+from collections import namedtuple
+
+# Error - sensor lead is missing or disconnected.
+ERROR_NOTAVAILABLE = -60
+# Error - short circuit of the sensor lead.
+ERROR_SHORTCUT = -50
+# Error - object unavailable.
+ERROR_OBJ_UNAVAILBLE = 0x8000
+
+UNAVAILABLE_OBJECT = 32768
+
+
+def signed(raw):
+    """Interpret a raw 16 bit register as signed value."""
+    return raw - 0x10000 if raw & 0x8000 else raw
+
+
+# Dividing gives the nearest float to the decimal value, like rounding the
+# product with the multiplier to two digits, but faster.
+def _decode_type_2(raw):
+    return signed(raw) / 10
+
+
+def _decode_type_7(raw):
+    return signed(raw) / 100
+
+
+def _decode_unsigned(raw):
+    return raw
+
+
+# Conversion of raw register values by data type (see pystiebeleltron).
+DECODERS = {
+    2: _decode_type_2,
+    6: _decode_unsigned,
+    7: _decode_type_7,
+    8: _decode_unsigned,
+}
+
+
+def _encoder(multiplier, signed_type, maximum):
+    def encode(value):
+        raw = int(round(value * multiplier))
+        minimum = -0x8000 if signed_type else 0
+        if not minimum <= raw <= maximum:
+            raise ValueError("Value {} out of range".format(value))
+        return raw & 0xFFFF
+    return encode
+
+
+# Conversion of values to raw register values by data type.
+ENCODERS = {
+    2: _encoder(10, True, 0x7FFF),
+    6: _encoder(1, False, 0xFFFF),
+    7: _encoder(100, True, 0x7FFF),
+    8: _encoder(1, False, 0xFF),
+}
+
+# A register: its position in the schema and how to decode it.
+Register = namedtuple(
+    'Register',
+    ['name', 'addr', 'type', 'block', 'offset', 'decode', 'encode'])
+
+# A block of registers read with a single request type.
+Block = namedtuple(
+    'Block', ['index', 'function', 'start', 'count', 'registers'])
+
+
+class RegisterSchema(object):
+    """Immutable description of the register blocks of a controller."""
+
+    __slots__ = ('blocks', 'model', '_index')
+
+    def __init__(self, blocks, model=None):
+        """Compile the schema.
+
+        Args:
+            blocks: Sequence of (regmap, start address, read function name)
+                for each block, in the order they are requested.
+            model: Name of the packaged model ('lwz' or 'wpm3i'), if any.
+        """
+        compiled = []
+        index = {}
+        for block_index, (regmap, start, function) in enumerate(blocks):
+            registers = []
+            for name, entry in regmap.items():
+                register = Register(
+                    name, entry['addr'], entry['type'], block_index,
+                    entry['addr'] - start, DECODERS[entry['type']],
+                    ENCODERS[entry['type']])
+                registers.append(register)
+                # Keep the first block defining a name, like the lookup
+                # order of previous versions.
+                index.setdefault(name, register)
+                index.setdefault(register.addr, register)
+            registers.sort(key=lambda r: r.addr)
+            count = registers[-1].offset + 1 if registers else 0
+            compiled.append(
+                Block(block_index, function, start, count, tuple(registers)))
+        self.blocks = tuple(compiled)
+        self.model = model
+        self._index = index
+
+    def __getitem__(self, key):
+        """Return the register by name or Modbus address."""
+        return self._index[key]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        """Iterate over all registers, block by block."""
+        for block in self.blocks:
+            yield from block.registers
+
+    def __len__(self):
+        return sum(len(block.registers) for block in self.blocks)
+
+    def get(self, key, default=None):
+        """Return the register by name or Modbus address, or default."""
+        return self._index.get(key, default)
+
+
+class RegisterStore(object):
+    """Raw register values of one unit, one array('H') per block.
+
+    The published `buffers` are never modified. Storing registers copies the
+    affected blocks, writes them and publishes a new tuple of buffers with a
+    single reference assignment. Readers which took `buffers` once see
+    consistent values of one update, without locking, while the next one is
+    stored.
+    """
+
+    __slots__ = ('schema', 'buffers')
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.buffers = tuple(array('H', bytes(2 * block.count))
+                             for block in schema.blocks)
+
+    def store(self, block, registers, offset=0):
+        """Store raw registers read for a block, starting at offset."""
+        self.store_all([(block, offset, registers)])
+
+    def store_all(self, reads):
+        """Store the registers of several reads and publish them at once.
+
+        Args:
+            reads: Sequence of (block, offset, raw registers).
+        """
+        buffers = list(self.buffers)
+        copied = set()
+        for block, offset, registers in reads:
+            if block.index not in copied:
+                buffers[block.index] = array('H', buffers[block.index])
+                copied.add(block.index)
+            buffers[block.index][offset:offset + len(registers)] = \
+                array('H', registers)
+        self.buffers = tuple(buffers)
+
+    def raw(self, key):
+        """Return the raw value of a register by name or Modbus address."""
+        register = self.schema[key]
+        return self.buffers[register.block][register.offset]
+
+    def value(self, key):
+        """Return the converted value of a register, or None if unknown."""
+        register = self.schema.get(key)
+        if register is None:
+            return None
+        return register.decode(self.buffers[register.block][register.offset])
+
+
+_REGMAPS = {}
+_SCHEMAS = {}
+
+
+def load_regmaps(model):
+    """Return the register maps of a model ('lwz' or 'wpm3i').
+
+    Returns:
+        List of (regmap name, start address, read function name, regmap)
+        per block. A regmap maps register names to dicts with 'addr',
+        'type' and 'value'.
+    """
+    regmaps = _REGMAPS.get(model)
+    if regmaps is not None:
+        return regmaps
+    # Like pkgutil.get_data, which takes longer to import than this package
+    path = os.path.join(os.path.dirname(__file__), 'data',
+                        '{}.regmap'.format(model))
+    try:
+        data = __loader__.get_data(path)
+    except OSError:
+        raise ValueError("Unknown model {}".format(model))
+    regmaps = []
+    for line in data.decode('ascii').splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('['):
+            name, start, function = line[1:-1].split()
+            regmap = {}
+            regmaps.append((name, int(start), function, regmap))
+        else:
+            name, addr, data_type = line.split()
+            regmap[name] = {'addr': int(addr), 'type': int(data_type),
+                            'value': 0}
+    _REGMAPS[model] = regmaps
+    return regmaps
+
+
+def model_schema(model):
+    """Return the shared RegisterSchema of a model ('lwz' or 'wpm3i')."""
+    schema = _SCHEMAS.get(model)
+    if schema is None:
+        schema = _SCHEMAS[model] = RegisterSchema(
+            [(regmap, start, function)
+             for _, start, function, regmap in load_regmaps(model)], model)
+    return schema
@@ -0,0 +1,343 @@
+"""
+Recording and replaying the ModBus traffic of an API.
+
+A Recorder wraps the connection of an API and writes each request with its
+response to a compact binary file. A ReplayConnection answers the same
+requests from the file, without network, either as fast as possible or
+paced like the recording.
+
+    with Recorder(client, 'isg.rec') as conn:
+        api = StiebelEltronAPI(conn, 1, is_wpm3i=True)
+        for _ in range(100):
+            api.update()
+            time.sleep(10)
+
+    api = StiebelEltronAPI(ReplayConnection('isg.rec'), 1, is_wpm3i=True)
+
+File format: the header MAGIC is followed by a record per request, a
+RECORD struct and `words` uint16 values (little endian): the registers read
+or the values written.
+"""
+import asyncio
+import struct
+import sys
+import time
+from array import array
+from collections import deque, namedtuple
+
+MAGIC = b'PYSE-REC\x01'
+# time, function code, unit, address, count, status, number of words
+RECORD = struct.Struct('<dBBHHBH')
+
+READ_HOLDING_REGISTERS = 3
+READ_INPUT_REGISTERS = 4
+WRITE_REGISTER = 6
+WRITE_REGISTERS = 16
+
+# Status of a record, other values are ModBus exception codes
+OK = 0
+NO_RESPONSE = 0xFF  # The client returned an exception instead of a response
+RAISED = 0xFE  # The connection raised an exception or was cancelled
+
+# A recorded request. `words` holds the registers read or values written.
+Record = namedtuple('Record', ['time', 'function', 'unit', 'address',
+                               'count', 'status', 'words'])
+
+
+class ReplayError(Exception):
+    """A request does not match the recording or the recording ended."""
+
+
+class ReadRegistersResponse(object):
+    def __init__(self, registers):
+        self.registers = registers
+
+    def isError(self):
+        return False
+
+
+class WriteResponse(object):
+    def __init__(self, address, value):
+        self.address = address
+        self.value = value
+
+    def isError(self):
+        return False
+
+
+class ExceptionResponse(object):
+    """ModBus exception response, has no `registers`."""
+
+    def __init__(self, function_code, exception_code):
+        self.function_code = function_code
+        self.exception_code = exception_code
+
+    def isError(self):
+        return True
+
+
+def _open(file, mode):
+    """Return the file object and whether it has to be closed."""
+    if hasattr(file, 'read' if 'r' in mode else 'write'):
+        return file, False
+    return open(file, mode), True
+
+
+def write_record(file, record):
+    """Write a Record to a binary file."""
+    words = array('H', record.words)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    file.write(RECORD.pack(record.time, record.function, record.unit,
+                           record.address, record.count, record.status,
+                           len(words)))
+    file.write(words.tobytes())
+
+
+def read_records(file):
+    """Read all Records of a recording (path or binary file)."""
+    file, owned = _open(file, 'rb')
+    try:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ReplayError("Not a recording")
+        records = []
+        while True:
+            header = file.read(RECORD.size)
+            if not header:
+                return records
+            if len(header) < RECORD.size:
+                raise ReplayError("Truncated recording")
+            fields = RECORD.unpack(header)
+            words = array('H')
+            words.frombytes(file.read(2 * fields[-1]))
+            if sys.byteorder == 'big':
+                words.byteswap()
+            records.append(Record(*fields[:-1], words=words))
+    finally:
+        if owned:
+            file.close()
+
+
+def _status(response):
+    code = getattr(response, 'exception_code', None)
+    if code:
+        return code
+    if isinstance(response, Exception):
+        return NO_RESPONSE
+    return OK
+
+
+class Recorder(object):
+    """Connection recording the requests to another connection.
+
+    Requests are recorded in the order they were issued, also when an
+    asyncio connection completes them in another order.
+    """
+
+    def __init__(self, conn, file):
+        """Initialize the recorder.
+
+        Args:
+            conn: Connection to record, e.g. a pymodbus client.
+            file: Path or binary file to write the recording to.
+        """
+        self._conn = conn
+        self._file, self._owned = _open(file, 'wb')
+        self._file.write(MAGIC)
+        self._start = time.monotonic()
+        # Issued requests as [time, Record or None until completed]
+        self._slots = deque()
+
+    def _issue(self):
+        slot = [time.monotonic() - self._start, None]
+        self._slots.append(slot)
+        return slot
+
+    def _complete(self, slot, function, unit, address, count, values,
+                  response=None, raised=False):
+        """Record a completed request, values are None for reads."""
+        if raised:
+            status, words = RAISED, values or ()
+        else:
+            status = _status(response)
+            if values is not None:
+                words = values
+            else:
+                words = getattr(response, 'registers', None)
+                if words is None:
+                    status = status or NO_RESPONSE
+                if status != OK:
+                    words = ()
+        slot[1] = Record(slot[0], function, unit, address, count, status,
+                         words)
+        while self._slots and self._slots[0][1] is not None:
+            write_record(self._file, self._slots.popleft()[1])
+
+    def _request(self, name, function, unit, address, count, values,
+                 arguments):
+        slot = self._issue()
+        try:
+            response = getattr(self._conn, name)(
+                unit=unit, address=address, **arguments)
+        except BaseException:
+            self._complete(slot, function, unit, address, count, values,
+                           raised=True)
+            raise
+        self._complete(slot, function, unit, address, count, values,
+                       response)
+        return response
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._request('read_input_registers', READ_INPUT_REGISTERS,
+                             unit, address, count, None, {'count': count})
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._request('read_holding_registers',
+                             READ_HOLDING_REGISTERS, unit, address, count,
+                             None, {'count': count})
+
+    def write_register(self, address, value, unit=0):
+        return self._request('write_register', WRITE_REGISTER, unit,
+                             address, 1, (value,), {'value': value})
+
+    def write_registers(self, address, values, unit=0):
+        return self._request('write_registers', WRITE_REGISTERS, unit,
+                             address, len(values), values,
+                             {'values': values})
+
+    def close(self):
+        """Finish the recording, dropping requests not completed yet."""
+        while self._slots:
+            record = self._slots.popleft()[1]
+            if record is not None:
+                write_record(self._file, record)
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncRecorder(Recorder):
+    """Recorder of an asyncio connection."""
+
+    async def _request(self, name, function, unit, address, count, values,
+                       arguments):
+        slot = self._issue()
+        try:
+            response = await getattr(self._conn, name)(
+                unit=unit, address=address, **arguments)
+        except BaseException:
+            # Also cancelled requests, e.g. by a timeout of wait_for. Later
+            # requests are only written once this one is recorded.
+            self._complete(slot, function, unit, address, count, values,
+                           raised=True)
+            raise
+        self._complete(slot, function, unit, address, count, values,
+                       response)
+        return response
+
+
+class ReplayConnection(object):
+    """Connection answering requests from a recording.
+
+    The requests have to match the recorded ones, otherwise ReplayError is
+    raised.
+    """
+
+    def __init__(self, file, speed=None, repeat=False):
+        """Initialize the replay.
+
+        Args:
+            file: Path or binary file of the recording.
+            speed: None to answer as fast as possible, otherwise the factor
+                of the recorded pace, e.g. 1 for real time.
+            repeat: Start over at the end of the recording, instead of
+                raising ReplayError.
+        """
+        self.records = read_records(file)
+        self._speed = speed
+        self._repeat = repeat
+        self._position = 0
+        self._start = None
+        # Recording time of the start, advanced on each repetition
+        self._offset = 0
+
+    def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def _next(self, function, unit, address, count, words=None):
+        """Return the next record and the seconds to wait for it."""
+        if self._position == len(self.records):
+            if not self._repeat or not self.records:
+                raise ReplayError("End of recording")
+            self._position = 0
+            self._offset -= self.records[-1].time
+        record = self.records[self._position]
+        if (record.function, record.unit, record.address, record.count) != \
+                (function, unit, address, count) or \
+                (words is not None and list(record.words) != list(words)):
+            raise ReplayError(
+                "Request {} does not match recorded request {}".format(
+                    (function, unit, address, count),
+                    (record.function, record.unit, record.address,
+                     record.count)))
+        self._position += 1
+
+        delay = 0
+        if self._speed is not None:
+            now = time.monotonic()
+            if self._start is None:
+                self._start = now - record.time / self._speed
+            delay = self._start + (record.time - self._offset) / \
+                self._speed - now
+        return record, max(0, delay)
+
+    def _response(self, record):
+        if record.status == RAISED:
+            raise ConnectionError("Request failed when recorded")
+        if record.status == NO_RESPONSE:
+            return IOError("No response when recorded")
+        if record.status != OK:
+            return ExceptionResponse(record.function, record.status)
+        if record.function in (READ_INPUT_REGISTERS, READ_HOLDING_REGISTERS):
+            return ReadRegistersResponse(record.words.tolist())
+        if record.function == WRITE_REGISTER:
+            return WriteResponse(record.address, record.words[0])
+        return WriteResponse(record.address, record.words.tolist())
+
+    def _request(self, function, unit, address, count, words=None):
+        record, delay = self._next(function, unit, address, count, words)
+        if delay:
+            time.sleep(delay)
+        return self._response(record)
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._request(READ_INPUT_REGISTERS, unit, address, count)
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._request(READ_HOLDING_REGISTERS, unit, address, count)
+
+    def write_register(self, address, value, unit=0):
+        return self._request(WRITE_REGISTER, unit, address, 1, (value,))
+
+    def write_registers(self, address, values, unit=0):
+        return self._request(WRITE_REGISTERS, unit, address, len(values),
+                             values)
+
+
+class AsyncReplayConnection(ReplayConnection):
+    """ReplayConnection of an AsyncStiebelEltronAPI."""
+
+    async def _request(self, function, unit, address, count, words=None):
+        record, delay = self._next(function, unit, address, count, words)
+        await asyncio.sleep(delay)
+        return self._response(record)
@@ -0,0 +1,339 @@
+"""
+Per-minute, hourly and daily rollups of the energy counters of a WPM3i.
+
+EnergyRollups consumes successive readings of the counter block
+(WPM3i_B4_REGMAP_INPUT: amounts of heat, power consumption and runtimes)
+and adds the increase of each counter since the previous reading to the
+current interval of each resolution. Completed intervals are kept in
+preallocated ring buffers, so the memory of a unit does not grow with the
+number of readings:
+
+    rollups = EnergyRollups(WPM3i_SCHEMA, on_close=store)
+    while True:
+        rollups.add(api.poll())
+        ...
+    starts, kwh = rollups.series(
+        'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL', 'hour')
+
+Three kinds of counters are tracked:
+
+- Totals, split into a MWh and a kWh register. The unit does not update
+  both at once, the kWh register may wrap to 0 a reading before the MWh
+  register is carried (or the other way round). Such readings are not
+  counted as a decrease (or an increase of 1000 kWh).
+- Daily counters (kWh), reset at midnight. After a reset, the value is the
+  increase since the reset.
+- Runtimes (hours). A decrease is taken as a reset of the counter and not
+  counted.
+
+The increase between two readings is attributed to the interval of the
+later one. Intervals start at local midnight, minutes and hours of the
+local time.
+"""
+import time
+from array import array
+from collections import namedtuple
+
+from pystiebeleltron.decode import available
+
+# Start address of the energy counter block of the WPM3i
+COUNTER_BLOCK_START = 3500
+
+DAY = 24 * 3600
+
+# Kinds of counters
+TOTAL = 'total'
+DAILY = 'daily'
+RUNTIME = 'runtime'
+
+# Length of the intervals of a rollup in seconds (a divisor of a day), and
+# the number of intervals kept
+Resolution = namedtuple('Resolution', ['name', 'seconds', 'capacity'])
+
+# The last hour per minute, two days per hour and a month per day
+DEFAULT_RESOLUTIONS = (
+    Resolution('minute', 60, 60),
+    Resolution('hour', 3600, 48),
+    Resolution('day', DAY, 31),
+)
+
+# A counter and its registers, (MWh, kWh) for totals
+Counter = namedtuple('Counter', ['name', 'kind', 'registers'])
+
+
+def block_counters(block):
+    """Return the counters of the registers of a block."""
+    names = {register.name: register for register in block.registers}
+    counters = []
+    for register in block.registers:
+        name = register.name
+        if name.endswith('__MWH'):
+            # Paired with its kWh register
+            continue
+        if name.endswith('__KWH'):
+            mwh = names.get(name[:-5] + '__MWH')
+            if mwh is None:
+                counters.append(Counter(name[:-5], DAILY, (register,)))
+            else:
+                counters.append(Counter(name[:-5], TOTAL, (mwh, register)))
+        else:
+            counters.append(Counter(name, RUNTIME, (register,)))
+    return counters
+
+
+def total_increase(previous, mwh, kwh):
+    """Return the increase of a total counter split in MWh and kWh.
+
+    Args:
+        previous: State returned for the previous reading, None for the
+            first one.
+        mwh: Raw value of the MWh register.
+        kwh: Raw value of the kWh register.
+
+    Returns:
+        Increase in kWh since the previous reading, 0 for the first one
+        and after a reset, and the state of this reading.
+    """
+    if previous is None:
+        return 0, [mwh, kwh, mwh, False]
+    previous_mwh, previous_kwh, effective, held = previous
+    # MWh the reading should show, with the carry of a wrapped kWh
+    expected = effective + 1 if kwh < previous_kwh else effective
+    held_now = False
+    if mwh == expected - 1 and (kwh < previous_kwh or
+                                mwh == previous_mwh):
+        # The kWh register wrapped, the MWh register is not carried yet
+        mwh_now = expected
+    elif mwh == expected + 1 and (not held or kwh == previous_kwh):
+        # The MWh register was carried before the kWh register wrapped,
+        # until the kWh register changes. Unless the counter increased by
+        # 1000 kWh between the readings, then the kWh register rising
+        # without wrapping counts it.
+        mwh_now = expected
+        held_now = True
+    elif mwh >= expected:
+        mwh_now = mwh
+    else:
+        # Reset, count from here
+        return 0, [mwh, kwh, mwh, False]
+    return ((mwh_now - effective) * 1000 + kwh - previous_kwh,
+            [mwh, kwh, mwh_now, held_now])
+
+
+def interval_start(timestamp, seconds):
+    """Return the start of the local interval a wall clock time is in."""
+    local = time.localtime(timestamp)
+    if seconds == DAY:
+        # Days are not 24 hours long when daylight saving time changes
+        return time.mktime(local[:3] + (0, 0, 0, 0, 0, -1))
+    return timestamp - (timestamp + local.tm_gmtoff) % seconds
+
+
+class Rollup(object):
+    """Ring buffer of the increases of counters per interval."""
+
+    def __init__(self, resolution, width):
+        """Initialize the rollup.
+
+        Args:
+            resolution: Resolution of the intervals.
+            width: Number of counters.
+        """
+        self.resolution = resolution
+        self._width = width
+        capacity = resolution.capacity
+        self._sums = array('d', bytes(8 * width * capacity))
+        self._starts = array('d', bytes(8 * capacity))
+        self._readings = array('L', bytes(
+            array('L').itemsize * capacity))
+        # Row of the current interval
+        self._row = -1
+        self._len = 0
+
+    def __len__(self):
+        """Return the number of intervals kept, including the current one."""
+        return self._len
+
+    def add(self, start, increases):
+        """Add the increases of a reading in the interval starting at start.
+
+        Returns:
+            The row of the interval completed by the reading, or None.
+        """
+        completed = None
+        if not self._len or start > self._starts[self._row]:
+            # A clock going backwards adds to the current interval
+            if self._len:
+                completed = self._row
+            self._row = (self._row + 1) % self.resolution.capacity
+            self._len = min(self._len + 1, self.resolution.capacity)
+            self._starts[self._row] = start
+            self._readings[self._row] = 0
+            row = self._row * self._width
+            self._sums[row:row + self._width] = array('d', bytes(
+                8 * self._width))
+        row = self._row * self._width
+        sums = self._sums
+        for column, increase in increases:
+            sums[row + column] += increase
+        self._readings[self._row] += 1
+        return completed
+
+    def _rows(self, count=None):
+        """Return the last count rows, oldest first."""
+        count = self._len if count is None else min(count, self._len)
+        capacity = self.resolution.capacity
+        return [(self._row - i) % capacity for i in range(count - 1, -1, -1)]
+
+    def starts(self, count=None):
+        """Return the starts of the last count intervals, oldest first."""
+        return [self._starts[row] for row in self._rows(count)]
+
+    def readings(self, count=None):
+        """Return the number of readings of the last count intervals."""
+        return [self._readings[row] for row in self._rows(count)]
+
+    def column(self, column, count=None):
+        """Return the increases of a counter in the last count intervals."""
+        width = self._width
+        return [self._sums[row * width + column] for row in self._rows(count)]
+
+    def interval(self, row=None):
+        """Return the start and increases of an interval, default current.
+
+        Returns:
+            Start of the interval and array of the increase of each counter,
+            (None, None) before the first reading.
+        """
+        if not self._len:
+            return None, None
+        if row is None:
+            row = self._row
+        start = row * self._width
+        return self._starts[row], self._sums[start:start + self._width]
+
+
+class EnergyRollups(object):
+    """Rollups of the increases of the energy counters of a unit."""
+
+    def __init__(self, schema, resolutions=DEFAULT_RESOLUTIONS,
+                 on_close=None):
+        """Initialize the rollups.
+
+        Args:
+            schema: RegisterSchema of a WPM3i.
+            resolutions: Resolutions of the rollups.
+            on_close: Called with the name of the resolution, the start of
+                the interval and a dict of counter name to increase, when
+                a reading completes an interval.
+
+        Raises:
+            ValueError: If the schema has no counter block, or the seconds
+                of a resolution do not divide a day.
+        """
+        blocks = [block for block in schema.blocks
+                  if block.start == COUNTER_BLOCK_START]
+        if not blocks:
+            raise ValueError("No energy counters in the schema")
+        for resolution in resolutions:
+            if DAY % resolution.seconds:
+                raise ValueError("Interval of {} does not divide a day".format(
+                    resolution.name))
+        self.block = blocks[0]
+        self.counters = block_counters(self.block)
+        self._columns = {counter.name: column
+                         for column, counter in enumerate(self.counters)}
+        self.rollups = {resolution.name: Rollup(resolution,
+                                                len(self.counters))
+                        for resolution in resolutions}
+        self.on_close = on_close
+        # Raw values of each counter at the previous reading: [value] for
+        # daily counters and runtimes, [MWh, kWh, effective MWh, held] for
+        # totals, see total_increase
+        self._previous = [None] * len(self.counters)
+        self._time = None
+
+    def add(self, snapshot):
+        """Add the counters of a Snapshot, if its counter block was read."""
+        if snapshot is None:
+            return
+        timestamp = snapshot.acquired[self.block.index]
+        if timestamp is not None:
+            self.update(snapshot.buffers, timestamp)
+
+    def update(self, buffers, timestamp, notify=True):
+        """Add a reading of the counters.
+
+        Args:
+            buffers: Block buffers of a RegisterStore or Snapshot.
+            timestamp: Wall clock time the counter block was read at.
+                Readings at the time of the previous one are ignored.
+            notify: Call on_close with the completed intervals, otherwise
+                they are only returned.
+
+        Returns:
+            List of (name of the resolution, start, dict of counter name to
+            increase) of the intervals the reading completed.
+        """
+        if timestamp == self._time:
+            return []
+        self._time = timestamp
+        buffer = buffers[self.block.index]
+        increases = []
+        for column, counter in enumerate(self.counters):
+            raws = [buffer[register.offset] for register in counter.registers]
+            if not all(available(register, raw) for register, raw
+                       in zip(counter.registers, raws)):
+                # Counted with the next reading
+                continue
+            previous = self._previous[column]
+            if counter.kind == TOTAL:
+                increase, self._previous[column] = total_increase(
+                    previous, *raws)
+            else:
+                self._previous[column] = raws
+                if previous is None:
+                    increase = 0
+                elif raws[0] >= previous[0]:
+                    increase = raws[0] - previous[0]
+                elif counter.kind == DAILY:
+                    increase = raws[0]
+                else:
+                    increase = 0
+            if increase:
+                increases.append((column, increase))
+        closed = []
+        for name, rollup in self.rollups.items():
+            completed = rollup.add(
+                interval_start(timestamp, rollup.resolution.seconds),
+                increases)
+            if completed is not None:
+                start, sums = rollup.interval(completed)
+                closed.append((name, start, self._values(sums)))
+        if notify and self.on_close is not None:
+            for interval in closed:
+                self.on_close(*interval)
+        return closed
+
+    def _values(self, sums):
+        return {counter.name: sums[column]
+                for column, counter in enumerate(self.counters)}
+
+    def series(self, name, resolution, count=None):
+        """Return the starts and increases of a counter, oldest first.
+
+        Args:
+            name: Name of the counter, see block_counters.
+            resolution: Name of the resolution.
+            count: Return at most the last count intervals, the last one is
+                the current interval.
+        """
+        rollup = self.rollups[resolution]
+        return rollup.starts(count), rollup.column(self._columns[name], count)
+
+    def current(self, resolution):
+        """Return the start and increases of the current interval."""
+        start, sums = self.rollups[resolution].interval()
+        if start is None:
+            return None, {}
+        return start, self._values(sums)
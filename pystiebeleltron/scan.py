@@ -0,0 +1,298 @@
+"""
+Discovery of the registers a unit populates.
+
+Large parts of the register maps belong to components most installations
+lack, e.g. heat pumps 2-6 of a cascade. A Scanner walks the address ranges
+around each block of a model with as few requests as possible: a range is
+read with a single request, and bisected while the unit answers with an
+illegal data address exception, down to single addresses. Requests run
+concurrently, up to a limit.
+
+The resulting DeviceProfile records which addresses answered and which of
+them hold UNAVAILABLE_OBJECT. Passed to the API, registers it lacks are
+never requested:
+
+    profile = await Scanner(client, 1).scan('wpm3i')
+    profile.save('isg-1.json')
+    api = StiebelEltronAPI(client, 1, is_wpm3i=True,
+                           profile=DeviceProfile.load('isg-1.json'))
+
+Scan from the command line:
+
+    python -m pystiebeleltron.scan --host 192.168.1.20 -o isg-1.json
+"""
+import argparse
+import asyncio
+
+from pystiebeleltron.decode import SIGNED_TYPES
+from pystiebeleltron.detect import async_detect_model
+from pystiebeleltron.planner import MAX_READ_COUNT
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT, model_schema
+
+# Addresses scanned before and after each block of the register map
+DEFAULT_MARGIN = 10
+# Maximum number of requests in flight
+DEFAULT_MAX_CONCURRENCY = 4
+# Repetitions of requests failing with other exceptions than an illegal
+# data address, e.g. the unit being busy
+DEFAULT_RETRIES = 2
+
+# ModBus exception code of reads of addresses the unit does not have
+ILLEGAL_DATA_ADDRESS = 2
+
+
+class ScanError(Exception):
+    """A request failed repeatedly, so the scan would be incomplete."""
+
+
+def _ranges(addresses):
+    """Return sorted addresses as list of [first, last] ranges."""
+    ranges = []
+    for address in sorted(addresses):
+        if ranges and ranges[-1][1] == address - 1:
+            ranges[-1][1] = address
+        else:
+            ranges.append([address, address])
+    return ranges
+
+
+def _addresses(ranges):
+    return frozenset(address for first, last in ranges
+                     for address in range(first, last + 1))
+
+
+class DeviceProfile(object):
+    """Addresses a unit answers for, and which of them hold no value."""
+
+    def __init__(self, model, responding, unavailable=()):
+        """Initialize the profile.
+
+        Args:
+            model: Model of the unit, 'lwz' or 'wpm3i'.
+            responding: Addresses the unit answered reads of.
+            unavailable: Responding addresses holding UNAVAILABLE_OBJECT.
+        """
+        self.model = model
+        self.responding = frozenset(responding)
+        self.unavailable = frozenset(unavailable)
+
+    def populated(self, address):
+        """Return whether the unit has a value at an address."""
+        return address in self.responding and \
+            address not in self.unavailable
+
+    def dead(self, schema=None):
+        """Return the addresses of the registers the unit does not populate.
+
+        These are the registers the unit did not answer for, and the signed
+        ones holding UNAVAILABLE_OBJECT. For unsigned registers like status
+        bits, 0x8000 is a valid value.
+
+        Args:
+            schema: RegisterSchema of the registers, defaults to the one
+                of the profile's model.
+        """
+        if schema is None:
+            schema = model_schema(self.model)
+        return frozenset(
+            register.addr for register in schema
+            if register.addr not in self.responding or (
+                register.addr in self.unavailable and
+                register.type in SIGNED_TYPES))
+
+    def unreadable(self, schema=None):
+        """Return the addresses within the blocks the unit did not answer."""
+        if schema is None:
+            schema = model_schema(self.model)
+        return frozenset(
+            address for block in schema.blocks
+            for address in range(block.start, block.start + block.count)
+            if address not in self.responding)
+
+    def to_dict(self):
+        """Return the profile as dict of JSON types."""
+        return {'model': self.model,
+                'responding': _ranges(self.responding),
+                'unavailable': _ranges(self.unavailable)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Return the profile of a dict returned by to_dict."""
+        return cls(data['model'], _addresses(data['responding']),
+                   _addresses(data['unavailable']))
+
+    def save(self, path):
+        """Write the profile to a JSON file."""
+        import json
+
+        with open(path, 'w') as profile_file:
+            json.dump(self.to_dict(), profile_file, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Read a profile written by save."""
+        import json
+
+        with open(path) as profile_file:
+            return cls.from_dict(json.load(profile_file))
+
+    def __eq__(self, other):
+        return isinstance(other, DeviceProfile) and \
+            self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return '<DeviceProfile of {}: {} responding, {} unavailable>'.format(
+            self.model, len(self.responding), len(self.unavailable))
+
+
+def scan_ranges(schema, margin=DEFAULT_MARGIN):
+    """Return the (read function, start, count) to scan for a schema.
+
+    Each block is widened by margin addresses on both sides. Overlapping
+    ranges of the same read function are merged.
+    """
+    ranges = []
+    for block in sorted(schema.blocks,
+                        key=lambda block: (block.function, block.start)):
+        start = max(0, block.start - margin)
+        end = block.start + block.count + margin
+        if ranges and ranges[-1][0] == block.function and \
+                start <= ranges[-1][1] + ranges[-1][2]:
+            function, first, count = ranges[-1]
+            ranges[-1] = (function, first, max(first + count, end) - first)
+        else:
+            ranges.append((block.function, start, end - start))
+    return ranges
+
+
+class Scanner(object):
+    """Finds the addresses a unit answers for, see DeviceProfile."""
+
+    def __init__(self, conn, slave, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 retries=DEFAULT_RETRIES):
+        """Initialize the scanner.
+
+        Args:
+            conn: asyncio ModBus client (or connection) of the ISG.
+            slave: Unit ID.
+            max_concurrency: Maximum number of requests in flight.
+            retries: Repetitions of a request failing with other exceptions
+                than an illegal data address.
+        """
+        self._conn = conn
+        self._slave = slave
+        self._max_concurrency = max_concurrency
+        self._retries = retries
+        # Number of requests sent by scans
+        self.requests = 0
+
+    async def scan(self, model=None, ranges=None, margin=DEFAULT_MARGIN):
+        """Scan the unit.
+
+        Args:
+            model: 'lwz' or 'wpm3i', detected if None.
+            ranges: Iterable of (read function, start, count) to scan,
+                defaults to the blocks of the model widened by margin.
+            margin: Addresses scanned before and after each block.
+
+        Returns:
+            DeviceProfile of the unit.
+
+        Raises:
+            ScanError: If a request failed more than retries times.
+        """
+        if model is None:
+            model = await async_detect_model(self._conn, self._slave)
+        if ranges is None:
+            ranges = scan_ranges(model_schema(model), margin)
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        responding = set()
+        unavailable = set()
+        chunks = [(function, address, min(MAX_READ_COUNT,
+                                          start + count - address))
+                  for function, start, count in ranges
+                  for address in range(start, start + count,
+                                       MAX_READ_COUNT)]
+        await asyncio.gather(*[
+            self._bisect(semaphore, responding, unavailable, *chunk)
+            for chunk in chunks])
+        return DeviceProfile(model, responding, unavailable)
+
+    async def _bisect(self, semaphore, responding, unavailable, function,
+                      address, count):
+        """Scan a range, splitting it while the unit does not answer."""
+        registers = await self._read(semaphore, function, address, count)
+        if registers is not None:
+            for offset, value in enumerate(registers):
+                responding.add(address + offset)
+                if value == UNAVAILABLE_OBJECT:
+                    unavailable.add(address + offset)
+        elif count > 1:
+            half = count // 2
+            await asyncio.gather(
+                self._bisect(semaphore, responding, unavailable, function,
+                             address, half),
+                self._bisect(semaphore, responding, unavailable, function,
+                             address + half, count - half))
+
+    async def _read(self, semaphore, function, address, count):
+        """Return the registers of a range, None for illegal addresses."""
+        for _ in range(self._retries + 1):
+            async with semaphore:
+                self.requests += 1
+                response = await getattr(self._conn, function)(
+                    unit=self._slave, address=address, count=count)
+            registers = getattr(response, 'registers', None)
+            if registers is not None and len(registers) == count:
+                return registers
+            if getattr(response, 'exception_code', None) == \
+                    ILLEGAL_DATA_ADDRESS:
+                return None
+        raise ScanError("Reading {} registers at {} failed".format(
+            count, address))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scan which registers a unit populates.")
+    parser.add_argument('--host', required=True, help="address of the ISG")
+    parser.add_argument('--port', type=int, default=502)
+    parser.add_argument('--unit', type=int, default=1)
+    parser.add_argument('--model', choices=['lwz', 'wpm3i'],
+                        help="detected if not given")
+    parser.add_argument('--margin', type=int, default=DEFAULT_MARGIN,
+                        help="addresses scanned around each block")
+    parser.add_argument('--max-concurrency', type=int,
+                        default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument('-o', '--output', help="file to write the profile "
+                                               "to, as JSON")
+    args = parser.parse_args(argv)
+
+    from pystiebeleltron.fleet import open_connection
+
+    async def scan():
+        client = await open_connection(args.host, args.port)
+        try:
+            return await Scanner(client, args.unit, args.max_concurrency).scan(
+                args.model, margin=args.margin)
+        finally:
+            client.transport.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        profile = loop.run_until_complete(scan())
+    finally:
+        loop.close()
+    if args.output:
+        profile.save(args.output)
+    schema = model_schema(profile.model)
+    dead = profile.dead(schema)
+    print("{}: {} of {} registers populated".format(
+        profile.model, len(schema) - len(dead), len(schema)))
+    for register in schema:
+        if register.addr in dead:
+            print("  {} {}".format(register.addr, register.name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Polling register groups at individual intervals.
+
+Status words change within seconds, temperatures within minutes, settings
+only when written and energy counters a few times an hour. A Scheduler reads
+each group of registers at its own interval. A tick reads the due groups
+together, so the planner merges them into as few requests as possible.
+
+    scheduler = Scheduler(api)  # A group per block, see DEFAULT_INTERVALS
+    scheduler.run()
+
+Writes through the API make the groups of the written registers due at once,
+so the holding registers (block 2) act as a write-through shadow, re-read on
+a slow interval or after a write.
+"""
+import asyncio
+import time
+from collections import namedtuple
+
+
+# Default seconds between reads per block number: system values, settings,
+# status and energy counters (WPM3i)
+DEFAULT_INTERVALS = {1: 60, 2: 3600, 3: 10, 4: 900}
+# Default priority per block number, lower values are read first
+DEFAULT_PRIORITIES = {1: 1, 2: 3, 3: 0, 4: 2}
+# Seconds before retrying groups which failed to read
+DEFAULT_RETRY_INTERVAL = 10
+
+# Registers (names or addresses) read every interval seconds. When a tick may
+# not read all due groups, those of lower priority value are read first.
+PollGroup = namedtuple('PollGroup', ['name', 'registers', 'interval',
+                                     'priority'])
+
+
+def block_groups(schema, intervals=None, priorities=None):
+    """Return a PollGroup per block of a schema, named 'block<number>'.
+
+    Args:
+        schema: RegisterSchema of the unit.
+        intervals: Dict of block number (1-4) to seconds between reads,
+            overriding DEFAULT_INTERVALS.
+        priorities: Dict of block number to priority, overriding
+            DEFAULT_PRIORITIES.
+    """
+    intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+    priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+    return [PollGroup('block{}'.format(block.index + 1),
+                      tuple(register.name for register in block.registers),
+                      intervals[block.index + 1],
+                      priorities[block.index + 1])
+            for block in schema.blocks]
+
+
+class Scheduler(object):
+    """Reads register groups of an API when they are due."""
+
+    def __init__(self, api, groups=None, max_requests=None,
+                 retry_interval=DEFAULT_RETRY_INTERVAL):
+        """Initialize the scheduler, all groups are due at first.
+
+        Args:
+            api: StiebelEltronAPI to update.
+            groups: Iterable of PollGroup (or tuples), defaults to
+                block_groups() of the API's schema.
+            max_requests: Maximum number of read requests per tick. Due
+                groups exceeding it are deferred to the next tick.
+            retry_interval: Seconds before retrying groups failed to read,
+                at most their interval.
+        """
+        self._api = api
+        if groups is None:
+            self.groups = block_groups(api._schema)
+        else:
+            self.groups = [PollGroup(*group) for group in groups]
+        self._max_requests = max_requests
+        self._retry_interval = retry_interval
+        self._registers = {group.name: set(group.registers)
+                           for group in self.groups}
+        self._due = {group.name: 0 for group in self.groups}
+        api._invalidation_listeners.append(self._invalidated)
+
+    def _invalidated(self, names):
+        """Make the groups of invalidated registers due."""
+        names = None if names is None else set(names)
+        for group in self.groups:
+            if names is None or not names.isdisjoint(
+                    self._registers[group.name]):
+                self._due[group.name] = 0
+
+    def due(self, now=None):
+        """Return the groups to read at now and the union of their registers.
+
+        Groups are taken by priority, as long as the merged read plan fits
+        into max_requests.
+        """
+        if now is None:
+            now = time.monotonic()
+        due = sorted((group for group in self.groups
+                      if self._due[group.name] <= now),
+                     key=lambda group: group.priority)
+        groups = []
+        names = set()
+        for group in due:
+            merged = names | self._registers[group.name]
+            if groups and self._max_requests is not None and \
+                    len(self._api._plan(merged)) > self._max_requests:
+                continue
+            groups.append(group)
+            names = merged
+        return groups, names
+
+    def _done(self, groups, success, now):
+        for group in groups:
+            if success:
+                self._due[group.name] = now + group.interval
+            else:
+                self._due[group.name] = now + min(group.interval,
+                                                  self._retry_interval)
+
+    def next_due(self, now=None):
+        """Return the seconds until the next group is due."""
+        if now is None:
+            now = time.monotonic()
+        return max(0, min(self._due.values()) - now)
+
+    def tick(self, now=None):
+        """Read the due groups. Returns the groups read successfully."""
+        if now is None:
+            now = time.monotonic()
+        groups, names = self.due(now)
+        if not groups:
+            return []
+        success = self._api.update(names)
+        self._done(groups, success, now)
+        return groups if success else []
+
+    def run(self):
+        """Read the groups when due, forever."""
+        while True:
+            self.tick()
+            time.sleep(self.next_due())
+
+    def close(self):
+        """Stop following writes through the API."""
+        self._api._invalidation_listeners.remove(self._invalidated)
+
+
+class AsyncScheduler(Scheduler):
+    """Scheduler of an AsyncStiebelEltronAPI."""
+
+    async def tick(self, now=None):
+        """Read the due groups. Returns the groups read successfully."""
+        if now is None:
+            now = time.monotonic()
+        groups, names = self.due(now)
+        if not groups:
+            return []
+        success = await self._api.update(names)
+        self._done(groups, success, now)
+        return groups if success else []
+
+    async def run(self):
+        """Read the groups when due, forever."""
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.next_due())
@@ -0,0 +1,480 @@
+"""
+Simulator of ISGs with LWZ and WPM3i units, for tests and load tests.
+
+A SimulatedISG serves ModBus TCP on asyncio, without pymodbus, and hosts
+a SimulatedDevice per unit ID. Devices are populated from the register maps
+with plausible values: temperatures follow slow sine waves, energy counters
+and runtimes grow (the daily counters reset at midnight), status words
+cycle, and registers of absent components are unavailable. Writes change
+the holding registers.
+
+Faults add latency with jitter, dropped responses and exception responses:
+
+    isg = SimulatedISG({1: SimulatedDevice('wpm3i')},
+                       Faults(latency=0.02, jitter=0.01, drop_rate=0.01))
+    port = await isg.start(port=5020)
+
+Many ISGs on consecutive ports, e.g. to load-test a FleetPoller:
+
+    python -m pystiebeleltron.simulator --model wpm3i --count 500 \\
+        --port 15000 --latency 0.05 --jitter 0.02
+"""
+import argparse
+import asyncio
+import math
+import random
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from pystiebeleltron.pystiebeleltron import LWZ_SCHEMA, WPM3i_SCHEMA
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT
+
+DEFAULT_PORT = 5020
+
+MODELS = {'lwz': LWZ_SCHEMA, 'wpm3i': WPM3i_SCHEMA}
+# Operating mode after start: AUTOMATIC (LWZ), PROGRAMMED_OPERATION (WPM3i)
+OPERATING_MODES = {'lwz': 11, 'wpm3i': 2}
+
+READ_HOLDING_REGISTERS = 3
+READ_INPUT_REGISTERS = 4
+WRITE_REGISTER = 6
+WRITE_REGISTERS = 16
+
+# ModBus exception codes
+ILLEGAL_FUNCTION = 1
+ILLEGAL_DATA_ADDRESS = 2
+ILLEGAL_DATA_VALUE = 3
+SLAVE_DEVICE_FAILURE = 4
+GATEWAY_TARGET_NO_RESPONSE = 0x0B
+
+MBAP = struct.Struct('>HHHB')
+
+# Registers of components a simulated unit does not have
+UNAVAILABLE = re.compile(
+    r'HC2|HK_2|HEAT_PUMP_[2-6]|SOLAR|EXTERNAL|COLLECTOR|COOLING__')
+
+# Time-varying values of signed registers, the first matching pattern
+# applies: (pattern, base, amplitude, period in seconds)
+SIGNALS = (
+    (r'OUTSIDE', 5.0, 6.0, 86400),
+    (r'HUMIDITY', 45.0, 5.0, 21600),
+    (r'DEW_POINT', 9.0, 1.0, 21600),
+    (r'HIGH_PRESSURE', 20.0, 3.0, 1800),
+    (r'LOW_PRESSURE', 5.0, 1.0, 1800),
+    (r'PRESSURE', 1.8, 0.1, 3600),
+    (r'FLOW_RATE', 12.0, 2.0, 1800),
+    (r'HOT_GAS', 70.0, 10.0, 1800),
+    (r'DHW|_WW', 48.0, 3.0, 7200),
+    (r'SOURCE', 8.0, 2.0, 3600),
+    (r'RETURN', 30.0, 3.0, 1800),
+    (r'FLOW|VALUE_HC|_HK_|BUFFER|FIXED', 35.0, 4.0, 1800),
+    (r'SPEED', 50.0, 20.0, 1200),
+    (r'', 21.0, 0.5, 3600),
+)
+
+# Energy per hour of the counters, by kind of counter
+HEAT_RATE = {'VD_HEATING': 3.0, 'VD_DHW': 1.0,
+             'NHZ_HEATING': 0.1, 'NHZ_DHW': 0.05}
+# Amount of heat per power consumed
+COP = 3.0
+
+# OPERATING_STATUS while the compressor heats, and while it is off
+STATUS_HEATING = 0x0007
+STATUS_IDLE = 0x0001
+# Seconds of a compressor cycle, the compressor runs during the first 2/3
+STATUS_PERIOD = 1800
+
+# Fault injection of an ISG. Rates are probabilities per request,
+# latency and jitter are seconds.
+Faults = namedtuple('Faults', ['latency', 'jitter', 'drop_rate',
+                               'exception_rate', 'exception_code'])
+Faults.__new__.__defaults__ = (0, 0, 0, 0, SLAVE_DEVICE_FAILURE)
+
+
+class ModbusError(Exception):
+    """Request answered by a ModBus exception response."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def _counter(name):
+    """Return the kind of counter (key of HEAT_RATE) of a register, or None."""
+    match = re.search(r'(VD|NHZ)_(HEATING|DHW)_(DAY|TOTAL)__[KM]WH$', name)
+    if match is None:
+        return None
+    return '{}_{}'.format(match.group(1), match.group(2))
+
+
+class SimulatedDevice(object):
+    """Registers of a simulated unit."""
+
+    def __init__(self, model='lwz', seed=None, clock=time.time):
+        """Initialize the device.
+
+        Args:
+            model: 'lwz' or 'wpm3i'.
+            seed: Seed of the randomized values, e.g. the device number.
+            clock: Callable returning the time in seconds since the epoch,
+                the values are computed from.
+        """
+        self.model = model
+        self.schema = MODELS[model]
+        self.clock = clock
+        rand = random.Random(seed)
+        self._start = clock()
+        # Registers set explicitly (raw), taking precedence
+        self._fixed = {}
+        # Callables of time returning a raw value
+        self._signals = {}
+        # Initial kWh of heat per kind of energy counter
+        self._totals = {}
+        for block in self.schema.blocks:
+            for register in block.registers:
+                if block.function == 'read_holding_registers':
+                    self._fixed[register.addr] = self._setting(register)
+                else:
+                    self._signals[register.addr] = self._signal(
+                        register, rand)
+
+    def _setting(self, register):
+        name = register.name
+        if name == 'OPERATING_MODE':
+            return OPERATING_MODES[self.model]
+        if register.type == 7:
+            return register.encode(0.6)
+        if register.type != 2:
+            return 0
+        if 'DHW' in name:
+            return register.encode(50.0)
+        if 'COOL' in name:
+            return register.encode(24.0)
+        if 'NIGHT' in name or 'ECO' in name:
+            return register.encode(18.0)
+        return register.encode(21.0)
+
+    def _signal(self, register, rand):
+        name = register.name
+        if register.type in (2, 7):
+            if UNAVAILABLE.search(name):
+                return lambda now: UNAVAILABLE_OBJECT
+            for pattern, base, amplitude, period in SIGNALS:
+                if re.search(pattern, name):
+                    break
+            phase = rand.uniform(0, 2 * math.pi)
+            return lambda now: register.encode(round(
+                base + amplitude * math.sin(
+                    2 * math.pi * now / period + phase),
+                2 if register.type == 7 else 1))
+
+        kind = _counter(name)
+        if kind is not None:
+            if not name.startswith(('ALL_', 'HP1_')):
+                # Only a single heat pump
+                return lambda now: 0
+            rate = HEAT_RATE[kind]
+            # Heat produced so far, shared by all counters of the kind
+            total = self._totals.setdefault(
+                kind, rand.uniform(1000, 40000) * rate)
+            if 'POWER_CONSUMPTION' in name:
+                rate /= COP
+                total /= COP
+            if name.endswith('DAY__KWH'):
+                return lambda now: int(rate * _since_midnight(now) / 3600)
+            start = self._start
+            if name.endswith('MWH'):
+                return lambda now: int(
+                    total + rate * (now - start) / 3600) // 1000
+            return lambda now: int(
+                total + rate * (now - start) / 3600) % 1000
+        if 'RUNTIME' in name and not name.startswith('HP2'):
+            hours = rand.randrange(1000, 20000)
+            start = self._start
+            return lambda now: (hours + int((now - start) / 7200)) & 0xFFFF
+        if name.startswith('OPERATING_STATUS'):
+            return lambda now: STATUS_HEATING \
+                if now % STATUS_PERIOD < STATUS_PERIOD * 2 / 3 \
+                else STATUS_IDLE
+        if 'FAULT' in name or 'BUS' in name or 'POWER-OFF' in name:
+            return lambda now: 0
+        value = rand.randrange(0, 100)
+        return lambda now: value
+
+    def raw(self, address, now=None):
+        """Return the raw value of a register address."""
+        fixed = self._fixed.get(address)
+        if fixed is not None:
+            return fixed
+        signal = self._signals.get(address)
+        if signal is None:
+            return 0
+        return signal(self.clock() if now is None else now)
+
+    def set_raw(self, key, raw):
+        """Fix a register (name or address) to a raw value."""
+        self._fixed[self.schema[key].addr] = int(raw) & 0xFFFF
+
+    def set(self, key, value):
+        """Fix a register to a value, converted by its data type."""
+        register = self.schema[key]
+        self._fixed[register.addr] = register.encode(value)
+
+    def release(self, key):
+        """Let a fixed input register follow its simulation again."""
+        addr = self.schema[key].addr
+        if addr in self._signals:
+            self._fixed.pop(addr, None)
+
+    def _block(self, function, address, count):
+        for block in self.schema.blocks:
+            if block.start <= address and \
+                    address + count <= block.start + block.count:
+                if block.function != function:
+                    break
+                return block
+        raise ModbusError(ILLEGAL_DATA_ADDRESS)
+
+    def read(self, function, address, count):
+        """Return the raw values of a read request (pymodbus method name)."""
+        if not 1 <= count <= 125:
+            raise ModbusError(ILLEGAL_DATA_VALUE)
+        self._block(function, address, count)
+        now = self.clock()
+        return [self.raw(addr, now) for addr in range(address,
+                                                      address + count)]
+
+    def write(self, address, values):
+        """Write holding registers."""
+        if not 1 <= len(values) <= 123:
+            raise ModbusError(ILLEGAL_DATA_VALUE)
+        self._block('read_holding_registers', address, len(values))
+        for offset, value in enumerate(values):
+            self._fixed[address + offset] = value
+
+
+def _since_midnight(now):
+    """Return the seconds since local midnight."""
+    local = time.localtime(now)
+    return local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec + \
+        (now % 1)
+
+
+class _ModbusProtocol(asyncio.Protocol):
+    """ModBus TCP server connection."""
+
+    def __init__(self, isg):
+        self._isg = isg
+        self._buffer = b''
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._isg.connections += 1
+
+    def connection_lost(self, exc):
+        self._isg.connections -= 1
+        self._transport = None
+
+    def data_received(self, data):
+        self._buffer += data
+        while len(self._buffer) >= MBAP.size:
+            transaction, protocol, length, unit = MBAP.unpack_from(
+                self._buffer)
+            end = 6 + length
+            if len(self._buffer) < end:
+                return
+            pdu = self._buffer[MBAP.size:end]
+            self._buffer = self._buffer[end:]
+            response = self._isg.handle(unit, pdu)
+            if response is None:
+                continue
+            frame = MBAP.pack(transaction, protocol, len(response) + 1,
+                              unit) + response
+            delay = self._isg.delay()
+            if delay > 0:
+                asyncio.get_event_loop().call_later(delay, self._send, frame)
+            else:
+                self._send(frame)
+
+    def _send(self, frame):
+        if self._transport is not None:
+            self._transport.write(frame)
+
+
+class SimulatedISG(object):
+    """ModBus TCP server of simulated devices."""
+
+    def __init__(self, devices, faults=None, seed=None):
+        """Initialize the ISG.
+
+        Args:
+            devices: Dict of unit ID to SimulatedDevice.
+            faults: Faults injected, default none.
+            seed: Seed of the fault injection.
+        """
+        self.devices = devices
+        self.faults = faults if faults is not None else Faults()
+        self._random = random.Random(seed)
+        self._server = None
+        self.port = None
+        self.connections = 0
+        self.requests = 0
+
+    def delay(self):
+        """Return the seconds to delay a response."""
+        faults = self.faults
+        if not faults.jitter:
+            return faults.latency
+        return max(0, faults.latency + self._random.uniform(-faults.jitter,
+                                                            faults.jitter))
+
+    def handle(self, unit, pdu):
+        """Return the response PDU of a request PDU, None to drop it."""
+        self.requests += 1
+        faults = self.faults
+        if faults.drop_rate and self._random.random() < faults.drop_rate:
+            return None
+        function = pdu[0]
+        try:
+            if faults.exception_rate and \
+                    self._random.random() < faults.exception_rate:
+                raise ModbusError(faults.exception_code)
+            device = self.devices.get(unit)
+            if device is None:
+                raise ModbusError(GATEWAY_TARGET_NO_RESPONSE)
+            return self._execute(device, function, pdu)
+        except ModbusError as err:
+            return struct.pack('>BB', function | 0x80, err.code)
+        except struct.error:
+            return struct.pack('>BB', function | 0x80, ILLEGAL_DATA_VALUE)
+
+    @staticmethod
+    def _execute(device, function, pdu):
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            address, count = struct.unpack_from('>HH', pdu, 1)
+            values = device.read(
+                'read_holding_registers' if function == READ_HOLDING_REGISTERS
+                else 'read_input_registers', address, count)
+            return struct.pack('>BB{}H'.format(count), function, 2 * count,
+                               *values)
+        if function == WRITE_REGISTER:
+            address, value = struct.unpack_from('>HH', pdu, 1)
+            device.write(address, [value])
+            return pdu[:5]
+        if function == WRITE_REGISTERS:
+            address, count, size = struct.unpack_from('>HHB', pdu, 1)
+            if size != 2 * count:
+                raise ModbusError(ILLEGAL_DATA_VALUE)
+            device.write(address, list(struct.unpack_from(
+                '>{}H'.format(count), pdu, 6)))
+            return pdu[:5]
+        raise ModbusError(ILLEGAL_FUNCTION)
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start serving, returns the port (a free one for port 0)."""
+        loop = asyncio.get_event_loop()
+        self._server = await loop.create_server(
+            lambda: _ModbusProtocol(self), host, port, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """Stop serving."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+async def start_isgs(count, model='lwz', units=(1,), host='127.0.0.1',
+                     port=0, faults=None):
+    """Start count ISGs on consecutive ports (free ones for port 0).
+
+    Each ISG hosts a device of the model per unit ID, seeded by its number.
+    """
+    isgs = []
+    for number in range(count):
+        isg = SimulatedISG(
+            {unit: SimulatedDevice(model, seed=number * 256 + unit)
+             for unit in units},
+            faults, seed=number)
+        await isg.start(host, port + number if port else 0)
+        isgs.append(isg)
+    return isgs
+
+
+class SimulatorThread(object):
+    """Runs a SimulatedISG on an event loop in a thread, for sync clients."""
+
+    def __init__(self, isg, host='127.0.0.1', port=DEFAULT_PORT):
+        self.isg = isg
+        self._host = host
+        self._port = port
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='SimulatedISG', daemon=True)
+
+    def start(self):
+        """Start serving, returns the port."""
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.isg.start(self._host, self._port), self._loop).result()
+
+    def stop(self):
+        """Stop serving and the thread."""
+        asyncio.run_coroutine_threadsafe(self.isg.close(),
+                                         self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate ISGs with LWZ or WPM3i units.")
+    parser.add_argument('--model', choices=sorted(MODELS), default='lwz')
+    parser.add_argument('--count', type=int, default=1,
+                        help="number of ISGs, on consecutive ports")
+    parser.add_argument('--units', default='1',
+                        help="comma separated unit IDs per ISG")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help="port of the first ISG")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="seconds per response")
+    parser.add_argument('--jitter', type=float, default=0,
+                        help="maximum seconds added to or taken from the "
+                             "latency")
+    parser.add_argument('--drop-rate', type=float, default=0,
+                        help="probability of not responding")
+    parser.add_argument('--exception-rate', type=float, default=0,
+                        help="probability of an exception response")
+    parser.add_argument('--exception-code', type=int,
+                        default=SLAVE_DEVICE_FAILURE)
+    args = parser.parse_args(argv)
+
+    faults = Faults(args.latency, args.jitter, args.drop_rate,
+                    args.exception_rate, args.exception_code)
+    units = [int(unit) for unit in args.units.split(',')]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    isgs = loop.run_until_complete(start_isgs(
+        args.count, args.model, units, args.host, args.port, faults))
+    print("Serving {} ISG(s) on {}:{}-{}".format(
+        len(isgs), args.host, isgs[0].port, isgs[-1].port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for isg in isgs:
+            loop.run_until_complete(isg.close())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Immutable point-in-time values of a unit.
+
+A Snapshot holds a read-only copy of the raw block buffers together with
+the (wall clock) time each block was last read completely and how long
+reading it took. Values are only converted when accessed. Snapshots never
+change, so they can be handed to other threads or pickled without locking:
+
+    snapshot = api.poll()
+    if snapshot is not None:
+        snapshot['OUTSIDE_TEMPERATURE'], snapshot.values.FLOW_TEMPERATURE
+        snapshot.age()  # seconds since the oldest block was read
+"""
+import time
+
+from pystiebeleltron.accessors import values_class
+from pystiebeleltron.registers import model_schema
+
+
+class Snapshot(object):
+    """Immutable raw register values of a unit at a point in time."""
+
+    __slots__ = ('schema', 'buffers', 'acquired', 'durations', 'time',
+                 'unavailable', '_values')
+
+    def __init__(self, schema, buffers, acquired, durations, timestamp=None,
+                 unavailable=frozenset()):
+        """Initialize the snapshot.
+
+        Args:
+            schema: RegisterSchema of the buffers.
+            buffers: Raw values of each block (array('H') or bytes), copied.
+            acquired: Wall clock time each block was last read completely,
+                None if it never was.
+            durations: Seconds reading each block took, None if unknown.
+            timestamp: Wall clock time of the snapshot, defaults to now.
+            unavailable: Addresses of registers which read None, e.g. the
+                ones pruned by the API.
+        """
+        set_slot = object.__setattr__
+        set_slot(self, 'schema', schema)
+        set_slot(self, 'buffers', tuple(
+            memoryview(bytes(buffer)).cast('H') for buffer in buffers))
+        set_slot(self, 'acquired', tuple(acquired))
+        set_slot(self, 'durations', tuple(durations))
+        set_slot(self, 'time', time.time() if timestamp is None
+                 else timestamp)
+        set_slot(self, 'unavailable', frozenset(unavailable))
+        set_slot(self, '_values', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshots are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Snapshots are immutable")
+
+    def __reduce__(self):
+        if self.schema.model is None:
+            raise TypeError("Only snapshots of a packaged model can be "
+                            "pickled")
+        return (_restore, (self.schema.model,
+                           [buffer.tobytes() for buffer in self.buffers],
+                           self.acquired, self.durations, self.time,
+                           self.unavailable))
+
+    @property
+    def values(self):
+        """Converted values as attributes, see accessors.RegisterValues."""
+        values = self._values
+        if values is None:
+            values = values_class(self.schema, self.unavailable)(
+                self.buffers)
+            object.__setattr__(self, '_values', values)
+        return values
+
+    def raw(self, key):
+        """Return the raw value of a register by name or Modbus address."""
+        register = self.schema[key]
+        return self.buffers[register.block][register.offset]
+
+    def __getitem__(self, key):
+        """Return the converted value of a register by name or address."""
+        register = self.schema[key]
+        if register.addr in self.unavailable:
+            return None
+        return register.decode(self.buffers[register.block][register.offset])
+
+    def get(self, key, default=None):
+        """Return the converted value of a register, or default if unknown."""
+        if key not in self.schema:
+            return default
+        return self[key]
+
+    def __contains__(self, key):
+        return key in self.schema
+
+    def items(self):
+        """Iterate over (name, converted value) of all registers."""
+        buffers = self.buffers
+        unavailable = self.unavailable
+        for register in self.schema:
+            if register.addr in unavailable:
+                yield register.name, None
+            else:
+                yield register.name, register.decode(
+                    buffers[register.block][register.offset])
+
+    def acquired_at(self, key):
+        """Return when the block of a register was last read completely."""
+        return self.acquired[self.schema[key].block]
+
+    def age(self, key=None, now=None):
+        """Return the age of a register's block in seconds.
+
+        Args:
+            key: Name or address of a register, defaults to the oldest
+                block.
+            now: Wall clock time to measure against, defaults to now.
+
+        Returns:
+            Seconds, None if the block (or any block) was never read.
+        """
+        if key is None:
+            acquired = None if None in self.acquired else min(self.acquired)
+        else:
+            acquired = self.acquired_at(key)
+        if acquired is None:
+            return None
+        return (time.time() if now is None else now) - acquired
+
+    def __repr__(self):
+        return '<Snapshot at {:.3f} of {} blocks>'.format(
+            self.time, len(self.buffers))
+
+
+def _restore(model, buffers, acquired, durations, timestamp,
+             unavailable=frozenset()):
+    return Snapshot(model_schema(model), buffers, acquired, durations,
+                    timestamp, unavailable)
@@ -0,0 +1,150 @@
+"""
+Subscriptions to changed register values.
+
+After each update, subscribers receive a dict of the registers which changed
+since they were last delivered, mapped to their converted values. The first
+delivery contains all registers.
+
+    def on_change(changes):
+        for name, value in changes.items():
+            publish(name, value)
+
+    api.subscribe(on_change, deadbands={'OUTSIDE_TEMPERATURE': 0.5})
+
+AsyncStiebelEltronAPI additionally provides the changes as async iterator.
+If the consumer is slower than the updates, the changes are merged and only
+the latest value of each register is delivered:
+
+    async for changes in api.changes():
+        ...
+"""
+from array import array
+
+
+class ChangeTracker(object):
+    """Computes the registers changed since the last delivery.
+
+    Deadbands (dict of register name to minimum change of the converted
+    value) suppress noise: a register is only delivered once it moved at
+    least its deadband away from the value delivered last.
+    """
+
+    def __init__(self, schema, deadbands=None):
+        self._schema = schema
+        self._deadbands = {schema[name].addr: deadband
+                           for name, deadband in (deadbands or {}).items()}
+        # Raw values delivered last, per block
+        self._delivered = None
+        # Addresses of the registers delivered as None
+        self._unavailable = frozenset()
+
+    def changes(self, buffers, unavailable=frozenset()):
+        """Return the changed registers (name -> value) of the buffers.
+
+        Args:
+            buffers: Block buffers of a RegisterStore.
+            unavailable: Addresses of registers which read None, e.g.
+                pruned ones.
+        """
+        if self._delivered is None:
+            self._delivered = [array('H', buffer) for buffer in buffers]
+            self._unavailable = unavailable
+            return {register.name: None if register.addr in unavailable
+                    else register.decode(
+                        buffers[register.block][register.offset])
+                    for register in self._schema}
+
+        changes = {}
+        if unavailable != self._unavailable:
+            # Registers becoming unavailable or available again
+            for addr in unavailable ^ self._unavailable:
+                register = self._schema[addr]
+                if addr in unavailable:
+                    changes[register.name] = None
+                else:
+                    raw = buffers[register.block][register.offset]
+                    self._delivered[register.block][register.offset] = raw
+                    changes[register.name] = register.decode(raw)
+            self._unavailable = unavailable
+        for block, buffer, delivered in zip(
+                self._schema.blocks, buffers, self._delivered):
+            if buffer == delivered:
+                continue
+            for register in block.registers:
+                raw = buffer[register.offset]
+                previous = delivered[register.offset]
+                if raw == previous or register.addr in unavailable:
+                    continue
+                value = register.decode(raw)
+                deadband = self._deadbands.get(register.addr)
+                if deadband is not None and \
+                        abs(value - register.decode(previous)) < deadband:
+                    continue
+                delivered[register.offset] = raw
+                changes[register.name] = value
+        return changes
+
+
+class Subscription(object):
+    """Calls a callback with the changed registers after each update."""
+
+    def __init__(self, api, callback, deadbands=None):
+        self._api = api
+        self._callback = callback
+        self._tracker = ChangeTracker(api._schema, deadbands)
+
+    def publish(self, buffers, unavailable=frozenset()):
+        """Deliver the changes of freshly read buffers.
+
+        Args:
+            buffers: Block buffers of a RegisterStore.
+            unavailable: Addresses of registers delivered as None.
+        """
+        changes = self._tracker.changes(buffers, unavailable)
+        if changes:
+            self._deliver(changes)
+
+    def _deliver(self, changes):
+        self._callback(changes)
+
+    def close(self):
+        """Stop the subscription."""
+        self._api.unsubscribe(self)
+
+
+class ChangeStream(Subscription):
+    """Async iterator of changed registers, coalescing unconsumed changes.
+
+    Has to be used on the event loop updating the API.
+    """
+
+    def __init__(self, api, deadbands=None):
+        # Imported here, asyncio takes longer to import than the sync API
+        import asyncio
+
+        super().__init__(api, None, deadbands)
+        self._pending = {}
+        self._event = asyncio.Event()
+        self._closed = False
+
+    def _deliver(self, changes):
+        self._pending.update(changes)
+        self._event.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._pending:
+            if self._closed:
+                raise StopAsyncIteration
+            self._event.clear()
+            await self._event.wait()
+        changes, self._pending = self._pending, {}
+        return changes
+
+    def close(self):
+        """Stop the subscription, pending changes are still delivered."""
+        super().close()
+        self._closed = True
+        self._event.set()
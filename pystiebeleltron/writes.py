@@ -0,0 +1,257 @@
+"""
+Batched and debounced writes of holding registers.
+
+A WriteBatch collects register values and writes them when committed,
+merging contiguous registers into a single write_registers request. Writing
+a register again before the commit replaces its value (last writer wins).
+
+    with api.write_batch() as batch:
+        batch.set('HEATING_CIRCUIT_1__COMFORT_TEMPERATURE', 21.5)
+        batch.set('HEATING_CIRCUIT_1__ECO_TEMPERATURE', 19.0)
+
+A DebouncedWriter commits a batch once no value changed for a delay, e.g. to
+forward a UI slider without flooding the ISG.
+"""
+import threading
+
+# Maximum number of registers of a single write request (Modbus limit)
+MAX_WRITE_COUNT = 123
+
+
+def plan_writes(pending, max_count=MAX_WRITE_COUNT):
+    """Merge register writes into requests of contiguous registers.
+
+    Args:
+        pending: Dict of address to raw value.
+        max_count: Maximum number of registers per request.
+
+    Returns:
+        List of (address, [raw values]).
+    """
+    requests = []
+    for address in sorted(pending):
+        if requests:
+            start, values = requests[-1]
+            if start + len(values) == address and len(values) < max_count:
+                values.append(pending[address])
+                continue
+        requests.append((address, [pending[address]]))
+    return requests
+
+
+class WriteBatch(object):
+    """Holding register writes of an API, sent on commit."""
+
+    def __init__(self, api):
+        self._api = api
+        self._pending = {}
+        self._names = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _register(self, name):
+        register = self._api._schema[name]
+        block = self._api._schema.blocks[register.block]
+        if block.function != 'read_holding_registers':
+            raise ValueError("{} is not a holding register".format(name))
+        return register
+
+    def set(self, name, value):
+        """Set a register to a value, converted by its data type."""
+        register = self._register(name)
+        self._pending[register.addr] = register.encode(value)
+        self._names.add(register.name)
+
+    def set_raw(self, name, raw):
+        """Set a register to a raw value."""
+        register = self._register(name)
+        self._pending[register.addr] = raw
+        self._names.add(register.name)
+
+    def _take(self):
+        """Return the planned requests and the registers, clear the batch."""
+        requests = plan_writes(self._pending)
+        names = self._names
+        self._pending = {}
+        self._names = set()
+        return requests, names
+
+    def _send(self, address, values):
+        conn = self._api._conn
+        if len(values) == 1:
+            return conn.write_register(
+                unit=self._api._slave, address=address, value=values[0])
+        return conn.write_registers(
+            unit=self._api._slave, address=address, values=values)
+
+    def commit(self):
+        """Write the collected registers. Returns the write responses."""
+        requests, names = self._take()
+        try:
+            return [self._send(address, values)
+                    for address, values in requests]
+        finally:
+            self._api.invalidate(names)
+
+    def discard(self):
+        """Drop the collected registers."""
+        self._take()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+class AsyncWriteBatch(WriteBatch):
+    """WriteBatch of an AsyncStiebelEltronAPI, use `async with`."""
+
+    async def commit(self):
+        """Write the collected registers. Returns the write responses."""
+        requests, names = self._take()
+        try:
+            return [await self._send(address, values)
+                    for address, values in requests]
+        finally:
+            self._api.invalidate(names)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.commit()
+        else:
+            self.discard()
+
+
+class DebouncedWriter(object):
+    """Writes registers once they did not change for `delay` seconds.
+
+    Values set in the meantime are merged into one batch, the last value of
+    a register wins. The batch is written from a timer thread. An error of
+    this write is passed to `on_error`, or raised by the next call of set()
+    or flush() without one (which then does not set or write anything).
+    """
+
+    def __init__(self, api, delay=0.5, on_error=None):
+        self._api = api
+        self._delay = delay
+        self._on_error = on_error
+        self._batch = api.write_batch()
+        self._lock = threading.Lock()
+        self._timer = None
+        # Error of the timed write, raised by the next call
+        self._error = None
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def set(self, name, value):
+        """Set a register to a value, written after the delay."""
+        with self._lock:
+            self._raise_error()
+            self._batch.set(name, value)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._delay, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if len(self._batch):
+            self._batch.commit()
+
+    def _timed_flush(self):
+        error = None
+        with self._lock:
+            if threading.current_thread() is not self._timer:
+                # Replaced by a later set() or flush() while waiting
+                return
+            try:
+                self._commit()
+            except Exception as err:
+                if self._on_error is None:
+                    self._error = err
+                else:
+                    error = err
+        if error is not None:
+            # Outside the lock, the callback may set values again
+            self._on_error(error)
+
+    def flush(self):
+        """Write pending registers now."""
+        with self._lock:
+            self._raise_error()
+            self._commit()
+
+
+class AsyncDebouncedWriter(object):
+    """DebouncedWriter of an AsyncStiebelEltronAPI, runs on the event loop."""
+
+    def __init__(self, api, delay=0.5, on_error=None):
+        self._api = api
+        self._delay = delay
+        self._on_error = on_error
+        self._batch = api.write_batch()
+        self._handle = None
+        # Timed writes in progress, referenced until done
+        self._tasks = set()
+        self._error = None
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def set(self, name, value):
+        """Set a register to a value, written after the delay."""
+        # Imported here, asyncio takes longer to import than the sync API
+        import asyncio
+
+        self._raise_error()
+        self._batch.set(name, value)
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = asyncio.get_event_loop().call_later(
+            self._delay, self._start_flush)
+
+    def _start_flush(self):
+        import asyncio
+
+        self._handle = None
+        task = asyncio.ensure_future(self._timed_flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _timed_flush(self):
+        try:
+            await self._batch.commit()
+        except Exception as err:
+            if self._on_error is None:
+                self._error = err
+            else:
+                self._on_error(err)
+
+    async def flush(self):
+        """Write pending registers now, after the timed writes in progress."""
+        import asyncio
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
+        self._raise_error()
+        if len(self._batch):
+            await self._batch.commit()
@@ -44,21 +44,21 @@ setup(
     url='https://github.com/fucm/python-stiebel-eltron',
     author='Martin Fuchs',
     license='MIT',
-    python_requires='>=3.4',
+    python_requires='>=3.7',
     install_requires=['pymodbus>=2.1.0'],
+    extras_require={'numpy': ['numpy']},
     tests_require=['tox'],
     cmdclass={'test': Tox},
     packages=find_packages(exclude=('test', 'test.*')),
     zip_safe=True,
     include_package_data=True,
+    package_data={'pystiebeleltron': ['data/*.regmap']},
     # https://pypi.org/classifiers/
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
         'Topic :: Utilities',
     ],
 )
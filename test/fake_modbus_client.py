@@ -0,0 +1,114 @@
+"""
+In-memory stand-in for the pymodbus clients.
+
+Registers live in a dict (address -> value) shared by input and holding
+registers, like the address ranges of the ISG do not overlap. Every request
+is recorded in `requests` to allow assertions on the bus traffic.
+"""
+import asyncio
+
+
+class ReadRegistersResponse(object):
+    def __init__(self, registers):
+        self.registers = registers
+
+
+class WriteResponse(object):
+    def __init__(self, address, value):
+        self.address = address
+        self.value = value
+
+
+class ExceptionResponse(object):
+    """Like pymodbus' ExceptionResponse, it has no `registers`."""
+    def __init__(self, function_code, exception_code=2):
+        self.function_code = function_code
+        self.exception_code = exception_code
+
+    def isError(self):
+        return True
+
+
+class FakeModbusClient(object):
+    def __init__(self, registers=None, readable=None):
+        """
+        :param registers: Initial register values, address -> value
+        :param readable: Optional set of addresses the unit answers for,
+                         reads touching other addresses fail
+        """
+        self.registers = dict(registers or {})
+        self.readable = readable
+        self.requests = []
+        self.connected = False
+
+    def connect(self):
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def _read(self, function, address, count):
+        self.requests.append((function, address, count))
+        addresses = range(address, address + count)
+        if self.readable is not None and \
+                any(a not in self.readable for a in addresses):
+            return ExceptionResponse(0x04 if function == 'input' else 0x03)
+        return ReadRegistersResponse(
+            [self.registers.get(a, 0) for a in addresses])
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._read('input', address, count)
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._read('holding', address, count)
+
+    def write_register(self, address, value, unit=0):
+        self.requests.append(('write', address, 1))
+        self.registers[address] = value
+        return WriteResponse(address, value)
+
+    def write_registers(self, address, values, unit=0):
+        self.requests.append(('write', address, len(values)))
+        for offset, value in enumerate(values):
+            self.registers[address + offset] = value
+        return WriteResponse(address, values)
+
+
+class FakeAsyncModbusClient(FakeModbusClient):
+    def __init__(self, registers=None, readable=None, latency=0):
+        super().__init__(registers, readable)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _call(self, function, *args, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return function(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._call(super().read_input_registers, address, count, unit)
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._call(super().read_holding_registers, address, count,
+                          unit)
+
+    def write_register(self, address, value, unit=0):
+        return self._call(super().write_register, address, value, unit)
+
+    def write_registers(self, address, values, unit=0):
+        return self._call(super().write_registers, address, values, unit)
+
+
+def run(coro):
+    """Run a coroutine to completion on a fresh event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
@@ -0,0 +1,86 @@
+"""
+Minimal asyncio ModBus TCP client, to test the simulator without pymodbus.
+
+Requests may be pipelined, responses are matched by transaction ID.
+"""
+import asyncio
+import struct
+
+from test.fake_modbus_client import (
+    ExceptionResponse, ReadRegistersResponse, WriteResponse)
+
+MBAP = struct.Struct('>HHHB')
+
+
+class TcpModbusClient(asyncio.Protocol):
+    def __init__(self):
+        self.transport = None
+        self._buffer = b''
+        self._transaction = 0
+        self._pending = {}
+
+    @classmethod
+    async def connect(cls, host, port):
+        loop = asyncio.get_event_loop()
+        _, client = await loop.create_connection(cls, host, port)
+        return client
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection lost"))
+
+    def data_received(self, data):
+        self._buffer += data
+        while len(self._buffer) >= MBAP.size:
+            transaction, _, length, _ = MBAP.unpack_from(self._buffer)
+            if len(self._buffer) < 6 + length:
+                return
+            pdu = self._buffer[MBAP.size:6 + length]
+            self._buffer = self._buffer[6 + length:]
+            future = self._pending.pop(transaction, None)
+            if future is not None and not future.done():
+                future.set_result(pdu)
+
+    async def request(self, unit, pdu):
+        """Send a request PDU, returns the response PDU."""
+        self._transaction = (self._transaction + 1) & 0xFFFF
+        future = asyncio.get_event_loop().create_future()
+        self._pending[self._transaction] = future
+        self.transport.write(MBAP.pack(self._transaction, 0, len(pdu) + 1,
+                                       unit) + pdu)
+        return await future
+
+    async def _read(self, function, address, count, unit):
+        pdu = await self.request(unit, struct.pack('>BHH', function, address,
+                                                   count))
+        if pdu[0] & 0x80:
+            return ExceptionResponse(pdu[0] & 0x7F, pdu[1])
+        return ReadRegistersResponse(
+            list(struct.unpack_from('>{}H'.format(pdu[1] // 2), pdu, 2)))
+
+    def read_holding_registers(self, address, count=1, unit=0):
+        return self._read(3, address, count, unit)
+
+    def read_input_registers(self, address, count=1, unit=0):
+        return self._read(4, address, count, unit)
+
+    async def write_register(self, address, value, unit=0):
+        pdu = await self.request(unit, struct.pack('>BHH', 6, address, value))
+        if pdu[0] & 0x80:
+            return ExceptionResponse(pdu[0] & 0x7F, pdu[1])
+        return WriteResponse(address, value)
+
+    async def write_registers(self, address, values, unit=0):
+        pdu = await self.request(unit, struct.pack(
+            '>BHHB{}H'.format(len(values)), 16, address, len(values),
+            2 * len(values), *values))
+        if pdu[0] & 0x80:
+            return ExceptionResponse(pdu[0] & 0x7F, pdu[1])
+        return WriteResponse(address, values)
+
+    def close(self):
+        self.transport.close()
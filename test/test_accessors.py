@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import random
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.accessors import (
+    RegisterAccessor, SignedAccessor, UnsignedAccessor, values_class)
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+
+slave = 1
+
+
+class TestAccessors:
+
+    @pytest.mark.parametrize('is_wpm3i', [False, True])
+    def test_match_get_conv_val(self, is_wpm3i):
+        schema = pyse.WPM3i_SCHEMA if is_wpm3i else pyse.LWZ_SCHEMA
+        rand = random.Random(is_wpm3i)
+        raws = [0, 1, 0x7FFF, 0x8000, 0xFFC4, 0xFFFF]
+        client = FakeModbusClient({
+            register.addr: rand.choice(raws + [rand.randrange(0x10000)])
+            for register in schema})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=is_wpm3i)
+        api.update()
+        for register in schema:
+            assert getattr(api.values, register.name) == \
+                api.get_conv_val(register.name), register.name
+
+    def test_accessor_types(self):
+        cls = values_class(pyse.WPM3i_SCHEMA)
+        assert type(cls.OUTSIDE_TEMPERATURE) is SignedAccessor
+        assert type(cls.HEATING_PRESSURE) is SignedAccessor
+        assert type(cls.OPERATING_MODE) is UnsignedAccessor
+        assert isinstance(cls.OPERATING_MODE, RegisterAccessor)
+        assert cls.OUTSIDE_TEMPERATURE.register is \
+            pyse.WPM3i_SCHEMA['OUTSIDE_TEMPERATURE']
+        assert values_class(pyse.WPM3i_SCHEMA) is cls
+
+    def test_values_follow_updates(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave)
+        assert api.values.OUTSIDE_TEMPERATURE == 0
+        api.update()
+        assert api.values.OUTSIDE_TEMPERATURE == 4.3
+        client.registers[6] = 0xFFFB
+        assert api.values.OUTSIDE_TEMPERATURE == 4.3
+        api.update()
+        assert api.values.OUTSIDE_TEMPERATURE == -0.5
+        assert client.requests == [('input', 0, 33), ('holding', 1000, 27),
+                                   ('input', 2000, 3)] * 2
+
+    def test_other_model_registers(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient(), slave)
+        assert api.values.HEATING_PRESSURE is None
+        with pytest.raises(AttributeError):
+            api.values._private
+
+    def test_read_only(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient(), slave)
+        with pytest.raises(AttributeError):
+            api.values.OUTSIDE_TEMPERATURE = 20
+
+    def test_names_which_are_no_identifiers(self):
+        client = FakeModbusClient({2502: 1})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True)
+        api.update()
+        assert getattr(api.values, 'POWER-OFF') == 1
+
+    def test_instances_do_not_share_values(self):
+        first = pyse.StiebelEltronAPI(FakeModbusClient({6: 43}), slave)
+        second = pyse.StiebelEltronAPI(FakeModbusClient({6: 12}), slave)
+        first.update()
+        second.update()
+        assert first.values.OUTSIDE_TEMPERATURE == 4.3
+        assert second.values.OUTSIDE_TEMPERATURE == 1.2
+
+    def test_async(self):
+        client = FakeAsyncModbusClient({6: 43})
+        api = AsyncStiebelEltronAPI(client, slave)
+        assert run(api.update())
+        assert api.values.OUTSIDE_TEMPERATURE == 4.3
+        assert run(api.get_outside_temp()) == 4.3
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+from test.fake_modbus_client import FakeAsyncModbusClient, run
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+
+slave = 1
+
+
+class TestAsyncStiebelEltronApi:
+
+    def test_update_reads_blocks_concurrently(self):
+        client = FakeAsyncModbusClient({6: 125, 2000: 0x0004}, latency=0.01)
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        assert run(api.update()) is True
+        assert client.max_in_flight == 3
+        assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 12.5
+
+    def test_wpm3i_reads_four_blocks(self):
+        client = FakeAsyncModbusClient({3502 - 1: 12, 3503 - 1: 3})
+        api = AsyncStiebelEltronAPI(client, slave, is_wpm3i=True)
+
+        assert run(api.update()) is True
+        assert client.max_in_flight == 4
+        assert run(api.get_vd_heating_total_kwh()) == 3012
+
+    def test_getters_update_on_read(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave, update_on_read=True)
+
+        client.registers[0] = 215
+        assert run(api.get_current_temp()) == 21.5
+        client.registers[2000] = 0x0008
+        assert run(api.get_cooling_status()) is True
+
+    def test_setters(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave, update_on_read=True)
+
+        run(api.set_target_temp(22.5))
+        assert client.registers[1001] == 225
+        assert run(api.get_target_temp()) == 22.5
+
+        run(api.set_operation('DHW'))
+        assert run(api.get_operation()) == 'DHW'
+
+    def test_update_failure(self):
+        client = FakeAsyncModbusClient(readable=set(range(100)))
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        assert run(api.update()) is False
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+import json
+
+from benchmarks import run as benchmarks
+
+
+class TestBenchmarks:
+
+    def test_results_are_json(self, tmpdir):
+        output = tmpdir.join('results.json')
+        benchmarks.main(['--iterations', '2', '--duration', '0.01',
+                         '--instances', '2', '--output', str(output)])
+        results = json.loads(output.read())
+
+        assert sorted(results['models']) == ['lwz', 'wpm3i']
+        lwz = results['models']['lwz']
+        assert lwz['update']['requests'] == 3
+        assert lwz['getter_sweep']['requests'] == 0
+        assert lwz['getter_sweep_update_on_read']['requests'] > 0
+        assert lwz['memory']['bytes_per_instance'] > 0
+        assert lwz['accessors']['reads'] > 0
+
+    def test_model_getters(self):
+        getters = benchmarks.model_getters(is_wpm3i=False)
+        assert 'get_outside_temp' in getters
+        assert 'get_vd_heating_total_kwh' not in getters
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+import time
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+
+slave = 1
+
+
+class TestBlockCache:
+
+    def test_getter_reads_only_its_block(self):
+        client = FakeModbusClient({6: 100})
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True)
+
+        assert api.get_outside_temp() == 10.0
+        assert client.requests == [('input', 0, 33)]
+
+    def test_fresh_blocks_are_not_read_again(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl={1: 60, 2: 3600})
+        api.get_current_temp()
+        api.get_outside_temp()
+        api.get_current_humidity()
+        api.get_target_temp()
+        api.get_target_temp()
+        assert client.requests == [('input', 0, 33), ('holding', 1000, 27)]
+
+        # Block 3 has no TTL
+        api.get_heating_status()
+        api.get_heating_status()
+        assert client.requests[2:] == [('input', 2000, 3)] * 2
+
+    def test_update_marks_all_blocks_fresh(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+        api.update()
+        del client.requests[:]
+
+        api.get_current_temp()
+        api.get_operation()
+        api.get_cooling_status()
+        assert client.requests == []
+
+    def test_max_staleness(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+        api.get_current_temp()
+        time.sleep(0.01)
+        client.registers[0] = 215
+        assert api.get_current_temp() == 0
+        assert api.get_current_temp(max_staleness=0.005) == 21.5
+        assert len(client.requests) == 2
+
+    def test_invalidate(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+        api.update()
+        client.registers[0] = 215
+        client.registers[6] = 50
+
+        api.invalidate(['OUTSIDE_TEMPERATURE'])
+        assert api.get_current_temp() == 21.5
+        api.invalidate()
+        assert api.get_outside_temp() == 5.0
+
+    def test_write_invalidates_block(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+        assert api.get_target_temp() == 0
+        api.set_target_temp(22.5)
+        assert api.get_target_temp() == 22.5
+
+    def test_no_reads_without_update_on_read(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        api.get_current_temp()
+        api.get_all_converted()
+        assert client.requests == []
+
+    def test_unknown_registers_do_not_read(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True)
+        assert api.get_actual_hk1_temp() is None
+        assert client.requests == []
+
+
+class TestAsyncBlockCache:
+
+    def test_getters_read_stale_blocks(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+
+        async def read():
+            await api.get_current_temp()
+            await api.get_outside_temp()
+            await api.set_target_temp(21.0)
+            return await api.get_target_temp()
+
+        assert run(read()) == 21.0
+        assert client.requests == [
+            ('input', 0, 33), ('write', 1001, 1), ('holding', 1000, 27)]
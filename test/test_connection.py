@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+import asyncio
+import time
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.connection import (
+    AsyncManagedConnection, CircuitBreaker, ConnectionUnavailableError,
+    ManagedConnection, backoff_delay)
+
+slave = 1
+
+
+class DeadClient(FakeModbusClient):
+    def connect(self):
+        return False
+
+
+class TimeoutClient(FakeModbusClient):
+    def read_input_registers(self, address, count=1, unit=0):
+        raise IOError("timeout")
+
+
+class Factory:
+    def __init__(self, client_class=FakeModbusClient):
+        self.client_class = client_class
+        self.clients = []
+
+    def __call__(self):
+        client = self.client_class({6: 100})
+        self.clients.append(client)
+        return client
+
+
+class TestBackoff:
+
+    def test_exponential_with_jitter(self):
+        for attempt, delay in enumerate([0.5, 1, 2, 4, 8]):
+            values = [backoff_delay(attempt) for _ in range(50)]
+            assert all(delay / 2 <= value <= delay for value in values)
+            assert len(set(values)) > 1
+        assert backoff_delay(20, maximum=60) <= 60
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        time.sleep(0.03)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestManagedConnection:
+
+    def test_lazy_connect(self):
+        factory = Factory()
+        conn = ManagedConnection(factory)
+        api = pyse.StiebelEltronAPI(conn, slave)
+        assert factory.clients == []
+
+        assert api.update()
+        assert api.get_outside_temp() == 10.0
+        assert len(factory.clients) == 1
+        assert conn.connects == 1
+
+    def test_idle_close(self):
+        factory = Factory()
+        conn = ManagedConnection(factory, idle_timeout=0.01)
+        api = pyse.StiebelEltronAPI(conn, slave)
+        api.update()
+        api.update()
+        assert conn.connects == 1
+
+        time.sleep(0.02)
+        conn.close_if_idle()
+        assert conn.client is None
+        assert not factory.clients[0].connected
+        api.update()
+        assert conn.connects == 2
+
+    def test_reconnect_backoff(self):
+        factory = Factory(DeadClient)
+        conn = ManagedConnection(factory, backoff_base=60)
+        api = pyse.StiebelEltronAPI(conn, slave)
+
+        assert api.update() is False
+        assert api.update() is False
+        assert isinstance(api.last_error, ConnectionUnavailableError)
+        assert len(factory.clients) == 1
+        # Requests rejected while waiting do not count as failures
+        assert conn.breaker.failures == 1
+
+    def test_circuit_opens_on_request_failures(self):
+        factory = Factory(TimeoutClient)
+        conn = ManagedConnection(
+            factory, breaker=CircuitBreaker(failure_threshold=2))
+        api = pyse.StiebelEltronAPI(conn, slave)
+
+        for _ in range(2):
+            assert api.update() is False
+            assert isinstance(api.last_error, IOError)
+        assert conn.breaker.state == CircuitBreaker.OPEN
+        assert api.update() is False
+        assert isinstance(api.last_error, ConnectionUnavailableError)
+        # Every failure closes the connection
+        assert len(factory.clients) == 2
+
+
+    def test_trial_after_backoff(self):
+        factory = Factory(DeadClient)
+        conn = ManagedConnection(
+            factory, backoff_base=0.4, backoff_max=0.4,
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+        with pytest.raises(ConnectionUnavailableError):
+            conn.read_input_registers(6, unit=slave)
+        # Half open, still waiting to reconnect
+        time.sleep(0.1)
+        with pytest.raises(ConnectionUnavailableError, match='reconnect'):
+            conn.read_input_registers(6, unit=slave)
+        factory.client_class = FakeModbusClient
+        time.sleep(0.4)
+        assert conn.read_input_registers(6, unit=slave).registers == [100]
+        assert conn.breaker.state == CircuitBreaker.CLOSED
+
+
+class TestAsyncManagedConnection:
+
+    def test_single_connect_for_concurrent_requests(self):
+        clients = []
+
+        async def factory():
+            client = FakeAsyncModbusClient({6: 100}, latency=0.01)
+            clients.append(client)
+            return client
+
+        from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+        api = AsyncStiebelEltronAPI(AsyncManagedConnection(factory), slave)
+        assert run(api.update())
+        assert len(clients) == 1
+        assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 10.0
+
+    def test_trial_after_backoff(self):
+        clients = []
+
+        async def factory():
+            if not clients:
+                clients.append(None)
+                raise ConnectionRefusedError()
+            client = FakeAsyncModbusClient({6: 100})
+            clients.append(client)
+            return client
+
+        async def requests():
+            conn = AsyncManagedConnection(
+                factory, backoff_base=0.4, backoff_max=0.4,
+                breaker=CircuitBreaker(failure_threshold=1,
+                                       reset_timeout=0.05))
+            with pytest.raises(ConnectionRefusedError):
+                await conn.read_input_registers(6, unit=slave)
+            await asyncio.sleep(0.1)
+            with pytest.raises(ConnectionUnavailableError, match='reconnect'):
+                await conn.read_input_registers(6, unit=slave)
+            await asyncio.sleep(0.4)
+            response = await conn.read_input_registers(6, unit=slave)
+            assert response.registers == [100]
+            assert conn.breaker.state == CircuitBreaker.CLOSED
+
+        run(requests())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron import decode
+from pystiebeleltron.decode import BulkDecoder
+from pystiebeleltron.registers import RegisterSchema, RegisterStore
+
+slave = 1
+
+
+def all_raw_values_store():
+    """Store holding every possible raw value for types 2, 6, 7 and 8."""
+    count = 0x10000
+    regmap = {}
+    for index, data_type in enumerate((2, 6, 7, 8)):
+        for offset in range(count):
+            addr = index * count + offset
+            regmap['R{}'.format(addr)] = {'addr': addr, 'type': data_type}
+    schema = RegisterSchema([(regmap, 0, 'read_input_registers')])
+    store = RegisterStore(schema)
+    store.store(schema.blocks[0], list(range(count)) * 4)
+    return schema, store
+
+
+class TestBulkDecoder:
+
+    @pytest.fixture
+    def api(self):
+        client = FakeModbusClient({
+            500: 0xFDA8,  # -60.0, sensor lead missing
+            501: 0xFE0C,  # -50.0, short circuit
+            502: 0x8000,  # object unavailable
+            506: 0x0087,  # 13.5
+            519: 0xFF38,  # -2.0 bar
+            3500: 0xFDA8})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True)
+        api.update()
+        return api
+
+    @pytest.mark.parametrize('use_numpy', [
+        False, pytest.param(True, marks=pytest.mark.skipif(
+            decode.numpy is None, reason="NumPy is not installed"))])
+    def test_matches_get_conv_val(self, api, use_numpy):
+        decoder = BulkDecoder(pyse.WPM3i_SCHEMA, use_numpy=use_numpy)
+        names, values, unavailable = decoder.decode(api._values.buffers)
+
+        assert len(names) == len(pyse.WPM3i_SCHEMA)
+        for name, value in zip(names, values):
+            assert value == api.get_conv_val(name)
+        flagged = {n for n, u in zip(names, unavailable) if u}
+        assert flagged == {'ACTUAL_TEMPERATURE_FE7', 'SET_TEMPERATURE_FE7',
+                           'ACTUAL_TEMPERATURE_FEK'}
+
+    def test_get_all_converted(self, api):
+        result = api.get_all_converted()
+        values = dict(zip(result.names, result.values))
+
+        assert values['OUTSIDE_TEMPERATURE'] == 13.5
+        assert values['HEATING_PRESSURE'] == -2.0
+        # Unsigned counters do not report sensor errors
+        assert values['ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH'] \
+            == 0xFDA8
+
+    def test_numpy_matches_python_for_all_raw_values(self):
+        if decode.numpy is None:
+            pytest.skip("NumPy is not installed")
+        schema, store = all_raw_values_store()
+
+        expected = BulkDecoder(schema, use_numpy=False).decode(store.buffers)
+        actual = BulkDecoder(schema, use_numpy=True).decode(store.buffers)
+        assert actual.values.tolist() == expected.values
+        assert actual.unavailable.tolist() == expected.unavailable
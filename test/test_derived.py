@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+from array import array
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.derived import (
+    CONSUMPTION, HEAT, DerivedMetrics, delta, formula, rate, ratio, total)
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT
+
+slave = 1
+
+
+def address(name):
+    return pyse.WPM3i_SCHEMA[name].addr
+
+
+def wpm3i_unit(**kwargs):
+    client = FakeModbusClient({
+        address(HEAT + 'VD_HEATING_TOTAL__MWH'): 12,
+        address(HEAT + 'VD_HEATING_TOTAL__KWH'): 345,
+        address(CONSUMPTION + 'VD_HEATING_TOTAL__MWH'): 4,
+        address(CONSUMPTION + 'VD_HEATING_TOTAL__KWH'): 115,
+        address(HEAT + 'VD_HEATING_DAY__KWH'): 30,
+        address(CONSUMPTION + 'VD_HEATING_DAY__KWH'): 10,
+    })
+    return client, pyse.StiebelEltronAPI(client, slave, is_wpm3i=True,
+                                         **kwargs)
+
+
+# Registers 0 and 1 of a single block
+COUNTER_SCHEMA = pyse.RegisterSchema([(
+    {'MWH': {'addr': 0, 'type': 6}, 'KWH': {'addr': 1, 'type': 6},
+     'TEMP': {'addr': 2, 'type': 2}}, 0, 'read_input_registers')])
+
+
+def buffers(mwh, kwh, temp=0):
+    return (array('H', [mwh, kwh, temp]),)
+
+
+class TestDerivedMetrics:
+
+    def test_default_metrics(self):
+        client, api = wpm3i_unit()
+        api.update()
+        values = api.get_derived_values()
+        assert values['HEAT_VD_HEATING_KWH'] == 12345
+        assert values['HEAT_VD_HEATING_KWH'] == api.get_vd_heating_total_kwh()
+        assert values['CONSUMPTION_VD_HEATING_KWH'] == 4115
+        assert values['COP_HEATING'] == 12345 / 4115
+        assert values['COP_HEATING_DAY'] == 3
+        # Counters without consumption
+        assert values['COP_DHW'] is None
+        assert values['HEAT_VD_HEATING_DELTA_KWH'] is None
+
+    def test_cached_per_generation(self):
+        client, api = wpm3i_unit()
+        api.update()
+        values = api.get_derived_values()
+        computed = api._derived.computed
+        assert api.get_derived_values() is values
+        assert api._derived.computed == computed
+        with pytest.raises(TypeError):
+            values['COP_HEATING'] = 0
+
+    def test_only_changed_inputs_are_computed(self):
+        client, api = wpm3i_unit()
+        api.update()
+        first = api.get_derived_values()
+        api.update()
+        computed = api._derived.computed
+        assert api.get_derived_values() == first
+        assert api._derived.computed == computed
+        client.registers[address(HEAT + 'VD_HEATING_TOTAL__KWH')] = 346
+        api.update()
+        values = api.get_derived_values()
+        # Total, seasonal COP, delta and rate of the heat for heating
+        assert api._derived.computed == computed + 4
+        assert values['HEAT_VD_HEATING_DELTA_KWH'] == 1
+        assert first['HEAT_VD_HEATING_KWH'] == 12345
+        api.update()
+        values = api.get_derived_values()
+        # The delta falls back to 0
+        assert api._derived.computed == computed + 5
+        assert values['HEAT_VD_HEATING_DELTA_KWH'] == 0
+
+    def test_delta_counter_reset(self):
+        derived = DerivedMetrics(COUNTER_SCHEMA, [
+            total('TOTAL', 'MWH', 'KWH'), delta('DELTA', 'TOTAL'),
+            delta('DAY_DELTA', 'KWH')])
+        derived.update(buffers(1, 998))
+        assert derived.update(buffers(2, 1))['DELTA'] == 3
+        values = derived.update(buffers(0, 5))
+        assert values['DELTA'] == 5
+        assert values['DAY_DELTA'] == 4
+
+    def test_split_total_carry(self):
+        derived = DerivedMetrics(COUNTER_SCHEMA, [
+            total('TOTAL', 'MWH', 'KWH'), delta('DELTA', 'TOTAL', True),
+            rate('POWER', 'TOTAL', True)])
+        readings = [(25, 998), (25, 999), (25, 0), (26, 0), (26, 1)]
+        values = [derived.update(buffers(mwh, kwh), [600 * i])
+                  for i, (mwh, kwh) in enumerate(readings)]
+        # The kWh register wraps before the MWh register is carried
+        assert [value['DELTA'] for value in values] == [None, 1, 1, 0, 1]
+        assert [value['POWER'] for value in values] == \
+            [None, None, 6, 6, 3]
+
+    def test_rate(self):
+        derived = DerivedMetrics(COUNTER_SCHEMA, [
+            total('TOTAL', 'MWH', 'KWH'), rate('POWER', 'TOTAL')])
+        assert derived.update(buffers(0, 10), [1000])['POWER'] is None
+        assert derived.update(buffers(0, 11), [1600])['POWER'] is None
+        assert derived.update(buffers(0, 11), [1900])['POWER'] is None
+        assert derived.update(buffers(0, 12), [2400])['POWER'] == 4.5
+        assert derived.update(buffers(0, 12), [2500])['POWER'] == 4.5
+        assert derived.update(buffers(0, 14), [3600])['POWER'] == 6
+
+    def test_rate_after_changes_stop(self):
+        derived = DerivedMetrics(COUNTER_SCHEMA, [
+            total('TOTAL', 'MWH', 'KWH'), rate('POWER', 'TOTAL')])
+        derived.update(buffers(0, 10), [1000])
+        derived.update(buffers(0, 11), [1600])
+        assert derived.update(buffers(0, 12), [2400])['POWER'] == 4.5
+        assert derived.update(buffers(0, 12), [3200])['POWER'] == 4.5
+        # Less than a kWh in 900 and 3600 seconds
+        assert derived.update(buffers(0, 12), [3300])['POWER'] == 4
+        assert derived.update(buffers(0, 12), [6000])['POWER'] == 1
+        assert derived.update(buffers(0, 13), [7200])['POWER'] == 0.75
+
+    def test_unavailable_inputs(self):
+        derived = DerivedMetrics(COUNTER_SCHEMA, [
+            formula('TEMP_F', ['TEMP'], lambda temp: temp * 1.8 + 32),
+            ratio('RATIO', 'MWH', 'KWH')])
+        values = derived.update(buffers(1, 0, UNAVAILABLE_OBJECT))
+        assert values == {'TEMP_F': None, 'RATIO': None}
+        assert derived.update(buffers(1, 2, 100))['TEMP_F'] == 50
+
+    def test_declaration_errors(self):
+        with pytest.raises(ValueError):
+            DerivedMetrics(COUNTER_SCHEMA, [ratio('R', 'MWH', 'UNKNOWN')])
+        with pytest.raises(ValueError):
+            DerivedMetrics(COUNTER_SCHEMA, [delta('D', 'TOTAL'),
+                                            total('TOTAL', 'MWH', 'KWH')])
+        with pytest.raises(ValueError):
+            DerivedMetrics(COUNTER_SCHEMA, [total('KWH', 'MWH', 'KWH')])
+
+    def test_snapshot(self):
+        client, api = wpm3i_unit()
+        derived = DerivedMetrics(pyse.WPM3i_SCHEMA)
+        snapshot = api.poll()
+        assert derived.evaluate(snapshot)['HEAT_VD_HEATING_KWH'] == 12345
+        assert derived.evaluate(snapshot) is derived.evaluate(snapshot)
+
+    def test_custom_metrics(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave, metrics=[
+            formula('OUTSIDE_TEMPERATURE_F', ['OUTSIDE_TEMPERATURE'],
+                    lambda temp: round(temp * 1.8 + 32, 1))])
+        api.update()
+        assert api.get_derived_values() == {'OUTSIDE_TEMPERATURE_F': 39.7}
+        assert pyse.StiebelEltronAPI(client, slave).get_derived_values() == {}
+
+    def test_async(self):
+        client = FakeAsyncModbusClient({
+            address(HEAT + 'VD_HEATING_TOTAL__MWH'): 1})
+        api = AsyncStiebelEltronAPI(client, slave, is_wpm3i=True,
+                                    update_on_read=True)
+        values = run(api.get_derived_values())
+        assert values['HEAT_VD_HEATING_KWH'] == 1000
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+import json
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.detect import (
+    DetectionError, ModelCache, cache_key, default_cache_path, detect_model)
+from pystiebeleltron.fleet import FleetPoller
+
+slave = 1
+
+
+def unit(model, registers=None, cls=FakeModbusClient):
+    """Return a fake client answering for the registers of a model."""
+    schema = pyse.WPM3i_SCHEMA if model == 'wpm3i' else pyse.LWZ_SCHEMA
+    return cls(registers, readable={register.addr for register in schema})
+
+
+class TestDetectModel:
+
+    @pytest.mark.parametrize('model', ['lwz', 'wpm3i'])
+    def test_probe(self, model):
+        client = unit(model)
+        assert detect_model(client, slave) == model
+        assert len(client.requests) <= 2
+
+    def test_wpm3i_with_a_single_request(self):
+        client = unit('wpm3i')
+        detect_model(client, slave)
+        assert client.requests == [('input', 2501, 5)]
+
+    def test_unavailable_values_are_no_answer(self):
+        client = FakeModbusClient({2501 + i: 0x8000 for i in range(5)},
+                                  readable=set(range(2000, 2003)) |
+                                  set(range(2501, 2506)))
+        assert detect_model(client, slave) == 'lwz'
+
+    def test_no_answer(self):
+        with pytest.raises(DetectionError):
+            detect_model(FakeModbusClient(readable=set()), slave)
+
+    def test_cached(self, tmp_path):
+        cache = ModelCache(str(tmp_path / 'models.json'))
+        client = unit('wpm3i')
+        assert detect_model(client, slave, cache, 'isg/1') == 'wpm3i'
+        client.requests.clear()
+        restarted = ModelCache(cache.path)
+        assert detect_model(client, slave, restarted, 'isg/1') == 'wpm3i'
+        assert client.requests == []
+
+    def test_no_key_no_cache(self, tmp_path):
+        cache = ModelCache(str(tmp_path / 'models.json'))
+        detect_model(unit('lwz'), slave, cache)
+        assert not (tmp_path / 'models.json').exists()
+
+    def test_cache_key_of_client(self):
+        client = FakeModbusClient()
+        assert cache_key(client, slave) is None
+        client.host = '192.168.1.20'
+        client.port = 502
+        assert cache_key(client, 3) == '192.168.1.20:502/3'
+
+    def test_api(self):
+        client = unit('wpm3i', {506: 43})
+        api = pyse.StiebelEltronAPI.detect(client, slave, ttl=10)
+        api.update()
+        assert api.get_outside_temp() == 4.3
+
+    def test_async_api(self, tmp_path):
+        cache = ModelCache(str(tmp_path / 'models.json'))
+        client = unit('lwz', {6: 43}, FakeAsyncModbusClient)
+        api = run(AsyncStiebelEltronAPI.detect(client, slave, cache, 'isg/1'))
+        assert isinstance(api, AsyncStiebelEltronAPI)
+        assert run(api.update())
+        assert api.values.OUTSIDE_TEMPERATURE == 4.3
+        assert cache.get('isg/1') == 'lwz'
+
+
+class TestModelCache:
+
+    def test_file(self, tmp_path):
+        path = tmp_path / 'sub' / 'models.json'
+        cache = ModelCache(str(path))
+        assert cache.get('a') is None
+        cache.set('a', 'lwz')
+        cache.set('b', 'wpm3i')
+        assert json.loads(path.read_text()) == {'a': 'lwz', 'b': 'wpm3i'}
+        cache.forget('a')
+        assert ModelCache(str(path)).get('a') is None
+
+    def test_merges_other_writers(self, tmp_path):
+        path = str(tmp_path / 'models.json')
+        first = ModelCache(path)
+        second = ModelCache(path)
+        first.get('a')
+        second.set('b', 'lwz')
+        first.set('a', 'wpm3i')
+        assert ModelCache(path).get('b') == 'lwz'
+
+    def test_damaged_file(self, tmp_path):
+        path = tmp_path / 'models.json'
+        path.write_text('{not json')
+        cache = ModelCache(str(path))
+        assert cache.get('a') is None
+        cache.set('a', 'lwz')
+        assert ModelCache(str(path)).get('a') == 'lwz'
+
+    def test_default_path(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+        assert default_cache_path() == str(
+            tmp_path / 'pystiebeleltron' / 'models.json')
+
+
+class TestFleetDetection:
+
+    def test_detect_once(self, tmp_path):
+        clients = {'10.0.0.1': unit('wpm3i', {506: 43},
+                                    FakeAsyncModbusClient),
+                   '10.0.0.2': unit('lwz', {6: 12}, FakeAsyncModbusClient)}
+
+        async def connect(host, port):
+            return clients[host]
+
+        cache = ModelCache(str(tmp_path / 'models.json'))
+        poller = FleetPoller([('10.0.0.1', 502, 1, None),
+                              ('10.0.0.2', 502, 1, None)],
+                             connect=connect, model_cache=cache)
+
+        async def poll():
+            return [result async for result in poller.poll()]
+
+        results = {result.target.host: result for result in run(poll())}
+        assert all(result.success for result in results.values())
+        assert results['10.0.0.1'].api.values.OUTSIDE_TEMPERATURE == 4.3
+        assert results['10.0.0.2'].api.values.OUTSIDE_TEMPERATURE == 1.2
+        assert cache.get('10.0.0.2:502/1') == 'lwz'
+        requests = len(clients['10.0.0.2'].requests)
+        run(poll())
+        # No further probes
+        assert len(clients['10.0.0.2'].requests) == requests + 3
+
+    def test_detection_failure(self):
+        async def connect(host, port):
+            return FakeAsyncModbusClient(readable=set())
+
+        poller = FleetPoller([('10.0.0.1', 502, 1, None)], connect=connect)
+
+        async def poll():
+            return [result async for result in poller.poll()]
+
+        result, = run(poll())
+        assert not result.success
+        assert result.api is None
+        assert isinstance(result.error, DetectionError)
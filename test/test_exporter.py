@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+import threading
+import urllib.error
+import urllib.request
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.connection import ManagedConnection
+from pystiebeleltron.exporter import CONTENT_TYPE, Exporter, MetricsServer
+from pystiebeleltron.instrument import READ_REQUEST_SIZE, READ_RESPONSE_SIZE
+
+slave = 1
+
+
+def lines(exporter):
+    return exporter.render().decode().splitlines()
+
+
+class TestInstrument:
+
+    def test_requests_per_block(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave, instrument=True)
+        assert api.update()
+        stats = api.stats
+        assert stats.requests == 3
+        assert stats.failures == 0
+        assert [block.requests for block in stats.blocks] == [1, 1, 1]
+        assert stats.blocks[0].latency.count == 1
+        assert stats.bytes_sent == 3 * READ_REQUEST_SIZE
+        assert stats.bytes_received == 3 * READ_RESPONSE_SIZE + \
+            2 * sum(block.count for block in api._schema.blocks)
+        assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 4.3
+
+    def test_failures(self):
+        client = FakeModbusClient(readable=set(range(1000, 1100)))
+        api = pyse.StiebelEltronAPI(client, slave, instrument=True)
+        assert not api.update()
+        assert api.stats.blocks[0].failures == 1
+        assert api.stats.blocks[1].failures == 0
+
+    def test_writes(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, instrument=True)
+        api.set_target_temp(22)
+        assert api.stats.blocks[1].requests == 1
+
+    def test_without_instrument(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient(), slave)
+        assert api.stats is None
+        assert api._conn.__class__ is FakeModbusClient
+
+    def test_async(self):
+        client = FakeAsyncModbusClient({6: 43})
+        api = AsyncStiebelEltronAPI(client, slave, instrument=True)
+        assert run(api.update())
+        assert api.stats.requests == 3
+
+
+class TestExporter:
+
+    def test_registers(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient({6: 43, 7: 0x8000}),
+                                    slave, instrument=True)
+        exporter = Exporter(api, labels={'unit': 1})
+        assert not any(l.startswith('stiebel_eltron_register{')
+                       for l in lines(exporter))
+        assert exporter.poll()
+        text = lines(exporter)
+        assert 'stiebel_eltron_register{name="OUTSIDE_TEMPERATURE",unit="1"}' \
+            ' 4.3' in text
+        # Unavailable values are not exported
+        assert not any('name="ACTUAL_VALUE_HC1"' in l for l in text)
+        assert 'stiebel_eltron_polls_total{unit="1"} 1' in text
+        assert 'stiebel_eltron_requests_total{block="1",unit="1"} 1' in text
+        assert any(l.startswith('stiebel_eltron_snapshot_age_seconds{')
+                   for l in text)
+
+    def test_rerenders_changed_blocks(self, monkeypatch):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave)
+        exporter = Exporter(api)
+        exporter.poll()
+        rendered = []
+        original = exporter._render_block
+        monkeypatch.setattr(exporter, '_render_block',
+                            lambda block, buffer: rendered.append(
+                                block.index) or original(block, buffer))
+        exporter.poll()
+        assert rendered == []
+        client.registers[6] = 44
+        exporter.poll()
+        assert rendered == [0]
+        assert 'stiebel_eltron_register{name="OUTSIDE_TEMPERATURE"} 4.4' \
+            in lines(exporter)
+
+    def test_unchanged_values(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient({6: 43}), slave)
+        exporter = Exporter(api)
+        exporter.poll()
+        body = exporter._body
+        exporter.refresh()
+        assert exporter._body == body
+
+    def test_energy_counters(self):
+        client = FakeModbusClient({3501: 250, 3502: 12})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True)
+        exporter = Exporter(api)
+        exporter.poll()
+        text = lines(exporter)
+        assert '# TYPE stiebel_eltron_energy_kwh_total counter' in text
+        assert 'stiebel_eltron_energy_kwh_total{counter="ALL_HEAT_PUMPS__' \
+            'AMOUNT_OF_HEAT__VD_HEATING_TOTAL"} 12250' in text
+
+    def test_failed_polls(self):
+        conn = ManagedConnection(lambda: FakeModbusClient(readable=set()))
+        api = pyse.StiebelEltronAPI(conn, slave, instrument=True)
+        exporter = Exporter(api)
+        assert not exporter.poll()
+        text = lines(exporter)
+        assert 'stiebel_eltron_poll_failures_total 1' in text
+        assert 'stiebel_eltron_request_failures_total{block="1"} 1' in text
+        assert 'stiebel_eltron_connections_total 1' in text
+        assert 'stiebel_eltron_reconnects_total 0' in text
+        assert 'stiebel_eltron_poll_duration_seconds_count 1' in text
+
+    def test_server(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient({6: 43}), slave)
+        exporter = Exporter(api)
+        exporter.poll()
+        server = MetricsServer(exporter, '127.0.0.1', 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+            with urllib.request.urlopen(url + 'metrics') as response:
+                assert response.headers['Content-Type'] == CONTENT_TYPE
+                assert b'name="OUTSIDE_TEMPERATURE"} 4.3\n' in response.read()
+            try:
+                urllib.request.urlopen(url + 'other')
+                assert False
+            except urllib.error.HTTPError as err:
+                assert err.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+import asyncio
+
+from test.fake_modbus_client import FakeAsyncModbusClient, run
+from pystiebeleltron.connection import ConnectionUnavailableError
+from pystiebeleltron.fleet import FleetPoller
+
+
+class FakeNetwork:
+    """Hands out a fake client per gateway and tracks concurrent requests."""
+
+    def __init__(self, unreachable=()):
+        self.clients = {}
+        self.unreachable = unreachable
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def connect(self, host, port):
+        if host in self.unreachable:
+            raise ConnectionRefusedError(host)
+        client = FakeAsyncModbusClient({6: 100}, latency=0.01)
+        network = self
+        call = client._call
+
+        async def tracked_call(*args, **kwargs):
+            network.in_flight += 1
+            network.max_in_flight = max(network.max_in_flight,
+                                        network.in_flight)
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                network.in_flight -= 1
+        client._call = tracked_call
+        self.clients[host] = client
+        return client
+
+
+async def collect(poller):
+    return [result async for result in poller.poll()]
+
+
+class TestFleetPoller:
+
+    def test_poll_all_targets(self):
+        network = FakeNetwork()
+        targets = [('10.0.0.{}'.format(i), 502, 1, i % 2 == 0)
+                   for i in range(20)]
+        poller = FleetPoller(targets, connect=network.connect)
+
+        results = run(collect(poller))
+        assert len(results) == 20
+        assert all(result.success for result in results)
+        assert {result.target for result in results} == set(poller.targets)
+        lwz = [r for r in results if not r.target.is_wpm3i][0]
+        assert lwz.api.get_conv_val('OUTSIDE_TEMPERATURE') == 10.0
+
+    def test_bounded_concurrency(self):
+        network = FakeNetwork()
+        targets = [('10.0.0.{}'.format(i), 502, 1, False) for i in range(20)]
+        poller = FleetPoller(targets, max_concurrency=2,
+                             connect=network.connect)
+
+        run(collect(poller))
+        # Three concurrent block requests per LWZ unit
+        assert network.max_in_flight == 2 * 3
+
+    def test_one_unit_per_gateway(self):
+        network = FakeNetwork()
+        targets = [('10.0.0.1', 502, slave, False) for slave in range(5)]
+        poller = FleetPoller(targets, connect=network.connect)
+
+        results = run(collect(poller))
+        assert all(result.success for result in results)
+        assert list(network.clients) == ['10.0.0.1']
+        assert network.clients['10.0.0.1'].max_in_flight == 3
+
+    def test_failures_are_reported(self):
+        network = FakeNetwork(unreachable=('10.0.0.2',))
+        targets = [('10.0.0.1', 502, 1, False), ('10.0.0.2', 502, 1, False)]
+        poller = FleetPoller(targets, connect=network.connect)
+
+        results = {r.target.host: r for r in run(collect(poller))}
+        assert results['10.0.0.1'].success
+        assert not results['10.0.0.2'].success
+        assert isinstance(results['10.0.0.2'].error, ConnectionRefusedError)
+
+    def test_timeout(self):
+        async def connect(host, port):
+            await asyncio.sleep(1)
+
+        poller = FleetPoller([('10.0.0.1', 502, 1, False)], timeout=0.01,
+                             connect=connect)
+        result, = run(collect(poller))
+        assert not result.success
+        assert isinstance(result.error, asyncio.TimeoutError)
+
+    def test_dead_gateway_fails_fast(self):
+        network = FakeNetwork(unreachable=('10.0.0.2',))
+        targets = [('10.0.0.2', 502, 1, False)]
+        poller = FleetPoller(targets, connect=network.connect,
+                             connection_options={'backoff_base': 60})
+
+        first, = run(collect(poller))
+        second, = run(collect(poller))
+        assert isinstance(first.error, ConnectionRefusedError)
+        assert isinstance(second.error, ConnectionUnavailableError)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+import asyncio
+import threading
+import time
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+
+slave = 1
+
+
+class GatedModbusClient(FakeModbusClient):
+    """Blocks reads until released, counting concurrent reads."""
+
+    def __init__(self, registers=None):
+        super().__init__(registers)
+        self.release = threading.Event()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.error = None
+
+    def _read(self, function, address, count):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self.release.wait(5)
+            if self.error is not None:
+                raise self.error
+            return super()._read(function, address, count)
+        finally:
+            self.in_flight -= 1
+
+
+def call_concurrently(functions, client):
+    """Call functions in threads, releasing the client once all started."""
+    results = [None] * len(functions)
+
+    def call(index, function):
+        try:
+            results[index] = function()
+        except Exception as err:
+            results[index] = err
+
+    threads = [threading.Thread(target=call, args=(index, function))
+               for index, function in enumerate(functions)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    client.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def update_in_thread(api):
+    """Update in a thread, returning no result if it does not finish."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(api.update()),
+                              daemon=True)
+    thread.start()
+    thread.join(5)
+    return result
+
+
+class TestSingleFlight:
+
+    def test_concurrent_getters_share_a_read(self):
+        client = GatedModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True)
+        results = call_concurrently([api.get_outside_temp] * 8, client)
+        assert results == [4.3] * 8
+        assert client.requests == [('input', 0, 33)]
+        assert api._flights.flights == 1
+        assert api._flights.joined == 7
+
+    def test_concurrent_updates_share_a_read(self):
+        client = GatedModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        results = call_concurrently([api.update] * 4, client)
+        assert results == [True] * 4
+        assert len(client.requests) == 3
+
+    def test_reads_of_other_blocks_wait(self):
+        client = GatedModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True)
+        call_concurrently(
+            [api.get_outside_temp, api.get_heating_status], client)
+        assert sorted(client.requests) == [('input', 0, 33),
+                                           ('input', 2000, 3)]
+        assert client.max_in_flight == 1
+        assert api._flights.joined == 0
+
+    def test_errors_are_shared(self):
+        client = GatedModbusClient()
+        client.error = RuntimeError("Broken client")
+        api = pyse.StiebelEltronAPI(client, slave)
+        results = call_concurrently([api.update] * 3, client)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(client.requests) == 0
+        assert api._flights.flights == 1
+        # The next read is a new flight
+        client.error = None
+        assert api.update()
+
+    def test_sequential_reads_are_not_shared(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True)
+        api.get_outside_temp()
+        api.get_outside_temp()
+        assert len(client.requests) == 2
+
+
+class TestAsyncSingleFlight:
+
+    def test_concurrent_getters_share_a_read(self):
+        client = FakeAsyncModbusClient({6: 43}, latency=0.05)
+        api = AsyncStiebelEltronAPI(client, slave, update_on_read=True)
+
+        async def read():
+            return await asyncio.gather(
+                *[api.get_outside_temp() for _ in range(10)])
+
+        assert run(read()) == [4.3] * 10
+        assert client.requests == [('input', 0, 33)]
+        assert api._flights.joined == 9
+
+    def test_concurrent_updates_share_a_read(self):
+        client = FakeAsyncModbusClient(latency=0.05)
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        async def update():
+            return await asyncio.gather(*[api.update() for _ in range(5)])
+
+        assert run(update()) == [True] * 5
+        assert len(client.requests) == 3
+
+    def test_reads_of_other_blocks_wait(self):
+        client = FakeAsyncModbusClient(latency=0.02)
+        api = AsyncStiebelEltronAPI(client, slave, update_on_read=True)
+
+        async def read():
+            await asyncio.gather(api.get_outside_temp(),
+                                 api.get_heating_status())
+
+        run(read())
+        assert len(client.requests) == 2
+        assert client.max_in_flight == 1
+
+    def test_errors_are_shared(self):
+        client = FakeAsyncModbusClient(latency=0.02)
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        async def failing(*args, **kwargs):
+            await asyncio.sleep(0.02)
+            raise RuntimeError("Broken client")
+
+        client.read_input_registers = failing
+
+        async def update():
+            return await asyncio.gather(
+                *[api.update() for _ in range(3)], return_exceptions=True)
+
+        results = run(update())
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert api._flights.flights == 1
+
+    def test_cancelled_read_does_not_cancel_waiters(self):
+        client = FakeAsyncModbusClient(latency=0.05)
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        async def update():
+            leader = asyncio.ensure_future(api.update())
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(api.update())
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await waiter
+
+        assert run(update()) is True
+        assert api._flights.flights == 2
+
+
+class TestCallbacks:
+
+    def test_subscription_reads_a_getter(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True)
+        values = []
+        api.subscribe(lambda changes: values.append(api.get_outside_temp()))
+        assert update_in_thread(api) == [True]
+        assert values == [4.3]
+
+    def test_subscription_updates(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave)
+        deliveries = []
+
+        def on_change(changes):
+            deliveries.append(changes)
+            if len(deliveries) == 1:
+                client.registers[6] = 44
+                assert api.update()
+
+        api.subscribe(on_change)
+        assert update_in_thread(api) == [True]
+        assert deliveries[1] == {'OUTSIDE_TEMPERATURE': 4.4}
+
+    def test_async_subscription_reads_a_getter(self):
+        client = FakeAsyncModbusClient({6: 43})
+        api = AsyncStiebelEltronAPI(client, slave, update_on_read=True)
+        tasks = []
+        api.subscribe(lambda changes: tasks.append(
+            asyncio.ensure_future(api.get_outside_temp())))
+
+        async def update():
+            await api.update()
+            api.invalidate()
+            await api.update()
+            return await asyncio.wait_for(asyncio.gather(*tasks), 1)
+
+        assert run(update()) == [4.3]
+
+    def test_rollups_on_close_reads_a_getter(self, monkeypatch):
+        now = [time.time()]
+        monkeypatch.setattr(pyse.time, 'time', lambda: now[0])
+        client = FakeModbusClient({3501: 5})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True,
+                                    update_on_read=True, rollups=True)
+        values = []
+        api.rollups.on_close = lambda *interval: values.append(
+            api.get_vd_heating_total_kwh())
+        api.update()
+        # A day later, completing an interval of each resolution
+        now[0] += 86400
+        client.registers[3501] = 7
+        assert update_in_thread(api) == [True]
+        assert values == [7, 7, 7]
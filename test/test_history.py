@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+from array import array
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.history import History
+
+slave = 1
+
+
+def fill(history, raws, start=0):
+    """Append snapshots with OUTSIDE_TEMPERATURE raw values, 1 s apart."""
+    schema = pyse.LWZ_SCHEMA
+    buffers = [array('H', [0] * block.count) for block in schema.blocks]
+    for i, raw in enumerate(raws):
+        buffers[0][6] = raw
+        buffers[2][0] = i
+        history.append(buffers, timestamp=start + i)
+
+
+class TestHistory:
+
+    def test_empty(self):
+        history = History(pyse.LWZ_SCHEMA, 4)
+        assert len(history) == 0
+        assert list(history.raw('OUTSIDE_TEMPERATURE')) == []
+        assert history.series('OUTSIDE_TEMPERATURE') == (history.times(), [])
+
+    def test_capacity(self):
+        with pytest.raises(ValueError):
+            History(pyse.LWZ_SCHEMA, 0)
+
+    def test_window_queries(self):
+        history = History(pyse.LWZ_SCHEMA, 4)
+        fill(history, [100, 101, 102])
+        assert len(history) == 3
+        assert list(history.raw('OUTSIDE_TEMPERATURE')) == [100, 101, 102]
+        assert history.values('OUTSIDE_TEMPERATURE', count=2) == [10.1, 10.2]
+        assert list(history.raw(2000, since=1)) == [1, 2]
+
+    def test_wraps_around(self):
+        history = History(pyse.LWZ_SCHEMA, 4)
+        fill(history, [100, 101, 102, 103, 104, 0xFFFF], start=10)
+        assert len(history) == 4
+        assert list(history.times()) == [12, 13, 14, 15]
+        assert history.values('OUTSIDE_TEMPERATURE') == \
+            [10.2, 10.3, 10.4, -0.1]
+        times, values = history.series('OUTSIDE_TEMPERATURE', since=14)
+        assert list(times) == [14, 15]
+        assert values == [10.4, -0.1]
+        assert list(history.raw('OPERATING_STATUS', count=3)) == [3, 4, 5]
+
+        history.clear()
+        assert len(history) == 0
+
+
+class TestApiHistory:
+
+    def test_disabled_by_default(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient(), slave)
+        assert api.history is None
+
+    def test_successful_reads_are_recorded(self):
+        client = FakeModbusClient({6: 100})
+        api = pyse.StiebelEltronAPI(client, slave, history=10)
+        api.update()
+        client.registers[6] = 95
+        api.update()
+        client.readable = set()
+        api.update()
+        assert api.history.values('OUTSIDE_TEMPERATURE') == [10.0, 9.5]
+
+    def test_async(self):
+        client = FakeAsyncModbusClient({6: 100})
+        api = AsyncStiebelEltronAPI(client, slave, history=10)
+        run(api.update())
+        assert api.history.values('OUTSIDE_TEMPERATURE') == [10.0]
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+from test.fake_modbus_client import FakeModbusClient
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.planner import plan_reads
+from pystiebeleltron.registers import RegisterSchema
+
+slave = 1
+
+
+def requests(plan):
+    return [(r.block.index, r.address, r.count) for r in plan]
+
+
+class TestPlanReads:
+
+    def test_full_plan_follows_blocks(self):
+        assert requests(plan_reads(pyse.LWZ_SCHEMA)) == [
+            (0, 0, 33), (1, 1000, 27), (2, 2000, 3)]
+        assert requests(plan_reads(pyse.WPM3i_SCHEMA)) == [
+            (0, 500, 83), (1, 1500, 21), (2, 2501, 5), (3, 3500, 111)]
+
+    def test_merge_below_gap_threshold(self):
+        names = ['ACTUAL_ROOM_TEMPERATURE_HC1', 'OUTSIDE_TEMPERATURE',
+                 'MIXED_WATER_AMOUNT', 'OPERATING_MODE']
+        assert requests(plan_reads(pyse.LWZ_SCHEMA, names, max_gap=5)) == [
+            (0, 0, 7), (0, 32, 1), (1, 1000, 1)]
+        assert requests(plan_reads(pyse.LWZ_SCHEMA, names, max_gap=0)) == [
+            (0, 0, 1), (0, 6, 1), (0, 32, 1), (1, 1000, 1)]
+        assert requests(plan_reads(pyse.LWZ_SCHEMA, names, max_gap=30)) == [
+            (0, 0, 33), (1, 1000, 1)]
+
+    def test_skip_unmapped_ranges(self):
+        regmap = {'A': {'addr': 0, 'type': 6}, 'B': {'addr': 1, 'type': 6},
+                  'C': {'addr': 40, 'type': 6}}
+        schema = RegisterSchema([(regmap, 0, 'read_input_registers')])
+        assert requests(plan_reads(schema)) == [(0, 0, 2), (0, 40, 1)]
+
+    def test_no_merge_across_unreadable_addresses(self):
+        names = ['ACTUAL_ROOM_TEMPERATURE_HC1', 'OUTSIDE_TEMPERATURE']
+        assert requests(plan_reads(pyse.LWZ_SCHEMA, names,
+                                   unreadable={3})) == [(0, 0, 1), (0, 6, 1)]
+        assert requests(plan_reads(pyse.LWZ_SCHEMA, names,
+                                   unreadable={7})) == [(0, 0, 7)]
+
+    def test_split_at_max_count(self):
+        regmap = {'R{}'.format(a): {'addr': a, 'type': 6} for a in range(300)}
+        schema = RegisterSchema([(regmap, 0, 'read_input_registers')])
+        assert requests(plan_reads(schema)) == [
+            (0, 0, 125), (0, 125, 125), (0, 250, 50)]
+
+
+class TestPlannedUpdate:
+
+    def test_update_selected_registers(self):
+        client = FakeModbusClient({6: 55, 3500: 7})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True)
+
+        assert api.update(['OUTSIDE_TEMPERATURE',
+                           'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY__KWH'])
+        assert client.requests == [('input', 506, 1), ('input', 3500, 1)]
+        assert api.get_conv_val(3500) == 7
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+import pickle
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.planner import ReadRequest
+from pystiebeleltron.prune import Pruner, unavailable
+from pystiebeleltron.registers import ERROR_NOTAVAILABLE, UNAVAILABLE_OBJECT
+
+slave = 1
+
+# Signed registers of the second heating circuit (LWZ)
+HC2 = ['ACTUAL_ROOM_TEMPERATURE_HC2', 'SET_ROOM_TEMPERATURE_HC2',
+       'RELATIVE_HUMIDITY_HC2']
+
+
+class Clock(object):
+    def __init__(self, now=1000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def requested(client):
+    """Return the addresses of all read requests of a client."""
+    return {address for function, start, count in client.requests
+            if function != 'write'
+            for address in range(start, start + count)}
+
+
+def observe(pruner, values, now):
+    """Let the pruner observe a full read of block 1 with the given values."""
+    block = pruner.schema.blocks[0]
+    buffer = [values.get(register.addr, 0) for register in block.registers]
+    return pruner.observe([ReadRequest(block, block.start, block.count)],
+                          [buffer], now)
+
+
+class TestPruner:
+
+    def test_prune_after_consecutive_misses(self):
+        pruner = Pruner(pyse.LWZ_SCHEMA, 3)
+        unavailable_hc2 = {3: UNAVAILABLE_OBJECT}
+        assert not observe(pruner, unavailable_hc2, 0)
+        assert not observe(pruner, {}, 1)
+        assert not observe(pruner, unavailable_hc2, 2)
+        assert not observe(pruner, unavailable_hc2, 3)
+        assert observe(pruner, unavailable_hc2, 4)
+        assert pruner.pruned == {3}
+
+    def test_recheck_backs_off(self):
+        pruner = Pruner(pyse.LWZ_SCHEMA, 1, recheck_interval=10,
+                        max_recheck_interval=25)
+        values = {3: UNAVAILABLE_OBJECT}
+        observe(pruner, values, 0)
+        assert pruner.excluded(9) == {3}
+        assert pruner.excluded(10) == set()
+        # Read as gap before the recheck is due, the schedule is kept
+        observe(pruner, values, 5)
+        assert pruner.excluded(10) == set()
+        observe(pruner, values, 10)
+        assert pruner.excluded(29) == {3}
+        assert pruner.excluded(30) == set()
+        observe(pruner, values, 30)
+        assert pruner.excluded(54) == {3}
+        assert pruner.excluded(55) == set()
+        assert pruner.pruned == {3}
+
+    def test_value_ends_pruning(self):
+        pruner = Pruner(pyse.LWZ_SCHEMA, 1)
+        observe(pruner, {3: UNAVAILABLE_OBJECT}, 0)
+        assert observe(pruner, {3: 215}, 1)
+        assert pruner.pruned == set()
+
+    def test_unavailable(self):
+        schema = pyse.LWZ_SCHEMA
+        signed = schema['ACTUAL_ROOM_TEMPERATURE_HC2']
+        assert unavailable(signed, UNAVAILABLE_OBJECT)
+        assert unavailable(signed, signed.encode(ERROR_NOTAVAILABLE))
+        assert not unavailable(signed, signed.encode(-5))
+        # Status bits
+        assert not unavailable(schema['OPERATING_STATUS'],
+                               UNAVAILABLE_OBJECT)
+
+
+class TestApiPruning:
+
+    def unit(self, **kwargs):
+        registers = {pyse.LWZ_SCHEMA[name].addr: UNAVAILABLE_OBJECT
+                     for name in HC2}
+        registers[6] = 43
+        client = FakeModbusClient(registers)
+        api = pyse.StiebelEltronAPI(client, slave, prune_after=2,
+                                    recheck_interval=60, max_gap=0,
+                                    **kwargs)
+        api._pruner.clock = Clock()
+        return client, api
+
+    def test_pruned_registers_are_not_read(self):
+        client, api = self.unit()
+        api.update()
+        assert api.get_conv_val('ACTUAL_ROOM_TEMPERATURE_HC2') == -3276.8
+        api.update()
+        client.requests.clear()
+        assert api.update()
+        assert not requested(client) & {3, 4, 5}
+        assert 6 in requested(client)
+        assert api.get_conv_val('ACTUAL_ROOM_TEMPERATURE_HC2') is None
+        assert api.values.ACTUAL_ROOM_TEMPERATURE_HC2 is None
+        assert api.values.OUTSIDE_TEMPERATURE == 4.3
+        assert api.get_outside_temp() == 4.3
+
+    def test_recheck(self):
+        client, api = self.unit()
+        api.update()
+        api.update()
+        api._pruner.clock.now += 60
+        client.requests.clear()
+        api.update()
+        assert {3, 4, 5} <= requested(client)
+        # Still unavailable, next recheck in 120 seconds
+        api._pruner.clock.now += 60
+        client.requests.clear()
+        api.update()
+        assert not requested(client) & {3, 4, 5}
+        api._pruner.clock.now += 60
+        client.registers[3] = 215
+        api.update()
+        assert api.values.ACTUAL_ROOM_TEMPERATURE_HC2 == 21.5
+        assert api.get_conv_val('ACTUAL_ROOM_TEMPERATURE_HC2') == 21.5
+        assert api.values.SET_ROOM_TEMPERATURE_HC2 is None
+        client.requests.clear()
+        api.update()
+        assert 3 in requested(client)
+        assert not requested(client) & {4, 5}
+
+    def test_getters_read_stale_blocks_without_pruned(self):
+        client, api = self.unit(update_on_read=True)
+        api.update()
+        api.update()
+        client.requests.clear()
+        assert api.get_outside_temp() == 4.3
+        assert not requested(client) & {3, 4, 5}
+
+    def test_snapshot(self):
+        client, api = self.unit()
+        api.update()
+        snapshot = api.poll()
+        assert snapshot['ACTUAL_ROOM_TEMPERATURE_HC2'] is None
+        assert snapshot.values.ACTUAL_ROOM_TEMPERATURE_HC2 is None
+        assert dict(snapshot.items())['SET_ROOM_TEMPERATURE_HC2'] is None
+        assert snapshot['OUTSIDE_TEMPERATURE'] == 4.3
+        restored = pickle.loads(pickle.dumps(snapshot))
+        assert restored['ACTUAL_ROOM_TEMPERATURE_HC2'] is None
+
+    def test_subscription(self):
+        client, api = self.unit()
+        deliveries = []
+        api.subscribe(deliveries.append)
+        api.update()
+        assert deliveries[0]['ACTUAL_ROOM_TEMPERATURE_HC2'] == -3276.8
+        api.update()
+        assert deliveries[1] == {name: None for name in HC2}
+        api._pruner.clock.now += 60
+        client.registers[3] = 215
+        api.update()
+        assert deliveries[2] == {'ACTUAL_ROOM_TEMPERATURE_HC2': 21.5}
+        api.update()
+        assert len(deliveries) == 3
+
+    def test_disabled_by_default(self):
+        client = FakeModbusClient({3: UNAVAILABLE_OBJECT})
+        api = pyse.StiebelEltronAPI(client, slave)
+        for _ in range(5):
+            api.update()
+        assert api._pruner is None
+        assert api.values.ACTUAL_ROOM_TEMPERATURE_HC2 == -3276.8
+
+    def test_async(self):
+        client = FakeAsyncModbusClient({3: UNAVAILABLE_OBJECT})
+        api = AsyncStiebelEltronAPI(client, slave, prune_after=1, max_gap=0)
+        run(api.update())
+        client.requests.clear()
+        run(api.update())
+        assert 3 not in requested(client)
+        assert run(api.get_current_temp()) == 0
+        assert api.values.ACTUAL_ROOM_TEMPERATURE_HC2 is None
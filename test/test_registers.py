@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.registers import (
+    RegisterSchema, RegisterStore, load_regmaps, model_schema)
+
+slave = 1
+
+
+class TestRegisterSchema:
+
+    def test_index_by_name_and_address(self):
+        register = pyse.WPM3i_SCHEMA['OUTSIDE_TEMPERATURE']
+        assert register.addr == 507 - 1
+        assert register.block == 0
+        assert register.offset == 6
+        assert pyse.WPM3i_SCHEMA[507 - 1] is register
+        assert 'HP5__AMOUNT_OF_HEAT__VD_DHW_TOTAL__MWH' in pyse.WPM3i_SCHEMA
+        assert 'HP6__RUNTIME__VD_COOLING' not in pyse.WPM3i_SCHEMA
+
+    def test_blocks(self):
+        blocks = pyse.LWZ_SCHEMA.blocks
+        assert [(b.function, b.start, b.count) for b in blocks] == [
+            ('read_input_registers', 0, 33),
+            ('read_holding_registers', 1000, 27),
+            ('read_input_registers', 2000, 3)]
+        assert len(pyse.LWZ_SCHEMA) == 33 + 27 + 3
+
+    def test_block_spans_gaps(self):
+        schema = RegisterSchema([({
+            'A': {'addr': 10, 'type': 6},
+            'B': {'addr': 14, 'type': 2}}, 10, 'read_input_registers')])
+        assert schema.blocks[0].count == 5
+        assert schema['B'].offset == 4
+
+    def test_decoding(self):
+        store = RegisterStore(pyse.LWZ_SCHEMA)
+        store.store(pyse.LWZ_SCHEMA.blocks[0], [0xFFC4], offset=6)
+        store.store(pyse.LWZ_SCHEMA.blocks[0], [0xFF9C], offset=28)
+        assert store.raw('OUTSIDE_TEMPERATURE') == 0xFFC4
+        assert store.value('OUTSIDE_TEMPERATURE') == -6.0
+        assert store.value('HIGH_PRESSURE') == -1.0
+        assert store.value('UNKNOWN') is None
+
+        with pytest.raises(KeyError):
+            store.raw('UNKNOWN')
+
+
+class TestRegisterMaps:
+
+    def test_load_regmaps(self):
+        regmaps = load_regmaps('lwz')
+        assert [(name, start, function) for name, start, function, _
+                in regmaps] == [
+            ('B1_REGMAP_INPUT', 0, 'read_input_registers'),
+            ('B2_REGMAP_HOLDING', 1000, 'read_holding_registers'),
+            ('B3_REGMAP_INPUT', 2000, 'read_input_registers')]
+        assert regmaps[0][3]['OUTSIDE_TEMPERATURE'] == \
+            {'addr': 6, 'type': 2, 'value': 0}
+        # Commented registers are not loaded
+        assert 'HP6__RUNTIME__VD_COOLING' not in load_regmaps('wpm3i')[3][3]
+
+    def test_unknown_model(self):
+        with pytest.raises(ValueError):
+            load_regmaps('lwz404')
+
+    def test_schema_is_shared(self):
+        assert model_schema('wpm3i') is pyse.WPM3i_SCHEMA
+        assert pyse.StiebelEltronAPI(
+            FakeModbusClient(), slave)._schema is pyse.LWZ_SCHEMA
+
+    def test_module_attributes(self):
+        assert pyse.WPM3i_B4_START_ADDR == 3501 - 1
+        assert pyse.B2_REGMAP_HOLDING['RESTART_ISG'] == \
+            {'addr': 1026, 'type': 6, 'value': 0}
+        assert pyse.B2_REGMAP_HOLDING is pyse.B2_REGMAP_HOLDING
+        with pytest.raises(AttributeError):
+            pyse.B9_REGMAP_INPUT
+
+    def test_lazy_import(self):
+        code = ("import sys; import pystiebeleltron.pystiebeleltron as pyse; "
+                "from pystiebeleltron import registers; "
+                "print(sorted(registers._REGMAPS), 'numpy' in sys.modules, "
+                "'asyncio' in sys.modules); pyse.LWZ_SCHEMA; "
+                "print(sorted(registers._REGMAPS))")
+        output = subprocess.check_output(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        assert output.decode().split('\n')[:2] == \
+            ["[] False False", "['lwz']"]
+
+
+class TestInstanceState:
+
+    def test_instances_do_not_share_values(self):
+        api_1 = pyse.StiebelEltronAPI(FakeModbusClient({6: 100}), slave)
+        api_2 = pyse.StiebelEltronAPI(FakeModbusClient({6: 200}), slave)
+
+        assert api_1.update() and api_2.update()
+        assert api_1.get_outside_temp() == 10.0
+        assert api_2.get_outside_temp() == 20.0
+        assert pyse.B1_REGMAP_INPUT['OUTSIDE_TEMPERATURE']['value'] == 0
+
+    def test_get_conv_val_by_address(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient({2000: 4}), slave)
+        api.update()
+
+        assert api.get_conv_val(2000) == api.get_conv_val('OPERATING_STATUS')
+        assert api.get_conv_val(4711) is None
+
+
+class TestPublishedBuffers:
+
+    def test_store_publishes_new_buffers(self):
+        store = RegisterStore(pyse.LWZ_SCHEMA)
+        published = store.buffers
+        blocks = pyse.LWZ_SCHEMA.blocks
+        store.store_all([(blocks[0], 6, [43]), (blocks[0], 28, [1]),
+                         (blocks[2], 0, [4])])
+        assert store.buffers is not published
+        assert published[0][6] == 0 and published[2][0] == 0
+        assert store.raw('OUTSIDE_TEMPERATURE') == 43
+        assert store.raw('OPERATING_STATUS') == 4
+        # Unchanged blocks are shared
+        assert store.buffers[1] is published[1]
+
+    def test_readers_see_consistent_updates(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        schema = pyse.LWZ_SCHEMA
+        stop = threading.Event()
+        torn = []
+
+        def poll():
+            for generation in range(1, 300):
+                client.registers = {register.addr: generation
+                                    for register in schema}
+                api.update()
+            stop.set()
+
+        def read():
+            while not stop.is_set():
+                values = api.values
+                first = values.VENTILATION_AIR_ACTUAL_FAN_SPEED
+                last = values.OPERATING_STATUS
+                if first != last:
+                    torn.append((first, last))
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        poll()
+        for reader in readers:
+            reader.join()
+        assert torn == []
+        assert api.values.OPERATING_STATUS == 299
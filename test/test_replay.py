@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+import asyncio
+import io
+import time
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.replay import (
+    AsyncRecorder, AsyncReplayConnection, Recorder, ReplayConnection,
+    RAISED, ReplayError, read_records)
+
+slave = 1
+
+
+def record_session(client, file):
+    """Record two updates and a write."""
+    recorder = Recorder(client, file)
+    api = pyse.StiebelEltronAPI(recorder, slave)
+    api.update()
+    client.registers[6] = 95
+    api.update()
+    api.set_operation('AUTOMATIC')
+    recorder.close()
+    file.seek(0)
+
+
+class TestRecorder:
+
+    def test_records_requests_and_responses(self):
+        file = io.BytesIO()
+        record_session(FakeModbusClient({6: 100}), file)
+        records = read_records(file)
+        assert [(r.function, r.address, r.count) for r in records] == \
+            [(4, 0, 33), (3, 1000, 27), (4, 2000, 3)] * 2 + [(6, 1000, 1)]
+        assert records[0].words[6] == 100
+        assert records[3].words[6] == 95
+        assert list(records[6].words) == [11]
+        assert records[0].time <= records[6].time
+
+    def test_file_is_compact(self):
+        file = io.BytesIO()
+        record_session(FakeModbusClient(), file)
+        # Header, 17 bytes per request and 2 bytes per register
+        assert len(file.getvalue()) == 9 + 7 * 17 + 2 * (2 * 63 + 1)
+
+    def test_not_a_recording(self):
+        with pytest.raises(ReplayError):
+            read_records(io.BytesIO(b'nonsense'))
+
+
+class TestReplay:
+
+    def test_replays_as_fast_as_possible(self):
+        file = io.BytesIO()
+        record_session(FakeModbusClient({6: 100}), file)
+
+        api = pyse.StiebelEltronAPI(ReplayConnection(file), slave)
+        assert api.update()
+        assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 10.0
+        assert api.update()
+        assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 9.5
+        assert api.set_operation('AUTOMATIC').value == 11
+        with pytest.raises(ReplayError):
+            api.update()
+
+    def test_mismatch(self):
+        file = io.BytesIO()
+        record_session(FakeModbusClient(), file)
+
+        api = pyse.StiebelEltronAPI(ReplayConnection(file), slave,
+                                    is_wpm3i=True)
+        with pytest.raises(ReplayError):
+            api.update()
+
+    def test_failures_are_replayed(self):
+        file = io.BytesIO()
+        recorder = Recorder(FakeModbusClient(readable=set()), file)
+        assert not pyse.StiebelEltronAPI(recorder, slave).update()
+        recorder.close()
+        file.seek(0)
+
+        conn = ReplayConnection(file)
+        assert conn.records[0].status == 2
+        response = conn.read_input_registers(address=0, count=33, unit=1)
+        assert response.isError()
+        assert not hasattr(response, 'registers')
+
+    def test_repeat(self):
+        file = io.BytesIO()
+        record_session(FakeModbusClient(), file)
+
+        conn = ReplayConnection(file, repeat=True)
+        api = pyse.StiebelEltronAPI(conn, slave)
+        api.update()
+        api.update()
+        api.set_operation('AUTOMATIC')
+        assert api.update()
+
+    def test_real_time(self):
+        file = io.BytesIO()
+        recorder = Recorder(FakeModbusClient(), file)
+        api = pyse.StiebelEltronAPI(recorder, slave)
+        api.update(['OUTSIDE_TEMPERATURE'])
+        time.sleep(0.05)
+        api.update(['OUTSIDE_TEMPERATURE'])
+        recorder.close()
+        file.seek(0)
+
+        api = pyse.StiebelEltronAPI(ReplayConnection(file, speed=1), slave)
+        start = time.monotonic()
+        api.update(['OUTSIDE_TEMPERATURE'])
+        api.update(['OUTSIDE_TEMPERATURE'])
+        assert time.monotonic() - start >= 0.04
+
+
+class TestAsyncReplay:
+
+    def test_record_and_replay(self):
+        file = io.BytesIO()
+        client = FakeAsyncModbusClient({6: 100, 2000: 3})
+        recorder = AsyncRecorder(client, file)
+        run(AsyncStiebelEltronAPI(recorder, slave).update())
+        recorder.close()
+        file.seek(0)
+
+        # Requests are recorded in the order they were issued
+        assert [r.address for r in read_records(file)] == [0, 1000, 2000]
+        file.seek(0)
+
+        api = AsyncStiebelEltronAPI(AsyncReplayConnection(file), slave)
+        assert run(api.update())
+        assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 10.0
+        assert api.get_conv_val('OPERATING_STATUS') == 3
+
+    def test_cancelled_request(self):
+        file = io.BytesIO()
+        client = FakeAsyncModbusClient({6: 100}, latency=0.05)
+        recorder = AsyncRecorder(client, file)
+        api = AsyncStiebelEltronAPI(recorder, slave)
+
+        async def session():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(api.update(), 0.01)
+            client.latency = 0
+            for _ in range(3):
+                assert await api.update()
+
+        run(session())
+        recorder.close()
+        file.seek(0)
+        records = read_records(file)
+        assert [r.status for r in records[:3]] == [RAISED] * 3
+        assert len(records) == 12
+        assert records[3].words[6] == 100
+
+    def test_close_drops_pending_requests(self):
+        file = io.BytesIO()
+        recorder = AsyncRecorder(FakeAsyncModbusClient(latency=0.05), file)
+
+        async def session():
+            pending = asyncio.ensure_future(recorder.read_input_registers(0))
+            await asyncio.sleep(0.01)
+            recorder.close()
+            await pending
+
+        run(session())
+        file.seek(0)
+        assert read_records(file) == []
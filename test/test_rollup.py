@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+import time
+from array import array
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT
+from pystiebeleltron.rollup import (
+    DAILY, RUNTIME, TOTAL, EnergyRollups, Resolution, block_counters)
+
+slave = 1
+
+HEAT = 'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL'
+HEAT_DAY = 'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_DAY'
+RUNTIME_COUNTER = 'VD_HEATING_RUNTIME'
+
+# 2026-03-10 23:58:00 local time
+NIGHT = time.mktime((2026, 3, 10, 23, 58, 0, 0, 0, -1))
+
+
+def address(name):
+    return pyse.WPM3i_SCHEMA[name].addr
+
+
+class Unit(object):
+    """Counter readings of a WPM3i."""
+
+    def __init__(self, rollups):
+        self.rollups = rollups
+        self.buffers = [array('H', [0] * block.count)
+                        for block in pyse.WPM3i_SCHEMA.blocks]
+
+    def read(self, timestamp, **registers):
+        block = self.rollups.block
+        for name, raw in registers.items():
+            self.buffers[block.index][address(name) - block.start] = raw
+        self.rollups.update(self.buffers, timestamp)
+
+    def total(self, timestamp, mwh, kwh):
+        self.read(timestamp, **{HEAT + '__MWH': mwh, HEAT + '__KWH': kwh})
+
+
+def increases(rollups, name, readings):
+    """Return the increases of a counter after each reading."""
+    result = []
+    for reading in readings:
+        before = rollups.current('day')[1].get(name, 0)
+        reading()
+        result.append(rollups.current('day')[1][name] - before)
+    return result
+
+
+def totals(unit, readings):
+    return increases(unit.rollups, HEAT, [
+        lambda i=i, mwh=mwh, kwh=kwh: unit.total(NIGHT - 600 + i, mwh, kwh)
+        for i, (mwh, kwh) in enumerate(readings)])
+
+
+class TestCounters:
+
+    def test_block_counters(self):
+        schema = pyse.WPM3i_SCHEMA
+        counters = {counter.name: counter
+                    for counter in block_counters(schema.blocks[3])}
+        assert counters[HEAT].kind == TOTAL
+        assert counters[HEAT].registers == (schema[HEAT + '__MWH'],
+                                            schema[HEAT + '__KWH'])
+        assert counters[HEAT_DAY].kind == DAILY
+        assert counters[RUNTIME_COUNTER].kind == RUNTIME
+
+    def test_carry_after_wrap(self):
+        unit = Unit(EnergyRollups(pyse.WPM3i_SCHEMA))
+        assert totals(unit, [(12, 998), (12, 999), (12, 0), (12, 1),
+                             (13, 1), (13, 3)]) == [0, 1, 1, 1, 0, 2]
+
+    def test_carry_before_wrap(self):
+        unit = Unit(EnergyRollups(pyse.WPM3i_SCHEMA))
+        assert totals(unit, [(12, 998), (13, 999), (13, 0), (13, 1)]) == \
+            [0, 1, 1, 1]
+
+    def test_carry_before_wrap_several_readings(self):
+        unit = Unit(EnergyRollups(pyse.WPM3i_SCHEMA))
+        assert totals(unit, [(1, 998), (2, 999), (2, 999), (2, 999), (2, 0),
+                             (2, 1)]) == [0, 1, 0, 0, 1, 1]
+
+    def test_large_increase_between_readings(self):
+        unit = Unit(EnergyRollups(pyse.WPM3i_SCHEMA))
+        assert totals(unit, [(12, 500), (13, 600), (13, 700)]) == \
+            [0, 100, 1100]
+        assert totals(unit, [(15, 100), (15, 100), (15, 150)]) == \
+            [400, 0, 1050]
+
+    def test_reset(self):
+        unit = Unit(EnergyRollups(pyse.WPM3i_SCHEMA))
+        assert totals(unit, [(12, 500), (0, 5), (0, 7)]) == [0, 0, 2]
+
+    def test_daily_and_runtime_counters(self):
+        rollups = EnergyRollups(pyse.WPM3i_SCHEMA)
+        unit = Unit(rollups)
+        assert increases(rollups, HEAT_DAY, [
+            lambda: unit.read(NIGHT, **{HEAT_DAY + '__KWH': 30,
+                                        RUNTIME_COUNTER: 1200}),
+            lambda: unit.read(NIGHT + 1, **{HEAT_DAY + '__KWH': 35}),
+            lambda: unit.read(NIGHT + 2, **{HEAT_DAY + '__KWH': 3}),
+        ]) == [0, 5, 3]
+        assert increases(rollups, RUNTIME_COUNTER, [
+            lambda: unit.read(NIGHT + 3, **{RUNTIME_COUNTER: 1201}),
+            lambda: unit.read(NIGHT + 4, **{RUNTIME_COUNTER: 2}),
+            lambda: unit.read(NIGHT + 5, **{RUNTIME_COUNTER: 3}),
+        ]) == [1, 0, 1]
+
+    def test_unavailable_reading(self):
+        unit = Unit(EnergyRollups(pyse.WPM3i_SCHEMA))
+        assert totals(unit, [(12, 500), (12, UNAVAILABLE_OBJECT), (12, 510)]) \
+            == [0, 0, 10]
+
+
+class TestRollups:
+
+    def test_intervals(self):
+        closed = []
+        rollups = EnergyRollups(
+            pyse.WPM3i_SCHEMA, on_close=lambda *args: closed.append(args))
+        unit = Unit(rollups)
+        for minute, kwh in enumerate([0, 2, 5, 6]):
+            unit.total(NIGHT + 60 * minute, 12, kwh)
+            unit.total(NIGHT + 60 * minute + 30, 12, kwh + 1)
+        starts, kwh = rollups.series(HEAT, 'minute')
+        assert starts == [NIGHT, NIGHT + 60, NIGHT + 120, NIGHT + 180]
+        assert kwh == [1, 2, 3, 1]
+        assert rollups.rollups['minute'].readings() == [2, 2, 2, 2]
+        # The third minute starts a new day
+        midnight = NIGHT + 120
+        assert rollups.series(HEAT, 'day') == ([NIGHT - 23 * 3600 - 58 * 60,
+                                                midnight], [3, 4])
+        assert rollups.current('hour') == (midnight, rollups.current('day')[1])
+        minutes = [(name, start) for name, start, values in closed
+                   if name == 'minute']
+        assert minutes == [('minute', NIGHT), ('minute', NIGHT + 60),
+                           ('minute', NIGHT + 120)]
+        name, start, values = [args for args in closed if args[0] == 'day'][0]
+        assert values[HEAT] == 3
+        assert values[RUNTIME_COUNTER] == 0
+
+    def test_bounded(self):
+        rollups = EnergyRollups(pyse.WPM3i_SCHEMA,
+                                [Resolution('minute', 60, 3)])
+        unit = Unit(rollups)
+        for minute in range(10):
+            unit.total(NIGHT + 60 * minute, 12, minute)
+        assert len(rollups.rollups['minute']) == 3
+        assert rollups.series(HEAT, 'minute', count=2) == \
+            ([NIGHT + 480, NIGHT + 540], [1, 1])
+
+    def test_same_reading_twice(self):
+        rollups = EnergyRollups(pyse.WPM3i_SCHEMA)
+        unit = Unit(rollups)
+        unit.total(NIGHT, 12, 1)
+        unit.total(NIGHT, 12, 1)
+        assert rollups.rollups['minute'].readings() == [1]
+
+    def test_errors(self):
+        with pytest.raises(ValueError):
+            EnergyRollups(pyse.LWZ_SCHEMA)
+        with pytest.raises(ValueError):
+            EnergyRollups(pyse.WPM3i_SCHEMA,
+                          [Resolution('week', 7 * 86400, 4)])
+        assert EnergyRollups(pyse.WPM3i_SCHEMA).current('hour') == (None, {})
+
+
+class TestApiRollups:
+
+    def test_update(self):
+        client = FakeModbusClient({address(HEAT + '__MWH'): 12,
+                                   address(HEAT + '__KWH'): 345})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True,
+                                    rollups=True)
+        api.update()
+        client.registers[address(HEAT + '__KWH')] = 350
+        api.update()
+        start, values = api.rollups.current('hour')
+        assert values[HEAT] == 5
+        # Blocks without counters do not add readings
+        api.update(['OUTSIDE_TEMPERATURE'])
+        assert api.rollups.rollups['hour'].readings() == [2]
+
+    def test_snapshots(self):
+        client = FakeModbusClient({address(HEAT + '__KWH'): 1})
+        api = pyse.StiebelEltronAPI(client, slave, is_wpm3i=True)
+        rollups = EnergyRollups(pyse.WPM3i_SCHEMA)
+        rollups.add(api.poll())
+        client.registers[address(HEAT + '__KWH')] = 4
+        rollups.add(api.poll())
+        rollups.add(None)
+        assert rollups.current('day')[1][HEAT] == 3
+        assert api.rollups is None
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+import pytest
+
+from test.fake_modbus_client import (
+    ExceptionResponse, FakeAsyncModbusClient, FakeModbusClient, run)
+from test.tcp_modbus_client import TcpModbusClient
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.fleet import FleetPoller
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT
+from pystiebeleltron.scan import (
+    DeviceProfile, ScanError, Scanner, scan_ranges)
+from pystiebeleltron.simulator import SimulatedDevice, SimulatedISG
+
+slave = 1
+
+SECOND_HEAT_PUMP = ['HEAT_PUMP_2__FLOW_TEMPERATURE',
+                    'HEAT_PUMP_2__RETURN_TEMPERATURE']
+
+
+def wpm3i_unit(latency=0):
+    """Return a WPM3i without a second heat pump."""
+    schema = pyse.WPM3i_SCHEMA
+    registers = {schema[name].addr: UNAVAILABLE_OBJECT
+                 for name in SECOND_HEAT_PUMP}
+    return FakeAsyncModbusClient(
+        registers, readable={register.addr for register in schema},
+        latency=latency)
+
+
+class TestScanner:
+
+    def test_profile(self):
+        client = wpm3i_unit()
+        profile = run(Scanner(client, slave).scan('wpm3i'))
+        schema = pyse.WPM3i_SCHEMA
+        assert profile.responding == client.readable
+        assert profile.dead(schema) == {schema[name].addr
+                                        for name in SECOND_HEAT_PUMP}
+        assert profile.populated(schema['OUTSIDE_TEMPERATURE'].addr)
+
+    def test_contiguous_range_is_read_once(self):
+        client = FakeAsyncModbusClient(readable=set(range(100, 150)))
+        scanner = Scanner(client, slave)
+        profile = run(scanner.scan(
+            'lwz', ranges=[('read_input_registers', 100, 50)]))
+        assert profile.responding == set(range(100, 150))
+        assert scanner.requests == 1
+
+    def test_bisects_around_gaps(self):
+        readable = set(range(0, 64)) - {10, 40, 41}
+        client = FakeAsyncModbusClient(readable=readable)
+        scanner = Scanner(client, slave)
+        profile = run(scanner.scan(
+            'lwz', ranges=[('read_input_registers', 0, 64)]))
+        assert profile.responding == readable
+        # Far less than a request per address
+        assert scanner.requests < 30
+
+    def test_splits_at_request_limit(self):
+        client = FakeAsyncModbusClient()
+        scanner = Scanner(client, slave)
+        run(scanner.scan('lwz', ranges=[('read_holding_registers', 0, 300)]))
+        assert client.requests == [('holding', 0, 125), ('holding', 125, 125),
+                                   ('holding', 250, 50)]
+
+    def test_bounded_concurrency(self):
+        client = wpm3i_unit(latency=0.005)
+        run(Scanner(client, slave, max_concurrency=3).scan('wpm3i'))
+        assert client.max_in_flight == 3
+
+    def test_detects_model(self):
+        profile = run(Scanner(wpm3i_unit(), slave).scan())
+        assert profile.model == 'wpm3i'
+
+    def test_retries_other_exceptions(self):
+        client = FakeAsyncModbusClient()
+        read = client.read_input_registers
+        failures = [2]
+
+        async def busy(address, count=1, unit=0):
+            if failures[0]:
+                failures[0] -= 1
+                return ExceptionResponse(0x04, exception_code=6)
+            return await read(address, count, unit)
+
+        client.read_input_registers = busy
+        scanner = Scanner(client, slave, retries=2)
+        profile = run(scanner.scan(
+            'lwz', ranges=[('read_input_registers', 0, 10)]))
+        assert profile.responding == set(range(10))
+        failures[0] = 3
+        with pytest.raises(ScanError):
+            run(scanner.scan('lwz', ranges=[('read_input_registers', 0, 10)]))
+
+    def test_scan_ranges(self):
+        ranges = scan_ranges(pyse.LWZ_SCHEMA, margin=5)
+        assert ranges == [('read_holding_registers', 995, 37),
+                          ('read_input_registers', 0, 38),
+                          ('read_input_registers', 1995, 13)]
+        merged = scan_ranges(pyse.LWZ_SCHEMA, margin=1000)
+        assert [function for function, _, _ in merged] == [
+            'read_holding_registers', 'read_input_registers']
+
+    def test_simulator(self):
+        isg = SimulatedISG({slave: SimulatedDevice('wpm3i', seed=1)})
+
+        async def scan():
+            port = await isg.start()
+            client = await TcpModbusClient.connect('127.0.0.1', port)
+            try:
+                return await Scanner(client, slave).scan()
+            finally:
+                client.close()
+                await isg.close()
+
+        profile = run(scan())
+        schema = pyse.WPM3i_SCHEMA
+        dead = profile.dead()
+        assert schema['HEAT_PUMP_2__FLOW_TEMPERATURE'].addr in dead
+        assert schema['OUTSIDE_TEMPERATURE'].addr not in dead
+        assert {register.addr for register in schema} <= profile.responding
+
+
+class TestDeviceProfile:
+
+    def test_save_and_load(self, tmp_path):
+        profile = DeviceProfile('lwz', {0, 1, 2, 5, 1000}, {1})
+        assert profile.to_dict() == {
+            'model': 'lwz', 'responding': [[0, 2], [5, 5], [1000, 1000]],
+            'unavailable': [[1, 1]]}
+        path = str(tmp_path / 'profile.json')
+        profile.save(path)
+        assert DeviceProfile.load(path) == profile
+
+    def test_api_skips_dead_registers(self):
+        readable = set(range(0, 20)) | set(range(1000, 1027)) | \
+            set(range(2000, 2003))
+        client = FakeModbusClient({2: UNAVAILABLE_OBJECT, 6: 43}, readable)
+        profile = DeviceProfile('lwz', readable, {2})
+        api = pyse.StiebelEltronAPI(client, slave, profile=profile)
+        assert api.update()
+        assert client.requests == [('input', 0, 20), ('holding', 1000, 27),
+                                   ('input', 2000, 3)]
+        assert api.get_outside_temp() == 4.3
+        assert api.get_current_humidity() is None
+        assert api._values.raw('MIXED_WATER_AMOUNT') == UNAVAILABLE_OBJECT
+
+    def test_api_does_not_read_across_unanswered_addresses(self):
+        readable = {register.addr for register in pyse.LWZ_SCHEMA} - {9}
+        client = FakeModbusClient(readable=readable)
+        profile = DeviceProfile('lwz', readable)
+        api = pyse.StiebelEltronAPI(client, slave, profile=profile)
+        assert api.update()
+        assert client.requests[:2] == [('input', 0, 9), ('input', 10, 23)]
+
+    def test_update_of_live_registers_covers_block(self):
+        profile = DeviceProfile('lwz', set(range(0, 3000)) - set(range(3, 33)))
+        api = pyse.StiebelEltronAPI(FakeModbusClient(), slave,
+                                    profile=profile)
+        assert api._covered_blocks(['ACTUAL_ROOM_TEMPERATURE_HC1',
+                                    'SET_ROOM_TEMPERATURE_HC1',
+                                    'RELATIVE_HUMIDITY_HC1']) == \
+            [pyse.LWZ_SCHEMA.blocks[0]]
+
+    def test_unsigned_unavailable_values_are_populated(self):
+        schema = pyse.LWZ_SCHEMA
+        profile = DeviceProfile('lwz', {register.addr for register in schema},
+                                {0, 17})
+        assert profile.dead(schema) == {0}
+
+    def test_model_mismatch(self):
+        with pytest.raises(ValueError):
+            pyse.StiebelEltronAPI(FakeModbusClient(), slave,
+                                  profile=DeviceProfile('wpm3i', ()))
+
+    def test_fleet(self):
+        client = wpm3i_unit()
+
+        async def connect(host, port):
+            return client
+
+        profile = run(Scanner(wpm3i_unit(), slave).scan('wpm3i'))
+        poller = FleetPoller([('10.0.0.1', 502, slave, None)],
+                             connect=connect,
+                             profiles={'10.0.0.1:502/1': profile})
+
+        async def poll():
+            return [result async for result in poller.poll()]
+
+        result, = run(poll())
+        assert result.success
+        assert isinstance(result.api, AsyncStiebelEltronAPI)
+        assert result.api._skipped == profile.dead()
+        # The model of the profile is used, instead of detecting it
+        assert client.requests.count(('input', 2501, 5)) == 1
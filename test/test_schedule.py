@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.schedule import AsyncScheduler, PollGroup, Scheduler
+
+slave = 1
+
+
+class TestScheduler:
+
+    def test_default_groups_per_block(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient(), slave, is_wpm3i=True)
+        scheduler = Scheduler(api)
+        assert [(group.name, group.interval) for group in scheduler.groups] \
+            == [('block1', 60), ('block2', 3600), ('block3', 10),
+                ('block4', 900)]
+
+    def test_only_due_groups_are_read(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        scheduler = Scheduler(api)
+
+        assert len(scheduler.tick(now=1000)) == 3
+        assert client.requests == [('input', 0, 33), ('holding', 1000, 27),
+                                   ('input', 2000, 3)]
+
+        del client.requests[:]
+        assert scheduler.tick(now=1005) == []
+        assert [group.name for group in scheduler.tick(now=1010)] == \
+            ['block3']
+        assert [group.name for group in scheduler.tick(now=1060)] == \
+            ['block3', 'block1']
+        assert client.requests == [('input', 2000, 3), ('input', 0, 33),
+                                   ('input', 2000, 3)]
+        assert scheduler.next_due(now=1060) == 10
+
+    def test_due_groups_are_merged(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        scheduler = Scheduler(api, [
+            PollGroup('temperatures', ('OUTSIDE_TEMPERATURE',), 60, 1),
+            PollGroup('flow', ('FLOW_TEMPERATURE', 'RETURN_TEMPERATURE'),
+                      60, 1),
+        ])
+        scheduler.tick(now=0)
+        assert client.requests == [('input', 6, 7)]
+
+    def test_max_requests_defers_by_priority(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        scheduler = Scheduler(api, max_requests=2)
+
+        assert [group.name for group in scheduler.tick(now=0)] == \
+            ['block3', 'block1']
+        assert [group.name for group in scheduler.tick(now=1)] == \
+            ['block2']
+
+    def test_write_makes_shadow_due(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        scheduler = Scheduler(api)
+        scheduler.tick(now=1000)
+
+        api.set_operation('AUTOMATIC')
+        del client.requests[:]
+        assert [group.name for group in scheduler.tick(now=1001)] == \
+            ['block2']
+        assert client.requests == [('holding', 1000, 27)]
+        assert api.get_operation() == 'AUTOMATIC'
+
+    def test_failed_groups_are_retried(self):
+        client = FakeModbusClient(readable=set())
+        api = pyse.StiebelEltronAPI(client, slave)
+        scheduler = Scheduler(api, retry_interval=5)
+
+        assert scheduler.tick(now=1000) == []
+        assert scheduler.tick(now=1001) == []
+        assert len(client.requests) == 1
+        client.readable = None
+        assert len(scheduler.tick(now=1005)) == 3
+
+    def test_group_reads_mark_blocks_fresh(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+        Scheduler(api).tick()
+        del client.requests[:]
+        api.get_outside_temp()
+        api.get_operation()
+        assert client.requests == []
+
+
+class TestAsyncScheduler:
+
+    def test_tick(self):
+        client = FakeAsyncModbusClient({2000: 1})
+        api = AsyncStiebelEltronAPI(client, slave)
+        scheduler = AsyncScheduler(api)
+
+        async def ticks():
+            first = await scheduler.tick(now=1000)
+            second = await scheduler.tick(now=1010)
+            return first, second
+
+        first, second = run(ticks())
+        assert len(first) == 3
+        assert [group.name for group in second] == ['block3']
+        assert api.get_conv_val('OPERATING_STATUS') == 1
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+import asyncio
+import time
+
+import pytest
+
+from test.fake_modbus_client import run
+from test.tcp_modbus_client import TcpModbusClient
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.fleet import FleetPoller
+from pystiebeleltron.registers import UNAVAILABLE_OBJECT
+from pystiebeleltron.simulator import (
+    Faults, ModbusError, SimulatedDevice, SimulatedISG, SimulatorThread,
+    start_isgs)
+
+slave = 1
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def serve(isg, test):
+    """Run test(client) against a started ISG."""
+    port = await isg.start()
+    client = await TcpModbusClient.connect('127.0.0.1', port)
+    try:
+        return await test(client)
+    finally:
+        client.close()
+        await isg.close()
+
+
+class TestSimulatedDevice:
+
+    def test_values_from_register_maps(self):
+        device = SimulatedDevice('wpm3i', seed=1)
+        schema = device.schema
+        assert -10 < schema['OUTSIDE_TEMPERATURE'].decode(
+            device.raw(schema['OUTSIDE_TEMPERATURE'].addr)) < 20
+        assert device.raw(schema['OPERATING_MODE'].addr) == 2
+        assert device.raw(schema['HEAT_PUMP_2__FLOW_TEMPERATURE'].addr) == \
+            UNAVAILABLE_OBJECT
+
+    def test_values_vary_over_time(self):
+        clock = Clock(1000000)
+        device = SimulatedDevice('lwz', seed=1, clock=clock)
+        first = device.read('read_input_registers', 0, 33)
+        clock.now += 600
+        assert device.read('read_input_registers', 0, 33) != first
+
+    def test_energy_counters(self):
+        clock = Clock(1000000)
+        device = SimulatedDevice('wpm3i', seed=1, clock=clock)
+        prefix = 'ALL_HEAT_PUMPS__AMOUNT_OF_HEAT__VD_HEATING_TOTAL__'
+
+        def total():
+            return device.raw(device.schema[prefix + 'MWH'].addr) * 1000 + \
+                device.raw(device.schema[prefix + 'KWH'].addr)
+
+        before = total()
+        clock.now += 3600
+        assert total() == pytest.approx(before + 3, abs=1)
+
+    def test_fixed_values(self):
+        device = SimulatedDevice('lwz')
+        device.set('OUTSIDE_TEMPERATURE', -2.5)
+        assert device.raw(6) == 0xFFE7
+        device.release('OUTSIDE_TEMPERATURE')
+        assert device.raw(6) != 0xFFE7
+
+    def test_invalid_requests(self):
+        device = SimulatedDevice('lwz')
+        with pytest.raises(ModbusError):
+            device.read('read_holding_registers', 0, 10)
+        with pytest.raises(ModbusError):
+            device.read('read_input_registers', 30, 10)
+        with pytest.raises(ModbusError):
+            device.write(0, [1])
+
+
+class TestSimulatedISG:
+
+    def test_api_update(self):
+        device = SimulatedDevice('wpm3i', seed=1)
+        device.set('OUTSIDE_TEMPERATURE', 3.5)
+
+        async def test(client):
+            api = AsyncStiebelEltronAPI(client, slave, is_wpm3i=True)
+            assert await api.update()
+            assert api.get_conv_val('OUTSIDE_TEMPERATURE') == 3.5
+            await api.set_operation('DHW')
+            assert device.raw(1500) == 5
+            async with api.write_batch() as batch:
+                batch.set('HEATING_CIRCUIT_1__COMFORT_TEMPERATURE', 22.5)
+                batch.set('HEATING_CIRCUIT_1__ECO_TEMPERATURE', 19.0)
+            await api.update()
+            return await api.get_heating_circuit1_comfort_temp()
+
+        assert run(serve(SimulatedISG({slave: device}), test)) == 22.5
+
+    def test_units(self):
+        isg = SimulatedISG({1: SimulatedDevice('lwz'),
+                            2: SimulatedDevice('wpm3i')})
+
+        async def test(client):
+            return (await client.read_input_registers(0, 33, unit=1),
+                    await client.read_input_registers(0, 33, unit=2),
+                    await client.read_input_registers(0, 33, unit=3))
+
+        lwz, wpm3i, missing = run(serve(isg, test))
+        assert len(lwz.registers) == 33
+        assert wpm3i.exception_code == 2
+        assert missing.exception_code == 0x0B
+
+    def test_latency_and_exceptions(self):
+        isg = SimulatedISG({1: SimulatedDevice('lwz')},
+                           Faults(latency=0.05, exception_rate=1))
+
+        async def test(client):
+            start = time.monotonic()
+            response = await client.read_input_registers(0, 1, unit=1)
+            return response, time.monotonic() - start
+
+        response, duration = run(serve(isg, test))
+        assert response.exception_code == 4
+        assert duration >= 0.05
+
+    def test_dropped_responses(self):
+        isg = SimulatedISG({1: SimulatedDevice('lwz')}, Faults(drop_rate=1))
+
+        async def test(client):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    client.read_input_registers(0, 1, unit=1), 0.1)
+
+        run(serve(isg, test))
+        assert isg.requests == 1
+
+    def test_fleet(self):
+        async def test():
+            isgs = await start_isgs(20, 'wpm3i', units=(1, 2),
+                                    faults=Faults(latency=0.01, jitter=0.005))
+            poller = FleetPoller(
+                [('127.0.0.1', isg.port, unit, True)
+                 for isg in isgs for unit in (1, 2)],
+                connect=TcpModbusClient.connect)
+            try:
+                return [result async for result in poller.poll()]
+            finally:
+                poller.close()
+                for isg in isgs:
+                    await isg.close()
+
+        results = run(test())
+        assert len(results) == 40
+        assert all(result.success for result in results)
+
+
+class TestSimulatorThread:
+
+    def test_serves_from_thread(self):
+        device = SimulatedDevice('lwz')
+        device.set_raw(0, 21.5 * 10)
+        simulator = SimulatorThread(SimulatedISG({slave: device}), port=0)
+        port = simulator.start()
+
+        async def read():
+            client = await TcpModbusClient.connect('127.0.0.1', port)
+            try:
+                return await client.read_input_registers(0, 1, unit=slave)
+            finally:
+                client.close()
+
+        try:
+            assert run(read()).registers == [215]
+        finally:
+            simulator.stop()
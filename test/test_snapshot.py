@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+import pickle
+import threading
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.registers import RegisterSchema
+from pystiebeleltron.snapshot import Snapshot
+
+slave = 1
+
+
+class TestSnapshot:
+
+    def test_poll(self):
+        client = FakeModbusClient({6: 43, 1001: 220})
+        api = pyse.StiebelEltronAPI(client, slave)
+        snapshot = api.poll()
+        assert snapshot['OUTSIDE_TEMPERATURE'] == 4.3
+        assert snapshot[6] == 4.3
+        assert snapshot.raw('OUTSIDE_TEMPERATURE') == 43
+        assert snapshot.values.OUTSIDE_TEMPERATURE == 4.3
+        assert snapshot.get('HEATING_PRESSURE') is None
+        assert 'OUTSIDE_TEMPERATURE' in snapshot
+        assert dict(snapshot.items())['ROOM_TEMP_HEAT_DAY_HC1'] == 22.0
+        assert all(isinstance(acquired, float)
+                   for acquired in snapshot.acquired)
+        assert all(duration >= 0 for duration in snapshot.durations)
+
+    def test_poll_failed(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient(readable=set()), slave)
+        assert api.poll() is None
+        snapshot = api.snapshot()
+        assert snapshot.acquired == (None, None, None)
+        assert snapshot.age() is None
+
+    def test_unchanged_by_later_updates(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave)
+        snapshot = api.poll()
+        client.registers[6] = 50
+        api.update()
+        assert snapshot['OUTSIDE_TEMPERATURE'] == 4.3
+        assert api.snapshot()['OUTSIDE_TEMPERATURE'] == 5.0
+
+    def test_consistent_during_update(self, monkeypatch):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave)
+        first = api.poll()
+        acquire = api._acquire
+        snapshots = []
+
+        def snapshot_then_acquire(blocks, durations):
+            # Values are stored, their times not yet
+            snapshots.append(api.snapshot())
+            acquire(blocks, durations)
+        monkeypatch.setattr(api, '_acquire', snapshot_then_acquire)
+        client.registers[6] = 50
+        api.update()
+        assert snapshots[0]['OUTSIDE_TEMPERATURE'] == 4.3
+        assert snapshots[0].acquired == first.acquired
+        assert api.snapshot()['OUTSIDE_TEMPERATURE'] == 5.0
+
+    def test_immutable(self):
+        snapshot = pyse.StiebelEltronAPI(FakeModbusClient(), slave).poll()
+        with pytest.raises(AttributeError):
+            snapshot.time = 0
+        with pytest.raises(AttributeError):
+            del snapshot.acquired
+        with pytest.raises(TypeError):
+            snapshot.buffers[0][6] = 1
+
+    def test_block_timestamps(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        api.update()
+        first = api.snapshot()
+        api.update(['OPERATING_STATUS', 'FAULT_STATUS', 'BUS_STATUS'])
+        second = api.snapshot()
+        assert second.acquired[:2] == first.acquired[:2]
+        assert second.acquired[2] >= first.acquired[2]
+        assert second.acquired_at('BUS_STATUS') == second.acquired[2]
+        now = second.acquired[2] + 5
+        assert second.age('BUS_STATUS', now=now) == 5
+        assert second.age(now=now) == now - min(second.acquired)
+
+    def test_pickle(self):
+        api = pyse.StiebelEltronAPI(FakeModbusClient({6: 43}), slave,
+                                    is_wpm3i=False)
+        snapshot = api.poll()
+        restored = pickle.loads(pickle.dumps(snapshot))
+        assert restored.schema is pyse.LWZ_SCHEMA
+        assert restored['OUTSIDE_TEMPERATURE'] == 4.3
+        assert restored.acquired == snapshot.acquired
+        assert restored.durations == snapshot.durations
+        assert restored.time == snapshot.time
+
+    def test_pickle_needs_model(self):
+        schema = RegisterSchema([({'A': {'addr': 0, 'type': 6}}, 0,
+                                  'read_input_registers')])
+        with pytest.raises(TypeError):
+            pickle.dumps(Snapshot(schema, [b'\0\0'], [None], [None]))
+
+    def test_other_thread(self):
+        client = FakeModbusClient({6: 43})
+        api = pyse.StiebelEltronAPI(client, slave)
+        snapshot = api.poll()
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(snapshot.values.OUTSIDE_TEMPERATURE))
+        client.registers[6] = 0
+        api.update()
+        thread.start()
+        thread.join()
+        assert results == [4.3]
+
+    def test_async_poll(self):
+        client = FakeAsyncModbusClient({506: 43})
+        api = AsyncStiebelEltronAPI(client, slave, is_wpm3i=True)
+        snapshot = run(api.poll())
+        assert snapshot['OUTSIDE_TEMPERATURE'] == 4.3
+        assert None not in snapshot.durations
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+import asyncio
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+
+slave = 1
+
+
+class TestSubscription:
+
+    def test_only_changes_are_delivered(self):
+        client = FakeModbusClient({6: 100})
+        api = pyse.StiebelEltronAPI(client, slave)
+        deliveries = []
+        api.subscribe(deliveries.append)
+
+        api.update()
+        assert len(deliveries[0]) == len(pyse.LWZ_SCHEMA)
+        assert deliveries[0]['OUTSIDE_TEMPERATURE'] == 10.0
+
+        api.update()
+        assert len(deliveries) == 1
+
+        client.registers[6] = 0xFFF6
+        client.registers[2000] = 4
+        api.update()
+        assert deliveries[1] == {'OUTSIDE_TEMPERATURE': -1.0,
+                                 'OPERATING_STATUS': 4}
+
+    def test_deadband(self):
+        client = FakeModbusClient({6: 100})
+        api = pyse.StiebelEltronAPI(client, slave)
+        deliveries = []
+        api.subscribe(deliveries.append,
+                      deadbands={'OUTSIDE_TEMPERATURE': 0.5})
+        api.update()
+
+        for raw in (102, 104, 98, 105):
+            client.registers[6] = raw
+            api.update()
+        assert deliveries[1:] == [{'OUTSIDE_TEMPERATURE': 10.5}]
+
+        # The deadband applies to the value delivered last
+        client.registers[6] = 101
+        api.update()
+        assert deliveries[2:] == []
+        client.registers[6] = 100
+        api.update()
+        assert deliveries[2:] == [{'OUTSIDE_TEMPERATURE': 10.0}]
+
+    def test_close(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+        deliveries = []
+        api.subscribe(deliveries.append).close()
+
+        api.update()
+        assert deliveries == []
+
+    def test_failed_updates_deliver_nothing(self):
+        client = FakeModbusClient(readable=set())
+        api = pyse.StiebelEltronAPI(client, slave)
+        deliveries = []
+        api.subscribe(deliveries.append)
+
+        assert not api.update()
+        assert deliveries == []
+
+
+class TestChangeStream:
+
+    def test_coalesce_for_slow_consumers(self):
+        client = FakeAsyncModbusClient({6: 100})
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        async def consume():
+            stream = api.changes()
+            received = []
+
+            await api.update()
+            received.append(await stream.__anext__())
+            for raw in (101, 102, 103):
+                client.registers[6] = raw
+                await api.update()
+            client.registers[0] = 200
+            await api.update()
+
+            stream.close()
+            async for changes in stream:
+                received.append(changes)
+            return received
+
+        received = run(consume())
+        assert len(received) == 2
+        assert received[1] == {'OUTSIDE_TEMPERATURE': 10.3,
+                               'ACTUAL_ROOM_TEMPERATURE_HC1': 20.0}
+
+    def test_iteration_waits_for_updates(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        async def consume(stream):
+            async for changes in stream:
+                return changes
+
+        async def main():
+            stream = api.changes()
+            consumer = asyncio.ensure_future(consume(stream))
+            await asyncio.sleep(0.01)
+            assert not consumer.done()
+            await api.update()
+            return await consumer
+
+        assert len(run(main())) == len(pyse.LWZ_SCHEMA)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+import asyncio
+import time
+
+import pytest
+
+from test.fake_modbus_client import FakeModbusClient, FakeAsyncModbusClient, run
+from pystiebeleltron import pystiebeleltron as pyse
+from pystiebeleltron.async_api import AsyncStiebelEltronAPI
+from pystiebeleltron.writes import (
+    AsyncDebouncedWriter, DebouncedWriter, plan_writes)
+
+slave = 1
+
+
+def failing_write(address, value, unit=0):
+    raise ConnectionError("Connection lost")
+
+
+class TestPlanWrites:
+
+    def test_merge_contiguous(self):
+        pending = {1003: 3, 1001: 1, 1002: 2, 1010: 10}
+        assert plan_writes(pending) == [(1001, [1, 2, 3]), (1010, [10])]
+
+    def test_split_at_max_count(self):
+        pending = {a: a for a in range(5)}
+        assert plan_writes(pending, max_count=2) == [
+            (0, [0, 1]), (2, [2, 3]), (4, [4])]
+
+
+class TestWriteBatch:
+
+    def test_commit_on_exit(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave, update_on_read=True,
+                                    ttl=60)
+        api.update()
+        del client.requests[:]
+
+        with api.write_batch() as batch:
+            batch.set('ROOM_TEMP_HEAT_DAY_HC1', 21.5)
+            batch.set('ROOM_TEMP_HEAT_NIGHT_HC1', -1.5)
+            batch.set('MANUAL_SET_TEMP_HC1', 20.0)
+            batch.set('GRADIENT_HC1', 0.45)
+            batch.set('ROOM_TEMP_HEAT_DAY_HC1', 22.0)
+            batch.set_raw('OPERATING_MODE', 5)
+            assert client.requests == []
+
+        assert client.requests == [('write', 1000, 4), ('write', 1007, 1)]
+        assert client.registers[1002] == 0xFFF1
+        assert client.registers[1007] == 45
+        assert api.get_target_temp() == 22.0
+        assert api.get_operation() == 'DHW'
+
+    def test_discard_on_error(self):
+        client = FakeModbusClient()
+        api = pyse.StiebelEltronAPI(client, slave)
+
+        with pytest.raises(RuntimeError):
+            with api.write_batch() as batch:
+                batch.set('ROOM_TEMP_HEAT_DAY_HC1', 21.5)
+                raise RuntimeError()
+        assert client.requests == []
+
+    def test_rejects_invalid_writes(self):
+        batch = pyse.StiebelEltronAPI(FakeModbusClient(), slave).write_batch()
+        with pytest.raises(ValueError):
+            batch.set('OUTSIDE_TEMPERATURE', 10)
+        with pytest.raises(ValueError):
+            batch.set('ROOM_TEMP_HEAT_DAY_HC1', 4000)
+        with pytest.raises(ValueError):
+            batch.set('OPERATING_MODE', 256)
+
+    def test_async_batch(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave, is_wpm3i=True)
+
+        async def write():
+            async with api.write_batch() as batch:
+                batch.set('HEATING_CIRCUIT_1__COMFORT_TEMPERATURE', 21.5)
+                batch.set('HEATING_CIRCUIT_1__ECO_TEMPERATURE', 19.0)
+                batch.set('HEATING_CIRCUIT_1__HEATING_CURVE_RISE', 0.6)
+
+        run(write())
+        assert client.requests == [('write', 1501, 3)]
+        assert [client.registers[a] for a in (1501, 1502, 1503)] == \
+            [215, 190, 60]
+
+
+class TestDebouncedWriter:
+
+    def test_last_writer_wins(self):
+        client = FakeModbusClient()
+        writer = DebouncedWriter(
+            pyse.StiebelEltronAPI(client, slave), delay=0.05)
+        for temp in (20.0, 20.5, 21.0, 21.5):
+            writer.set('ROOM_TEMP_HEAT_DAY_HC1', temp)
+        assert client.requests == []
+
+        time.sleep(0.2)
+        assert client.requests == [('write', 1001, 1)]
+        assert client.registers[1001] == 215
+
+    def test_flush(self):
+        client = FakeModbusClient()
+        writer = DebouncedWriter(pyse.StiebelEltronAPI(client, slave), 10)
+        writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.0)
+        writer.flush()
+        writer.flush()
+        assert client.requests == [('write', 1001, 1)]
+
+    def test_error_raised_by_next_call(self):
+        client = FakeModbusClient()
+        client.write_register = failing_write
+        writer = DebouncedWriter(
+            pyse.StiebelEltronAPI(client, slave), delay=0.01)
+        writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.0)
+        time.sleep(0.1)
+        with pytest.raises(ConnectionError):
+            writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.5)
+        # Raised once
+        writer.flush()
+
+    def test_error_callback(self):
+        client = FakeModbusClient()
+        client.write_register = failing_write
+        errors = []
+        writer = DebouncedWriter(
+            pyse.StiebelEltronAPI(client, slave), delay=0.01,
+            on_error=errors.append)
+        writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.0)
+        time.sleep(0.1)
+        assert [type(error) for error in errors] == [ConnectionError]
+        writer.flush()
+
+    def test_async(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave)
+
+        async def slide():
+            writer = AsyncDebouncedWriter(api, delay=0.02)
+            for temp in (20.0, 20.5, 21.0):
+                writer.set('ROOM_TEMP_HEAT_DAY_HC1', temp)
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.1)
+
+        run(slide())
+        assert client.requests == [('write', 1001, 1)]
+        assert client.registers[1001] == 210
+
+    def test_async_errors(self):
+        client = FakeAsyncModbusClient()
+        api = AsyncStiebelEltronAPI(client, slave)
+        errors = []
+
+        async def failing_async_write(address, value, unit=0):
+            await asyncio.sleep(0.02)
+            failing_write(address, value, unit)
+
+        async def slide():
+            writer = AsyncDebouncedWriter(api, delay=0.01)
+            writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.0)
+            await asyncio.sleep(0.05)
+            with pytest.raises(ConnectionError):
+                writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.5)
+            # flush waits for the write in progress
+            writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.5)
+            await asyncio.sleep(0.015)
+            with pytest.raises(ConnectionError):
+                await writer.flush()
+            writer = AsyncDebouncedWriter(api, delay=0.01,
+                                          on_error=errors.append)
+            writer.set('ROOM_TEMP_HEAT_DAY_HC1', 20.0)
+            await asyncio.sleep(0.05)
+            await writer.flush()
+
+        client.write_register = failing_async_write
+        run(slide())
+        assert [type(error) for error in errors] == [ConnectionError]